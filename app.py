@@ -3,6 +3,7 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import math
 import os
 import sys
 import subprocess
@@ -12,21 +13,31 @@ from datetime import datetime
 import tempfile
 import shutil
 
-# Import your existing modules
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.common.keys import Keys
-from webdriver_manager.chrome import ChromeDriverManager
-import random
-import requests
-from urllib.parse import quote
-from openai import OpenAI
-import json
+# Import pipeline stages
+from extractor import EXTRACTOR_BACKENDS, extract_video_id, get_extractor
+from translator import CommentTranslator
+from sentiment import SENTIMENT_LABELS, SentimentAnalyzer
+from backends import DEFAULT_MODEL, LLMEndpoint, parse_endpoint
+from cache import ResultCache
+from local_model import LexiconSentimentModel
+from pipeline import StreamingPipeline
+from checkpoint import RunCheckpoint
+from dedup import CommentDeduplicator
+from jobs import JobManager
+from metrics import Metrics
+from report import (DETAIL_COLUMNS, count_sentiments, count_sentiments_by_likes, filter_results,
+                    keyword_frequency, results_frame)
+from store import STAGE_FILES
+from trends import TrendStore
+
+# Analyses running at once across all sessions; later ones queue
+MAX_CONCURRENT_JOBS = 2
+
+SENTIMENT_COLORS = {'Positive': '#00CC96', 'Negative': '#EF553B', 'Neutral': '#636EFA'}
+SENTIMENT_ICONS = {'Positive': '🟢', 'Negative': '🔴', 'Neutral': '🟡'}
+PAGE_SIZES = (50, 100, 250, 500)
+TREND_RESOLUTIONS = {'hour': "Hourly", 'day': "Daily"}
+TREND_MEASURES = {'comments': "Comments", 'weighted': "Weighted by likes"}
 
 # Set page config
 st.set_page_config(
@@ -76,340 +87,254 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-class YouTubeCommentExtractor:
-    def __init__(self, video_url):
-        self.video_url = video_url
-        
-    def remove_emojis(self, text):
-        emoji_pattern = re.compile("["
-                                  u"\U0001F600-\U0001F64F"  # emoticons
-                                  u"\U0001F300-\U0001F5FF"  # symbols & pictographs
-                                  u"\U0001F680-\U0001F6FF"  # transport & map symbols
-                                  u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
-                                  u"\U00002702-\U000027B0"
-                                  u"\U000024C2-\U0001F251"
-                                  u"\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
-                                  u"\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
-                                  u"\U00002600-\U000026FF"  # Miscellaneous Symbols
-                                  u"\U00002700-\U000027BF"  # Dingbats
-                                  "]+", flags=re.UNICODE)
-        return emoji_pattern.sub(r'', text)
-    
-    def extract_comments(self):
-        options = webdriver.ChromeOptions()
-        options.add_argument("--headless")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        
-        driver = None
-        try:
-            driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-            driver.get(self.video_url)
-            time.sleep(5)
-            
-            # Scroll to load comments
-            driver.execute_script("window.scrollTo(0, 800);")
-            time.sleep(3)
-            
-            # Load all comments
-            last_height = driver.execute_script("return document.documentElement.scrollHeight")
-            scroll_pause_time = 2
-            
-            while True:
-                driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
-                time.sleep(scroll_pause_time)
-                new_height = driver.execute_script("return document.documentElement.scrollHeight")
-                if new_height == last_height:
-                    break
-                last_height = new_height
-            
-            # Extract comments
-            comments = driver.find_elements(By.XPATH, '//*[@id="content-text"]')
-            
-            all_comments = []
-            for c in comments:
-                comment_text = c.text.strip()
-                if comment_text != "":
-                    clean_comment = self.remove_emojis(comment_text).strip()
-                    if clean_comment != "":
-                        all_comments.append(clean_comment)
-            
-            # Skip first comment (usually video description)
-            actual_comments = all_comments[1:] if len(all_comments) > 1 else all_comments
-            
-            # Save to file
-            with open('comments.txt', 'w', encoding='utf-8') as file:
-                for i, comment in enumerate(actual_comments, 1):
-                    file.write(f"Comment {i}:\n")
-                    file.write(f"Original: {comment}\n")
-                    file.write("-" * 80 + "\n")
-                    if i < len(actual_comments):
-                        file.write("\n")
-            
-            return len(actual_comments)
-            
-        except Exception as e:
-            raise Exception(f"Error extracting comments: {e}")
-        finally:
-            if driver:
-                driver.quit()
+@st.cache_resource
+def get_result_cache():
+    """One on-disk result cache per server process, shared across sessions"""
+    return ResultCache()
 
-class CommentTranslator:
-    def __init__(self):
-        pass
-    
-    def translate_with_requests_api(self, text):
-        try:
-            url = "https://translate.googleapis.com/translate_a/single"
-            params = {
-                'client': 'gtx',
-                'sl': 'auto',
-                'tl': 'en',
-                'dt': 't',
-                'q': text
-            }
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            }
-            
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            if response.status_code == 200:
-                result = response.json()
-                if result and result[0] and result[0][0]:
-                    translated_text = result[0][0][0]
-                    return translated_text
-        except Exception as e:
-            pass
-        return None
-    
-    def extract_translated_text(self, file_path):
-        translated_texts = []
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            sections = content.split('--------------------------------------------------------------------------------')
-            
-            for i, section in enumerate(sections):
-                if section.strip():
-                    lines = section.strip().split('\n')
-                    for line in lines:
-                        if line.strip().startswith('Original:'):
-                            translated_text = line.strip().split('Original:', 1)[1].strip()
-                            if translated_text:
-                                translated_texts.append({
-                                    'index': i + 1,
-                                    'text': translated_text
-                                })
-                            break
-            
-            return translated_texts
-        except Exception as e:
-            raise Exception(f"Error reading comments file: {e}")
-    
-    def translate_comments(self):
-        translated_texts = self.extract_translated_text('comments.txt')
-        
-        if not translated_texts:
-            raise Exception("No comments found to translate")
-        
-        enhanced_results = []
-        
-        for item in translated_texts:
-            # Try translation
-            enhanced_text = self.translate_with_requests_api(item['text'])
-            if not enhanced_text:
-                enhanced_text = item['text']  # Keep original if translation fails
-            
-            enhanced_results.append({
-                'index': item['index'],
-                'original_translated': item['text'],
-                'enhanced': enhanced_text
-            })
-        
-        # Save results
-        with open('translated.txt', 'w', encoding='utf-8') as f:
-            f.write("=== Enhanced Translation Results (Anti-Detection Version) ===\n\n")
-            f.write(f"Total Items Processed: {len(enhanced_results)}\n")
-            f.write(f"Processing Method: API + Stealth Browser Fallback\n\n")
-            
-            for result in enhanced_results:
-                f.write(f"{result['index']}.\n")
-                f.write(f"Original Translation: {result['original_translated']}\n")
-                f.write(f"Enhanced (English): {result['enhanced']}\n")
-                f.write("-" * 80 + "\n")
-        
-        return len(enhanced_results)
+@st.cache_resource
+def get_trend_store():
+    """Hourly and daily sentiment counts of every video analyzed on this server"""
+    return TrendStore()
 
-class SentimentAnalyzer:
-    def __init__(self, api_key):
-        self.client = OpenAI(
-            base_url="https://integrate.api.nvidia.com/v1",
-            api_key=api_key,
-        )
-    
-    def _get_completion(self, prompt, temperature=0.1, max_retries=3):
-        for attempt in range(max_retries):
-            try:
-                completion = self.client.chat.completions.create(
-                    model="meta/llama-3.1-8b-instruct",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=temperature,
-                    top_p=0.7,
-                    max_tokens=512,
-                    stream=False
-                )
-                response = completion.choices[0].message.content
-                return response
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                else:
-                    return "Error"
-    
-    def analyze_sentiment(self, text):
-        prompt = f"""
-Analyze the SENTIMENT of this text - meaning the emotional tone expressed in the words.
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_results(run_key, _records):
+    """A run's records as one DataFrame. `run_key` (job id and record
+    count) identifies the records, so they are not hashed on every rerun."""
+    return results_frame(_records)
 
-Focus on:
-- The actual words chosen (positive, negative, neutral)
-- Emotional indicators in the language
-- Intensity of the sentiment expressed
-- Overall tone and feeling conveyed
+@st.cache_data(max_entries=64, show_spinner=False)
+def sentiment_figures(run_key, counts):
+    """Bar and pie chart of the sentiment counts, built once per run and counts"""
+    fig_bar = px.bar(
+        x=list(counts.keys()),
+        y=list(counts.values()),
+        title="Sentiment Distribution",
+        color=list(counts.keys()),
+        color_discrete_map=SENTIMENT_COLORS
+    )
+    fig_bar.update_layout(
+        xaxis_title="Sentiment",
+        yaxis_title="Number of Comments",
+        showlegend=False
+    )
+    fig_pie = px.pie(
+        values=list(counts.values()),
+        names=list(counts.keys()),
+        title="Sentiment Percentage",
+        color=list(counts.keys()),
+        color_discrete_map=SENTIMENT_COLORS
+    )
+    return fig_bar, fig_pie
 
-TEXT: "{text}"
+@st.cache_data(max_entries=8, show_spinner=False)
+def keyword_figure(run_key, _frame, top=20):
+    """Stacked bar chart of the most frequent keywords by sentiment, or None without any"""
+    table = keyword_frequency(_frame, top)
+    if table.empty:
+        return None
+    long = table.drop(columns='total').reset_index().melt(id_vars='keyword', var_name='sentiment',
+                                                          value_name='comments')
+    fig = px.bar(long, x='comments', y='keyword', color='sentiment', orientation='h',
+                 title="Most Frequent Keywords", color_discrete_map=SENTIMENT_COLORS,
+                 category_orders={'keyword': list(table.index)})
+    fig.update_layout(xaxis_title="Comments", yaxis_title=None, height=120 + 22 * len(table))
+    return fig
 
-Classify the sentiment as:
-- Positive: Expresses satisfaction, happiness, approval, gratitude, or other positive emotions
-- Negative: Expresses dissatisfaction, anger, disappointment, frustration, or other negative emotions  
-- Neutral: Factual, balanced, or lacks clear emotional indicators
+@st.cache_data(max_entries=16, show_spinner=False)
+def trend_figure(run_key, _series, resolution='hour', measure='comments'):
+    """Sentiment per hour or day as stacked bars, with the like-weighted net
+    sentiment as a line on its own axis; None before any dated comment"""
+    if _series.empty:
+        return None
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    for label in SENTIMENT_LABELS:
+        column = label if measure == 'comments' else f"{label} weighted"
+        fig.add_trace(go.Bar(x=_series.index, y=_series[column], name=label,
+                             marker_color=SENTIMENT_COLORS[label]), secondary_y=False)
+    fig.add_trace(go.Scatter(x=_series.index, y=_series['score'], name="Net sentiment", mode='lines+markers',
+                             line=dict(color='#FFA15A'), connectgaps=False), secondary_y=True)
+    fig.update_layout(barmode='stack', title=f"{TREND_RESOLUTIONS[resolution]} Sentiment Trend",
+                      legend=dict(orientation='h', y=-0.2))
+    fig.update_yaxes(title_text=TREND_MEASURES[measure], secondary_y=False)
+    fig.update_yaxes(title_text="Net sentiment (likes)", range=[-1, 1], secondary_y=True)
+    return fig
 
-ANSWER FORMAT:
-Sentiment: [Positive/Negative/Neutral]
-Confidence: [0-100]%
-Key_Words: [Words that indicate this sentiment]
-Reasoning: [Brief explanation of why]
-"""
-        
-        response = self._get_completion(prompt)
-        return self._parse_sentiment_response(response)
+def render_sentiment_charts(placeholder, sentiment_counts, key, trend=None):
+    """Draw (or redraw) the bar and pie charts, and the trend chart when
+    there is one, inside a st.empty() placeholder"""
+    fig_bar, fig_pie = sentiment_figures(key, sentiment_counts)
+    with placeholder.container():
+        if trend is None:
+            col_chart1, col_chart2 = st.columns(2)
+        else:
+            col_chart1, col_chart2, col_chart3 = st.columns([1, 1, 2])
+            with col_chart3:
+                st.plotly_chart(trend, use_container_width=True, key=f"trend-{key}")
     
-    def _parse_sentiment_response(self, response):
-        result = {
-            'sentiment': 'Error',
-            'confidence': 50,
-            'key_words': 'None identified',
-            'reasoning': 'No reasoning provided'
-        }
-        
-        if not response or response == "Error":
-            return result
-        
-        response_lower = response.lower()
-        if 'positive' in response_lower:
-            result['sentiment'] = 'Positive'
-        elif 'negative' in response_lower:
-            result['sentiment'] = 'Negative'
-        elif 'neutral' in response_lower:
-            result['sentiment'] = 'Neutral'
-        
-        lines = response.split('\n')
-        for line in lines:
-            line = line.strip()
-            if line.startswith('Sentiment:'):
-                sentiment = line.split(':', 1)[1].strip()
-                if sentiment in ['Positive', 'Negative', 'Neutral']:
-                    result['sentiment'] = sentiment
-            elif line.startswith('Confidence:'):
-                conf_str = re.findall(r'\d+', line)
-                result['confidence'] = int(conf_str[0]) if conf_str else 50
-            elif line.startswith('Key_Words:'):
-                result['key_words'] = line.split(':', 1)[1].strip()
-            elif line.startswith('Reasoning:'):
-                result['reasoning'] = line.split(':', 1)[1].strip()
-        
-        return result
+        with col_chart1:
+            st.plotly_chart(fig_bar, use_container_width=True, key=f"bar-{key}")
     
-    def parse_translation_file(self, filename):
-        try:
-            with open(filename, 'r', encoding='utf-8') as file:
-                content = file.read()
-            
-            statements = []
-            lines = content.split('\n')
-            
-            for line in lines:
-                if line.strip().startswith('Enhanced (English):'):
-                    statement = line.split('Enhanced (English):', 1)[1].strip()
-                    if statement:
-                        statements.append(statement)
-            
-            return statements
-        except Exception as e:
-            raise Exception(f"Error reading translation file: {e}")
+        with col_chart2:
+            st.plotly_chart(fig_pie, use_container_width=True, key=f"pie-{key}")
+
+def render_comment_detail(record, explainer, job):
+    """One comment in full, with its key words and reasoning, or a button
+    asking the LLM for them on this session's API key"""
+    # Reasoning asked for on demand, kept with the job so reruns still show it
+    explanations = job.context.setdefault('explanations', {})
+    # Missing text columns read back as NaN; treat them as not set
+    record = record.astype(object).where(record.notna(), None)
+    index = int(record['index'])
+    with st.container(border=True):
+        st.write(f"**Comment {index}:** {record['translation']}")
+        if record['translation_status'] != 'skipped' and record['original'] != record['translation']:
+            st.caption(f"Original: {record['original']}")
+        st.write(f"**Sentiment:** {SENTIMENT_ICONS[record['sentiment']]} {record['sentiment']} · "
+                 f"**Confidence:** {record['confidence']:.0f}%")
+        explanation = explanations.get(index) or record
+        if not explanation.get('reasoning') and explainer is None:
+            st.caption("Enter your NVIDIA API key in the sidebar to ask the LLM to explain this label")
+        elif not explanation.get('reasoning') and st.button("💡 Explain this label", key=f"explain-{job.id}-{index}"):
+            with st.spinner("Asking the LLM for its reasoning..."):
+                explained = explainer.explain(record['translation'], record['sentiment'])
+            if explained['sentiment'] == 'Error':
+                st.warning(f"⚠️ Could not get an explanation: {explainer.last_error}")
+            else:
+                explanation = explanations[index] = explained
+        if explanation.get('reasoning'):
+            if explanation.get('sentiment') != record['sentiment']:
+                st.warning(f"⚠️ Asked to explain it, the LLM reads this comment as {explanation['sentiment']}, "
+                           f"not {record['sentiment']}. The reasoning below is for {explanation['sentiment']}.")
+            st.write(f"**Key Words:** {explanation.get('key_words') or 'None identified'}")
+            st.write(f"**Reasoning:** {explanation['reasoning']}")
+
+def render_results_table(frame, explainer, job):
+    """Filterable, paginated table of every analyzed comment. Filtering
+    runs on the DataFrame and only the current page is sent to the browser;
+    selecting a row shows that comment in full."""
+    col_sentiment, col_confidence, col_search = st.columns([2, 2, 3])
+    with col_sentiment:
+        chosen = st.multiselect("Sentiment", list(SENTIMENT_LABELS), default=list(SENTIMENT_LABELS),
+                                key=f"filter-sentiment-{job.id}")
+    with col_confidence:
+        low, high = st.slider("Confidence", 0, 100, (0, 100), key=f"filter-confidence-{job.id}")
+    with col_search:
+        search = st.text_input("Search comments", key=f"filter-search-{job.id}")
+    filtered = filter_results(frame, chosen, low, high, search.strip() or None)
     
-    def analyze_comments(self):
-        statements = self.parse_translation_file('translated.txt')
-        if not statements:
-            raise Exception("No translated comments found")
-        
-        sentiment_counts = {
-            'Positive': 0,
-            'Negative': 0,
-            'Neutral': 0
-        }
+    col_size, col_page = st.columns(2)
+    with col_size:
+        page_size = st.selectbox("Comments per page", PAGE_SIZES, index=1, key=f"page-size-{job.id}")
+    pages = max(1, math.ceil(len(filtered) / page_size))
+    with col_page:
+        # Keyed on the number of matches, so changing the filters goes back to page 1
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                               key=f"page-{job.id}-{len(filtered)}-{page_size}")
+    start = (page - 1) * page_size
+    visible = filtered.iloc[start:start + page_size]
+    st.caption(f"Showing {min(start + 1, len(filtered))}–{start + len(visible)} of {len(filtered)} "
+               f"matching comments ({len(frame)} in total)")
+    
+    table = visible.loc[:, list(DETAIL_COLUMNS)]
+    table['sentiment'] = [f"{SENTIMENT_ICONS[label]} {label}" for label in table['sentiment']]
+    explanations = job.context.get('explanations', {})
+    if explanations:
+        table['reasoning'] = [reasoning if pd.notna(reasoning) else explanations.get(index, {}).get('reasoning')
+                              for index, reasoning in zip(table['index'], table['reasoning'])]
+    event = st.dataframe(
+        table,
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="single-row",
+        key=f"results-{job.id}",
+        column_config={
+            'index': st.column_config.NumberColumn("#", width="small"),
+            'sentiment': "Sentiment",
+            'confidence': st.column_config.ProgressColumn("Confidence", min_value=0, max_value=100, format="%d%%"),
+            'likes': "Likes",
+            'translation': st.column_config.TextColumn("Comment", width="large"),
+            'key_words': "Key Words",
+            'reasoning': "Reasoning",
+            'scored_by': "Scored By",
+            'author': "Author",
+            'published': "Published",
+        },
+    )
+    rows = event.selection.rows if event else []
+    if rows:
+        render_comment_detail(visible.iloc[rows[0]], explainer, job)
+    else:
+        st.caption("Select a row to read the comment in full or ask the LLM to explain its label")
+
+def format_duration(seconds):
+    if seconds is None:
+        return "unknown"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
+
+def render_performance(metrics, stats, key):
+    """Per-stage timings, LLM usage, cache hits and queue depths of one run,
+    with JSON and Prometheus exports"""
+    snapshot = metrics.snapshot()
+    with st.expander("⚡ Performance", expanded=False):
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Comments/sec", f"{stats['comments_per_second']:.1f}")
+        col2.metric("Elapsed", format_duration(stats['elapsed']))
+        col3.metric("LLM calls", metrics.counter('llm_requests_total'),
+                    f"{metrics.counter('llm_retries_total')} retries", delta_color="off")
+        col4.metric("LLM tokens", metrics.counter('llm_tokens_total'))
         
-        results = []
+        def labels(row):
+            return ", ".join(f"{name}={value}" for name, value in row['labels'].items())
         
-        for i, statement in enumerate(statements, 1):
-            analysis = self.analyze_sentiment(statement)
-            
-            if analysis['sentiment'] != 'Error':
-                sentiment_counts[analysis['sentiment']] += 1
-                
-                result_entry = {
-                    'statement_number': i,
-                    'text': statement,
-                    'overall_sentiment': analysis['sentiment'],
-                    'confidence': analysis['confidence'],
-                    'key_words': analysis['key_words'],
-                    'reasoning': analysis['reasoning']
-                }
-                results.append(result_entry)
+        latencies = [row for row in snapshot['histograms'] if row['name'].endswith('_seconds')]
+        if latencies:
+            st.markdown("**Latency (ms)**")
+            st.dataframe(pd.DataFrame([{
+                'stage': row['name'].replace('_seconds', ''),
+                'labels': labels(row),
+                'count': row['count'],
+                'mean': round(row['mean'] * 1000, 1),
+                'p50': round(row['p50'] * 1000, 1),
+                'p95': round(row['p95'] * 1000, 1),
+            } for row in latencies]), hide_index=True, use_container_width=True)
+            translation = [row for row in latencies if row['name'] == 'translation_request_seconds']
+            if translation:
+                buckets = translation[0]['buckets']
+                # Cumulative bucket counts back into per-bucket counts
+                bounds, counts, previous = [], [], 0
+                for bound, cumulative in buckets.items():
+                    bounds.append(bound if bound == '+Inf' else f"≤{float(bound) * 1000:g} ms")
+                    counts.append(cumulative - previous)
+                    previous = cumulative
+                fig = px.bar(x=bounds, y=counts, title="Translation request latency")
+                fig.update_layout(xaxis_title="Latency", yaxis_title="Requests")
+                st.plotly_chart(fig, use_container_width=True, key=f"translation-latency-{key}")
         
-        # Save results
-        with open('result.txt', 'w', encoding='utf-8') as file:
-            file.write("="*80 + "\n")
-            file.write("SENTIMENT ANALYSIS RESULTS\n")
-            file.write("="*80 + "\n")
-            file.write(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            file.write(f"Total Statements: {len(results)}\n\n")
-            
-            file.write("SENTIMENT DISTRIBUTION SUMMARY:\n")
-            file.write("-" * 40 + "\n")
-            file.write(f"Positive Sentiment: {sentiment_counts['Positive']}\n")
-            file.write(f"Negative Sentiment: {sentiment_counts['Negative']}\n")
-            file.write(f"Neutral Sentiment: {sentiment_counts['Neutral']}\n")
-            file.write("\n" + "="*80 + "\n")
-            file.write("DETAILED RESULTS:\n")
-            file.write("="*80 + "\n\n")
-            
-            for result in results:
-                file.write(f"Statement {result['statement_number']}:\n")
-                file.write(f"Text: \"{result['text']}\"\n")
-                file.write(f"Overall Sentiment: {result['overall_sentiment']}\n")
-                file.write(f"Confidence: {result['confidence']}%\n")
-                file.write(f"Key Words: {result['key_words']}\n")
-                file.write(f"Logic Applied: Direct sentiment analysis - {result['overall_sentiment']} sentiment detected\n")
-                file.write("-" * 80 + "\n\n")
+        counters = [row for row in snapshot['counters']]
+        if counters:
+            st.markdown("**Counters**")
+            st.dataframe(pd.DataFrame([{'metric': row['name'], 'labels': labels(row), 'value': row['value']}
+                                       for row in counters]), hide_index=True, use_container_width=True)
+        queues = {row['labels']['queue']: row['value'] for row in snapshot['gauges'] if row['name'] == 'queue_depth_max'}
+        if queues:
+            st.caption("📥 Most records waiting: " + " · ".join(f"{name} {depth}" for name, depth in queues.items()))
         
-        return results, sentiment_counts
+        col_json, col_prom = st.columns(2)
+        col_json.download_button("Download metrics (JSON)", metrics.to_json(), file_name="metrics.json",
+                                 mime="application/json", key=f"metrics-json-{key}")
+        col_prom.download_button("Download metrics (Prometheus)", metrics.to_prometheus(), file_name="metrics.prom",
+                                 mime="text/plain", key=f"metrics-prom-{key}")
+
+@st.cache_resource
+def get_local_model():
+    return LexiconSentimentModel()
 
 def cleanup_files():
     """Delete all temporary files"""
-    files_to_delete = ['comments.txt', 'translated.txt', 'result.txt']
+    files_to_delete = list(STAGE_FILES.values()) + ['result.txt']
     for file in files_to_delete:
         try:
             if os.path.exists(file):
@@ -417,6 +342,210 @@ def cleanup_files():
         except:
             pass
 
+@st.cache_resource
+def get_job_manager():
+    """Background analysis jobs, shared by every session of this server"""
+    return JobManager(max_jobs=MAX_CONCURRENT_JOBS)
+
+def run_analysis(job, video_url, extractor_backend, extractor_options, api_key, cache, analyzer_options,
+                 checkpoint, deduplicate=False, trends=None, only_new=True):
+    """Job target: stream one video through the pipeline, publishing each
+    scored comment on the job as it arrives"""
+    metrics = Metrics()
+    extractor = get_extractor(video_url, backend=extractor_backend, metrics=metrics, **extractor_options)
+    translator = CommentTranslator(cache=cache, metrics=metrics)
+    analyzer = SentimentAnalyzer(api_key, cache=cache, metrics=metrics, **analyzer_options)
+    pipeline = StreamingPipeline(extractor, translator, analyzer, checkpoint=checkpoint,
+                                 deduplicator=CommentDeduplicator() if deduplicate else None,
+                                 trends=trends, only_new=only_new, metrics=metrics)
+    job.context['metrics'] = metrics
+    job.context['analyzer'] = analyzer
+    job.context['use_local_model'] = analyzer_options.get('local_model') is not None
+    job.context['checkpoint'] = checkpoint
+    job.context['trends'] = trends
+    
+    try:
+        for record in pipeline.run():
+            job.add(record, pipeline.stats)
+    finally:
+        analyzer.close()
+    job.set_stats(pipeline.stats)
+    if checkpoint is not None:
+        checkpoint.finish(job.snapshot()[0])
+
+def load_trend(job, run_key, resolution='hour', measure='comments'):
+    """Trend figure of the job's video from the trend store, or None"""
+    trends = job.context.get('trends')
+    if trends is None:
+        return None
+    return trend_figure(f"{run_key}-{resolution}-{measure}", trends.series(resolution), resolution, measure)
+
+def get_explainer(api_key, model, endpoint_specs, cache):
+    """Analyzer for on-demand explanations, built from this session's own
+    key and endpoints: a job (and its analyzer) may have been started by
+    another session, whose key must not pay for this one's questions"""
+    if not api_key:
+        return None
+    try:
+        extra_endpoints = [parse_endpoint(line) for line in endpoint_specs.splitlines() if line.strip()]
+    except ValueError:
+        extra_endpoints = []
+    settings = (api_key, model, endpoint_specs)
+    saved = st.session_state.get('explainer')
+    if saved is None or saved[0] != settings:
+        if saved is not None:
+            saved[1].close()
+        endpoints = [LLMEndpoint(api_key=api_key, model=model)] + extra_endpoints if extra_endpoints else None
+        saved = st.session_state['explainer'] = (
+            settings, SentimentAnalyzer(api_key, model=model, endpoints=endpoints, cache=cache))
+    return saved[1]
+
+def show_job(job, cache, explainer=None):
+    """Poll a background job, drawing live progress until it finishes and
+    then the full results"""
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    
+    # Display results
+    st.markdown('<div class="section-header">📊 Sentiment Analysis Results</div>', unsafe_allow_html=True)
+    charts = st.empty()
+    
+    redraws = 0
+    last_redraw = 0.0
+    drawn = 0
+    while True:
+        finished = job.done
+        records, stats = job.snapshot()
+        if job.status == 'queued':
+            status_text.info("⏳ Waiting for a free worker; other analyses are running...")
+        elif stats and not finished:
+            # Until the total is known, progress is against what has been scraped so far
+            target = stats['expected'] or stats['extracted']
+            progress_bar.progress(min(99, int(stats['scored'] / max(target, 1) * 100)))
+            eta = f" · about {format_duration(stats['eta_seconds'])} left" if stats['eta_seconds'] is not None else ""
+            status_text.info(f"🎭 Extracted {stats['extracted']} · translated {stats['translated']} "
+                             f"· analyzed {stats['scored']}{' of ~' + str(stats['expected']) if stats['expected'] else ''} "
+                             f"comments · {stats['comments_per_second']:.1f}/sec{eta}")
+        elif not finished:
+            status_text.info("🎬 Extracting comments from YouTube...")
+        if finished:
+            break
+        if len(records) != drawn and time.monotonic() - last_redraw > 1.0:
+            redraws += 1
+            counts = count_sentiments(load_results(f"{job.id}-{len(records)}", records))
+            render_sentiment_charts(charts, counts, f"{job.id}-{redraws}",
+                                    load_trend(job, f"{job.id}-{redraws}"))
+            last_redraw = time.monotonic()
+            drawn = len(records)
+        job.wait(0.5)
+    
+    if job.status == 'failed':
+        st.error(f"❌ Error during analysis: {str(job.error)}")
+        cleanup_files()
+        checkpoint = job.context.get('checkpoint')
+        if checkpoint is not None and checkpoint.exists():
+            st.info("♻️ Progress was saved. Click Start again to resume from where the run stopped.")
+        return
+    
+    frame = load_results(f"{job.id}-{len(records)}", records)
+    sentiment_counts = count_sentiments(frame)
+    total_comments = sum(sentiment_counts.values())
+    trend = None
+    if job.context.get('trends') is not None:
+        col_resolution, col_measure = st.columns(2)
+        with col_resolution:
+            resolution = st.radio("Trend buckets", list(TREND_RESOLUTIONS), format_func=TREND_RESOLUTIONS.get,
+                                  horizontal=True, key=f"trend-resolution-{job.id}")
+        with col_measure:
+            measure = st.radio("Trend measure", list(TREND_MEASURES), format_func=TREND_MEASURES.get,
+                               horizontal=True, key=f"trend-measure-{job.id}")
+        trend = load_trend(job, f"{job.id}-final-{len(records)}", resolution, measure)
+    if not total_comments:
+        if stats and stats['skipped'] and not records:
+            progress_bar.progress(100)
+            status_text.success("🕒 No new comments since the last run")
+            st.info("🕒 Every comment read had been analyzed by an earlier run; "
+                    "the trend covers every run so far")
+            if trend is not None:
+                charts.plotly_chart(trend, use_container_width=True, key=f"trend-{job.id}-final")
+        else:
+            st.error("❌ Error during analysis: No comments could be analyzed")
+        cleanup_files()
+        return
+    render_sentiment_charts(charts, sentiment_counts, f"{job.id}-final", trend)
+    
+    analyzer = job.context['analyzer']
+    progress_bar.progress(100)
+    status_text.success(f"🎉 Analysis complete! ({stats['comments_per_second']:.2f} comments/sec)")
+    st.success(f"✅ Analyzed {total_comments} of {stats['extracted']} comments · "
+               f"first result after {stats['first_result_seconds']:.1f}s")
+    if stats['resumed']:
+        st.info(f"♻️ {stats['resumed']} comments were carried over from the interrupted run")
+    if stats['skipped']:
+        st.info(f"🕒 {stats['skipped']} comments analyzed by an earlier run were skipped; the charts "
+                f"cover the new ones, the trend covers every run so far")
+    failed_scores = int((frame['sentiment'] == 'Error').sum())
+    if stats['deduplicated']:
+        st.info(f"🔁 {stats['deduplicated']} repeated or near-identical comments reused the label of an "
+                f"earlier copy, saving {stats['deduplicated']} translations and LLM scorings")
+    if failed_scores:
+        st.warning(f"⚠️ {failed_scores} comments could not be analyzed even after a retry. "
+                   f"Click Start again to retry them.")
+    endpoints = analyzer.backends.stats()
+    if len(endpoints) > 1:
+        st.info("🔀 LLM endpoints: " + " · ".join(
+            f"{row['endpoint']} {row['ok']} ok, {row['throttled']} rate limited, {row['error']} failed"
+            for row in endpoints))
+    if job.context['use_local_model']:
+        st.info(f"🧮 {analyzer.tier_counts['local']} comments labelled locally · "
+                f"{analyzer.tier_counts['llm']} sent to the LLM "
+                f"({analyzer.escalation_rate()*100:.1f}% escalation rate)")
+    skipped_translations = int((frame['translation_status'] == 'skipped').sum())
+    if skipped_translations:
+        st.info(f"🌍 {skipped_translations} comments were detected as English and skipped translation")
+    failed_translations = int((frame['translation_status'] == 'failed').sum())
+    if failed_translations:
+        st.warning(f"⚠️ {failed_translations} comments could not be translated and were "
+                   f"analyzed in their original language")
+    if cache is not None:
+        cache_stats = cache.stats()
+        st.info(f"🗄️ Cache hits: {cache_stats['hits']} · misses: {cache_stats['misses']} "
+                f"· hit rate: {cache_stats['hit_rate']*100:.1f}%")
+    render_performance(job.context['metrics'], stats, job.id)
+    
+    # Summary statistics
+    col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
+    
+    with col_stat1:
+        st.metric("Total Comments", total_comments)
+    with col_stat2:
+        st.metric("Positive", sentiment_counts['Positive'], f"{sentiment_counts['Positive']/total_comments*100:.1f}%")
+    with col_stat3:
+        st.metric("Negative", sentiment_counts['Negative'], f"{sentiment_counts['Negative']/total_comments*100:.1f}%")
+    with col_stat4:
+        st.metric("Neutral", sentiment_counts['Neutral'], f"{sentiment_counts['Neutral']/total_comments*100:.1f}%")
+    
+    replies = int(frame['parent_id'].notna().sum())
+    if replies:
+        st.info(f"💬 {replies} of the analyzed comments are replies")
+    weighted = count_sentiments_by_likes(frame)
+    total_weight = sum(weighted.values())
+    if total_weight > total_comments:
+        st.caption("👍 Weighted by likes: " + " · ".join(
+            f"{label} {count/total_weight*100:.1f}%" for label, count in weighted.items()))
+    
+    keywords = keyword_figure(f"{job.id}-{len(frame)}", frame)
+    if keywords is not None:
+        st.plotly_chart(keywords, use_container_width=True, key=f"keywords-{job.id}")
+    
+    # Detailed results
+    st.markdown('<div class="section-header">📝 Detailed Comment Analysis</div>', unsafe_allow_html=True)
+    render_results_table(frame, explainer, job)
+    
+    # Clean up files
+    cleanup_files()
+    st.info("🧹 Temporary files cleaned up successfully!")
+
 def main():
     # Header
     st.markdown('<div class="main-header">📊 YouTube Comment Sentiment Analyzer</div>', unsafe_allow_html=True)
@@ -426,6 +555,61 @@ def main():
         st.header("⚙️ Configuration")
         api_key = st.text_input("NVIDIA API Key", type="password", value="your-api-key-here")
         st.info("💡 Enter your NVIDIA API key for sentiment analysis")
+        model = st.text_input("Model", value=DEFAULT_MODEL)
+        endpoint_specs = st.text_area(
+            "More OpenAI-compatible endpoints (optional)",
+            placeholder="http://localhost:8080/v1 model=llama-3.1-8b weight=2",
+            help="One per line: the base URL, then any of model=, weight=, max_in_flight=, and key= or "
+                 "key_env= (no key is sent otherwise). Requests are spread over NVIDIA and these by weight; "
+                 "an endpoint that is rate limited or failing gets less traffic and the others take over.")
+        extractor_backend = st.selectbox(
+            "Comment extractor",
+            list(EXTRACTOR_BACKENDS),
+            format_func=lambda name: {'selenium': 'Headless Chrome (Selenium)',
+                                      'innertube': 'HTTP continuation pages (InnerTube)'}.get(name, name),
+        )
+        max_comments = st.number_input("Max comments to extract (0 = all)", min_value=0, value=0, step=100)
+        max_minutes = st.number_input("Max extraction time in minutes (0 = no limit)", min_value=0.0,
+                                      value=0.0, step=1.0)
+        include_replies = st.checkbox("Include replies", value=False,
+                                      help="Open every reply thread and analyze the replies too")
+        prune_dom = st.checkbox("Drop read comments from the page", value=False,
+                                disabled=extractor_backend != 'selenium',
+                                help="Removes comment threads from the browser page once they are read, "
+                                     "so Chrome's memory stays flat on long scrapes (Selenium only)")
+        max_in_flight = st.number_input("Concurrent LLM requests", min_value=1, max_value=64, value=8)
+        rate_limit = st.number_input("LLM requests per second (0 = unlimited)", min_value=0.0, value=0.0, step=1.0)
+        batch_size = st.number_input("Comments per LLM request", min_value=1, max_value=50, value=10)
+        explain_all = st.checkbox("Ask the LLM to explain every label", value=False,
+                                  help="Adds key words and reasoning to every answer, which costs more tokens "
+                                       "and time. When off, any comment can still be explained from its result.")
+        use_local_model = st.checkbox("Label obvious comments locally (offline model)", value=True)
+        local_threshold = st.slider("Local model confidence threshold", min_value=0.0, max_value=1.0,
+                                    value=0.5, step=0.05, disabled=not use_local_model,
+                                    help="Comments the local model is less sure about go to the LLM")
+        deduplicate = st.checkbox("Score repeated comments once", value=True,
+                                  help="Exact and near-identical comments reuse the label of the first copy")
+        only_new = st.checkbox("Only analyze comments new since the last run", value=True,
+                               help="Comments already counted in this video's sentiment trend are not "
+                                    "scored again; turn off to analyze every comment")
+        use_cache = st.checkbox("Reuse cached translations and sentiment", value=True)
+        cache = get_result_cache() if use_cache else None
+        if cache is not None:
+            cache_stats = cache.stats()
+            st.caption(f"🗄️ Cache: {cache_stats['entries']} entries · {cache_stats['hits']} hits · "
+                       f"{cache_stats['misses']} misses ({cache_stats['hit_rate']*100:.0f}% hit rate)")
+            if st.button("Clear cache"):
+                cache.clear()
+        
+        job_manager = get_job_manager()
+        jobs = job_manager.jobs()
+        if jobs:
+            st.header("🧵 Analysis Jobs")
+            status_icons = {'queued': '⏳', 'running': '🔄', 'done': '✅', 'failed': '❌'}
+            for listed_job in jobs[:5]:
+                analyzed = len(listed_job.snapshot()[0])
+                st.markdown(f"{status_icons[listed_job.status]} [{listed_job.label}](?job={listed_job.id}) "
+                            f"· {listed_job.status} · {analyzed} analyzed")
         
         st.header("📋 Process Steps")
         st.write("1. 🎬 Extract YouTube comments")
@@ -450,117 +634,54 @@ def main():
                 st.error("❌ Please enter your NVIDIA API key")
                 return
             
-            # Progress tracking
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
             try:
-                # Step 1: Extract comments
-                status_text.info("🎬 Extracting comments from YouTube...")
-                progress_bar.progress(20)
-                
-                extractor = YouTubeCommentExtractor(video_url)
-                comment_count = extractor.extract_comments()
-                
-                st.success(f"✅ Extracted {comment_count} comments successfully!")
-                
-                # Step 2: Translate comments
-                status_text.info("🌐 Translating comments to English...")
-                progress_bar.progress(50)
-                
-                translator = CommentTranslator()
-                translated_count = translator.translate_comments()
-                
-                st.success(f"✅ Translated {translated_count} comments successfully!")
-                
-                # Step 3: Analyze sentiment
-                status_text.info("🎭 Analyzing sentiment...")
-                progress_bar.progress(80)
-                
-                analyzer = SentimentAnalyzer(api_key)
-                results, sentiment_counts = analyzer.analyze_comments()
-                
-                progress_bar.progress(100)
-                status_text.success("🎉 Analysis complete!")
-                
-                # Display results
-                st.markdown('<div class="section-header">📊 Sentiment Analysis Results</div>', unsafe_allow_html=True)
-                
-                # Create charts
-                col_chart1, col_chart2 = st.columns(2)
-                
-                with col_chart1:
-                    # Bar chart
-                    fig_bar = px.bar(
-                        x=list(sentiment_counts.keys()),
-                        y=list(sentiment_counts.values()),
-                        title="Sentiment Distribution",
-                        color=list(sentiment_counts.keys()),
-                        color_discrete_map={
-                            'Positive': '#00CC96',
-                            'Negative': '#EF553B',
-                            'Neutral': '#636EFA'
-                        }
-                    )
-                    fig_bar.update_layout(
-                        xaxis_title="Sentiment",
-                        yaxis_title="Number of Comments",
-                        showlegend=False
-                    )
-                    st.plotly_chart(fig_bar, use_container_width=True)
-                
-                with col_chart2:
-                    # Pie chart
-                    fig_pie = px.pie(
-                        values=list(sentiment_counts.values()),
-                        names=list(sentiment_counts.keys()),
-                        title="Sentiment Percentage",
-                        color=list(sentiment_counts.keys()),
-                        color_discrete_map={
-                            'Positive': '#00CC96',
-                            'Negative': '#EF553B',
-                            'Neutral': '#636EFA'
-                        }
-                    )
-                    st.plotly_chart(fig_pie, use_container_width=True)
-                
-                # Summary statistics
-                total_comments = sum(sentiment_counts.values())
-                col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
-                
-                with col_stat1:
-                    st.metric("Total Comments", total_comments)
-                with col_stat2:
-                    st.metric("Positive", sentiment_counts['Positive'], f"{sentiment_counts['Positive']/total_comments*100:.1f}%")
-                with col_stat3:
-                    st.metric("Negative", sentiment_counts['Negative'], f"{sentiment_counts['Negative']/total_comments*100:.1f}%")
-                with col_stat4:
-                    st.metric("Neutral", sentiment_counts['Neutral'], f"{sentiment_counts['Neutral']/total_comments*100:.1f}%")
-                
-                # Detailed results
-                st.markdown('<div class="section-header">📝 Detailed Comment Analysis</div>', unsafe_allow_html=True)
-                
-                for result in results:
-                    sentiment_color = {
-                        'Positive': '🟢',
-                        'Negative': '🔴',
-                        'Neutral': '🟡'
-                    }
-                    
-                    with st.expander(f"{sentiment_color[result['overall_sentiment']]} Comment {result['statement_number']}: {result['text'][:50]}..."):
-                        st.write(f"**Full Text:** {result['text']}")
-                        st.write(f"**Sentiment:** {result['overall_sentiment']}")
-                        st.write(f"**Confidence:** {result['confidence']}%")
-                        st.write(f"**Key Words:** {result['key_words']}")
-                        st.write(f"**Reasoning:** {result['reasoning']}")
-                
-                # Clean up files
-                cleanup_files()
-                st.info("🧹 Temporary files cleaned up successfully!")
-                
-            except Exception as e:
-                st.error(f"❌ Error during analysis: {str(e)}")
-                cleanup_files()
+                extra_endpoints = [parse_endpoint(line) for line in endpoint_specs.splitlines() if line.strip()]
+            except ValueError as e:
+                st.error(f"❌ {e}")
+                return
+            
+            # Progress is saved per video so a failed run can pick up where it stopped
+            video_id = extract_video_id(video_url)
+            checkpoint = RunCheckpoint(video_id) if video_id else None
+            resuming = checkpoint is not None and checkpoint.exists()
+            saved = checkpoint.summary() if resuming else None
+            extractor_options = {
+                'max_comments': int(max_comments) or None,
+                'max_seconds': max_minutes * 60 or None,
+                'expand_replies': include_replies,
+            }
+            if extractor_backend == 'selenium':
+                extractor_options['prune_dom'] = prune_dom
+            analyzer_options = {
+                'model': model,
+                'endpoints': [LLMEndpoint(api_key=api_key, model=model)] + extra_endpoints if extra_endpoints else None,
+                'max_in_flight': int(max_in_flight),
+                'rate_limit': rate_limit or None,
+                'batch_size': int(batch_size),
+                'detail': 'full' if explain_all else 'compact',
+                'local_model': get_local_model() if use_local_model else None,
+                'local_threshold': local_threshold,
+            }
+            # Runs in the background, so reruns and other sessions can follow the same job
+            job, created = job_manager.submit(video_id or video_url, run_analysis, video_url,
+                                              extractor_backend, extractor_options, api_key, cache,
+                                              analyzer_options, checkpoint, deduplicate=deduplicate,
+                                              trends=get_trend_store().video(video_id) if video_id else None,
+                                              only_new=only_new, label=video_id or video_url)
+            if not created:
+                st.info("👥 This video is already being analyzed; showing the shared run")
+            elif resuming:
+                st.info(f"♻️ Resuming unfinished run: {saved['scored']} comments already analyzed, "
+                        f"{saved['to_score'] + saved['to_translate']} in progress"
+                        f"{'' if saved['extraction_complete'] else ', extraction continues after comment ' + str(saved['extracted'])}")
+            st.session_state['job_id'] = job.id
+            st.query_params['job'] = job.id
+        
+        # Follow the job started in this session, or the one named in the URL
+        job_id = st.session_state.get('job_id') or st.query_params.get('job')
+        job = job_manager.get(job_id) if job_id else None
+        if job is not None:
+            show_job(job, cache, get_explainer(api_key, model, endpoint_specs, cache))
     
     with col2:
         st.markdown('<div class="section-header">ℹ️ Instructions</div>', unsafe_allow_html=True)
@@ -0,0 +1,219 @@
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+from openai import DefaultHttpxClient, OpenAI
+
+DEFAULT_BASE_URL = "https://integrate.api.nvidia.com/v1"
+DEFAULT_MODEL = "meta/llama-3.1-8b-instruct"
+
+def retry_after(error):
+    """Seconds a throttled response asks the client to wait, or None"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    for name, scale in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+        try:
+            return max(0.0, float(headers.get(name)) * scale)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class LLMEndpoint:
+    """One OpenAI-compatible chat completions server: a hosted API such as
+    NVIDIA's, or a local llama.cpp or vLLM server (which take any key).
+
+    `weight` is its share of the traffic relative to the other endpoints
+    of a pool, and `max_in_flight` the most requests it is sent at once
+    (the pool's default when None). The rest is state kept by the pool,
+    so an endpoint belongs to one pool. Unless given an `http_client` of
+    its own, it is connected through that pool's connection pool."""
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, api_key=None, model=DEFAULT_MODEL, weight=1.0,
+                 max_in_flight=None, name=None, timeout=60.0, http_client=None):
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.weight = float(weight)
+        self.max_in_flight = max_in_flight
+        self.name = name or urlparse(self.base_url).netloc or self.base_url
+        self.api_key = api_key or 'none'
+        self.timeout = timeout
+        # Set by connect(), here or by the pool the endpoint joins
+        self.client = None
+        if http_client is not None:
+            self.connect(http_client)
+        # Cleared when the server rejects a response schema
+        self.structured_output = True
+        # Current concurrency limit, requests in flight, and when the
+        # endpoint may be used again after a 429 or repeated failures
+        self.limit = None
+        # Limit at the last 429, above which the limit grows more carefully
+        self.throttled_at = None
+        self.in_flight = 0
+        self.available_at = 0.0
+        # Throttled and failed calls in a row
+        self.throttles = 0
+        self.failures = 0
+        self.counts = {'ok': 0, 'throttled': 0, 'error': 0}
+
+    def connect(self, http_client):
+        self.client = OpenAI(
+            base_url=self.base_url,
+            api_key=self.api_key,
+            # The analyzer retries (and fails over) itself
+            max_retries=0,
+            timeout=self.timeout,
+            http_client=http_client,
+        )
+
+    def __repr__(self):
+        return f"LLMEndpoint({self.name!r}, model={self.model!r}, weight={self.weight:g})"
+
+
+def parse_endpoint(spec):
+    """LLMEndpoint from a one-line spec: the base URL followed by optional
+    key=value settings, e.g.
+        http://localhost:8080/v1 model=llama-3.1-8b weight=3 max_in_flight=4
+    The API key is given with key=... or read from an environment variable
+    with key_env=NAME; without either, none is sent."""
+    parts = spec.split()
+    if not parts or not parts[0].startswith(('http://', 'https://')):
+        raise ValueError(f"Endpoint spec must start with an http(s) base URL: {spec!r}")
+    options = {}
+    for part in parts[1:]:
+        name, separator, value = part.partition('=')
+        if not separator:
+            raise ValueError(f"Expected key=value in endpoint spec, got {part!r}")
+        options[name] = value
+    unknown = set(options) - {'model', 'weight', 'key', 'key_env', 'max_in_flight', 'name'}
+    if unknown:
+        raise ValueError(f"Unknown endpoint settings: {', '.join(sorted(unknown))}")
+    api_key = options.get('key') or (os.environ.get(options['key_env']) if 'key_env' in options else None)
+    try:
+        return LLMEndpoint(parts[0], api_key=api_key, model=options.get('model', DEFAULT_MODEL),
+                           weight=float(options.get('weight', 1)),
+                           max_in_flight=int(options['max_in_flight']) if 'max_in_flight' in options else None,
+                           name=options.get('name'))
+    except ValueError as e:
+        raise ValueError(f"Invalid endpoint spec {spec!r}: {e}")
+
+
+class EndpointPool:
+    """Spreads LLM requests over several endpoints.
+
+    Each request goes to the endpoint with the fewest requests in flight
+    relative to its weight, among those below their concurrency limit
+    and not cooling down. Limits adapt per endpoint (AIMD): a 429 halves
+    the limit and rests the endpoint for Retry-After, or an exponential
+    backoff, while every successful call grows it back towards
+    max_in_flight by 1/limit, and probe_slowdown times slower close to
+    the limit that last drew a 429. `failure_threshold` hard failures in a
+    row take an endpoint out of rotation for `cooldown` seconds, after
+    which it is tried again, as long as another endpoint still works.
+    When no endpoint can take a request, acquire() waits for one, so
+    throttling on one provider moves traffic to the others instead of
+    stalling it.
+
+    Endpoints without an HTTP client of their own share one connection
+    pool, which keeps connections alive for as long as the pool lives.
+    The pool owns it: close() shuts it, and nothing else should."""
+
+    def __init__(self, endpoints, max_in_flight=8, failure_threshold=3, cooldown=30.0,
+                 backoff=1.0, max_backoff=30.0, probe_slowdown=10):
+        self.endpoints = list(endpoints)
+        if not self.endpoints:
+            raise ValueError("An endpoint pool needs at least one endpoint")
+        names = set()
+        self._http_client = None
+        for endpoint in self.endpoints:
+            if endpoint.client is None:
+                if self._http_client is None:
+                    self._http_client = DefaultHttpxClient()
+                endpoint.connect(self._http_client)
+            # Endpoints on the same host are told apart in metrics by model, then position
+            if endpoint.name in names:
+                endpoint.name = f"{endpoint.name}/{endpoint.model}"
+            if endpoint.name in names:
+                endpoint.name = f"{endpoint.name}#{len(names)}"
+            names.add(endpoint.name)
+            endpoint.max_in_flight = max(1, int(endpoint.max_in_flight or max_in_flight))
+            endpoint.limit = float(endpoint.max_in_flight)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.probe_slowdown = probe_slowdown
+        self._condition = threading.Condition()
+
+    @property
+    def model(self):
+        """Model name(s) answers may come from, as part of cache keys"""
+        return '+'.join(sorted({endpoint.model for endpoint in self.endpoints}))
+
+    def acquire(self, avoid=()):
+        """Claim an endpoint for one request, waiting until one is free.
+        Endpoints in `avoid` (say, ones that just failed this request) are
+        only picked when no other can take it."""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                ready = [endpoint for endpoint in self.endpoints
+                         if endpoint.available_at <= now and endpoint.in_flight < int(endpoint.limit)]
+                candidates = [endpoint for endpoint in ready if endpoint not in avoid] or ready
+                if candidates:
+                    endpoint = min(candidates, key=lambda e: ((e.in_flight + 1) / e.weight, -e.weight))
+                    endpoint.in_flight += 1
+                    return endpoint
+                resting = [endpoint.available_at for endpoint in self.endpoints if endpoint.available_at > now]
+                self._condition.wait(min(resting) - now if resting else None)
+
+    def release(self, endpoint, outcome, wait=None):
+        """Return an endpoint claimed with acquire(), saying how the call
+        went: 'ok', 'throttled' (with the server's Retry-After as `wait`,
+        if any), 'error', or None when the endpoint was not to blame"""
+        with self._condition:
+            endpoint.in_flight -= 1
+            now = time.monotonic()
+            if outcome == 'ok':
+                endpoint.throttles = endpoint.failures = 0
+                step = 1 / endpoint.limit
+                if endpoint.throttled_at is not None and endpoint.limit >= endpoint.throttled_at - 1:
+                    step /= self.probe_slowdown
+                endpoint.limit = min(float(endpoint.max_in_flight), endpoint.limit + step)
+            elif outcome == 'throttled':
+                endpoint.throttles += 1
+                # Calls already in flight when the first 429 came in are not
+                # told to back off again
+                if endpoint.available_at <= now:
+                    endpoint.throttled_at = endpoint.limit
+                    endpoint.limit = max(1.0, endpoint.limit / 2)
+                if wait is None:
+                    wait = min(self.max_backoff, self.backoff * 2 ** (endpoint.throttles - 1))
+                    wait *= random.uniform(0.5, 1.5)
+                endpoint.available_at = max(endpoint.available_at, now + wait)
+            elif outcome == 'error':
+                endpoint.failures += 1
+                # The last working endpoint stays in rotation; callers back off instead
+                healthy = [other for other in self.endpoints
+                           if other is not endpoint and other.failures < self.failure_threshold]
+                if endpoint.failures >= self.failure_threshold and healthy:
+                    endpoint.available_at = max(endpoint.available_at, now + self.cooldown)
+            if outcome in endpoint.counts:
+                endpoint.counts[outcome] += 1
+            self._condition.notify_all()
+
+    def stats(self):
+        """Per endpoint: weight, current concurrency limit and calls by outcome"""
+        with self._condition:
+            return [{'endpoint': endpoint.name, 'model': endpoint.model, 'weight': endpoint.weight,
+                     'limit': round(endpoint.limit, 1), **endpoint.counts}
+                    for endpoint in self.endpoints]
+
+    def close(self):
+        """Close the connection pool the endpoints share. Endpoints that
+        came with their own http_client are left to whoever made it."""
+        if self._http_client is not None:
+            self._http_client.close()
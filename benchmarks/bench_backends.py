@@ -0,0 +1,66 @@
+"""Throughput of one throttling provider against a pool that adds a second
+endpoint, and failover when one endpoint is down.
+
+Run from the repository root:
+    python -m benchmarks.bench_backends --comments 400 --hosted-limit 4
+
+The "hosted" stub answers 429 (with Retry-After) to requests beyond
+--hosted-limit at once; the "local" stub, like a llama.cpp or vLLM
+server, has no limit but is --local-slowdown times slower. Every run
+keeps --in-flight requests going in total.
+"""
+import argparse
+import time
+
+from backends import LLMEndpoint
+from benchmarks.corpus import make_comments
+from benchmarks.stubs import OpenAIStubServer
+from metrics import Metrics
+from sentiment import SentimentAnalyzer
+
+
+def run(statements, endpoints, args):
+    metrics = Metrics()
+    analyzer = SentimentAnalyzer(None, endpoints=endpoints, max_in_flight=args.in_flight,
+                                 backoff=args.backoff, metrics=metrics)
+    start = time.perf_counter()
+    analyses = analyzer.score_statements(statements)
+    elapsed = time.perf_counter() - start
+    failed = sum(analysis['sentiment'] == 'Error' for analysis in analyses)
+    return elapsed, failed, analyzer.backends.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--comments', type=int, default=400)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--hosted-limit', type=int, default=4, help="Concurrent requests before the hosted stub 429s")
+    parser.add_argument('--retry-after', type=float, default=0.2)
+    parser.add_argument('--local-slowdown', type=float, default=2.0)
+    parser.add_argument('--local-weight', type=float, default=1.0)
+    parser.add_argument('--in-flight', type=int, default=16)
+    parser.add_argument('--backoff', type=float, default=0.2)
+    args = parser.parse_args()
+
+    statements = make_comments(args.comments)
+    print(f"{'scenario':>16} {'seconds':>8} {'comments/s':>11} {'failed':>7}  endpoints (ok/429/error, final limit)")
+    with OpenAIStubServer(latency=args.latency, max_concurrent=args.hosted_limit,
+                          retry_after=args.retry_after) as hosted, \
+            OpenAIStubServer(latency=args.latency * args.local_slowdown) as local, \
+            OpenAIStubServer(latency=args.latency, error_rate=1.0) as down:
+        scenarios = (
+            ('hosted only', lambda: [LLMEndpoint(hosted.base_url, name='hosted')]),
+            ('hosted + local', lambda: [LLMEndpoint(hosted.base_url, name='hosted'),
+                                        LLMEndpoint(local.base_url, name='local', weight=args.local_weight)]),
+            ('hosted + down', lambda: [LLMEndpoint(hosted.base_url, name='hosted'),
+                                       LLMEndpoint(down.base_url, name='down')]),
+        )
+        for name, endpoints in scenarios:
+            elapsed, failed, stats = run(statements, endpoints(), args)
+            per_endpoint = "  ".join(f"{row['endpoint']} {row['ok']}/{row['throttled']}/{row['error']} "
+                                     f"({row['limit']:g})" for row in stats)
+            print(f"{name:>16} {elapsed:>8.2f} {len(statements) / elapsed:>11.1f} {failed:>7}  {per_endpoint}")
+
+
+if __name__ == '__main__':
+    main()
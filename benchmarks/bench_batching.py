@@ -0,0 +1,55 @@
+"""Compare tokens and latency per comment for single vs batched prompts.
+
+Run from the repository root:
+    python -m benchmarks.bench_batching --comments 200 --batch-sizes 1 5 10 20
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.corpus import make_comments
+from benchmarks.stubs import OpenAIStubServer, sentiment_responder
+from sentiment import SentimentAnalyzer
+
+
+def dropping_responder(drop_rate, seed=0):
+    """Batch responder that loses a fraction of items to exercise the re-ask"""
+    rng = random.Random(seed)
+
+    def respond(prompt):
+        answer = sentiment_responder(prompt)
+        if 'COMMENTS:' not in prompt:
+            return answer
+        items = [item for item in json.loads(answer)['results'] if rng.random() >= drop_rate]
+        return json.dumps({'results': items})
+    return respond
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--comments', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 5, 10, 20])
+    parser.add_argument('--in-flight', type=int, default=4)
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help="fraction of batch items the stub omits")
+    args = parser.parse_args()
+
+    statements = make_comments(args.comments)
+    print(f"{'batch':>6} {'requests':>9} {'prompt tok/c':>13} {'output tok/c':>13} {'ms/comment':>11}")
+    for batch_size in args.batch_sizes:
+        with OpenAIStubServer(latency=args.latency, responder=dropping_responder(args.drop_rate)) as stub:
+            analyzer = SentimentAnalyzer("stub-key", base_url=stub.base_url,
+                                         max_in_flight=args.in_flight, batch_size=batch_size)
+            start = time.perf_counter()
+            analyses = analyzer.score_statements(statements)
+            elapsed = time.perf_counter() - start
+            assert len(analyses) == len(statements)
+            n = len(statements)
+            print(f"{batch_size:>6} {stub.requests:>9} {stub.prompt_tokens / n:>13.1f} "
+                  f"{stub.completion_tokens / n:>13.1f} {elapsed / n * 1000:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Browser cost per video: a fresh Chrome per video vs the warm WebDriverPool.
+
+Needs a local Chrome; pages come from the InnerTube stub, so no network
+is used once the driver path is cached. Run from the repository root:
+    python -m benchmarks.bench_browser_pool --videos 10
+"""
+import argparse
+import time
+
+from benchmarks.corpus import make_comments
+from benchmarks.stubs import InnerTubeStubServer
+from browser import WebDriverPool, launch_chrome, resolve_driver_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--videos', type=int, default=10)
+    parser.add_argument('--max-pages', type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    resolve_driver_path()
+    resolve_seconds = time.perf_counter() - start
+
+    with InnerTubeStubServer(make_comments(20)) as stub:
+        urls = [f"{stub.url}/watch?v=video{i:06d}" for i in range(args.videos)]
+
+        start = time.perf_counter()
+        for url in urls:
+            driver = launch_chrome()
+            try:
+                driver.get(url)
+            finally:
+                driver.quit()
+        fresh = time.perf_counter() - start
+
+        pool = WebDriverPool(size=1, max_pages=args.max_pages)
+        start = time.perf_counter()
+        try:
+            for url in urls:
+                with pool.driver() as driver:
+                    driver.get(url)
+        finally:
+            pool.close()
+        pooled = time.perf_counter() - start
+
+    print(f"driver path resolved in {resolve_seconds:.2f}s")
+    print(f"{'mode':>8} {'s/video':>9} {'launches':>9}")
+    print(f"{'fresh':>8} {fresh / args.videos:>9.2f} {args.videos:>9}")
+    print(f"{'pooled':>8} {pooled / args.videos:>9.2f} {pool.launched:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""LLM and translation requests with and without deduplication of repeated
+comments, through the streaming pipeline.
+
+Run from the repository root:
+    python -m benchmarks.bench_dedup --comments 2000 --repeat 0.6
+
+Every comment goes through the real translator and analyzer against the
+local stubs (no offline tier), so the request counts are what dedup saves.
+"Agreement" is how often a duplicate's copied label matches the label it
+gets when scored on its own. The corpus includes --opposites comments that
+are near-identical to another but say the opposite ("really good" /
+"really bad"); grouping those would show up as disagreement.
+"""
+import argparse
+import time
+
+from benchmarks.corpus import make_repetitive_comments
+from benchmarks.stubs import InnerTubeStubServer, OpenAIStubServer, TranslateStubServer
+from dedup import CommentDeduplicator
+from extractor import get_extractor
+from pipeline import StreamingPipeline
+from sentiment import SentimentAnalyzer
+from translator import CommentTranslator
+
+
+def run(comments, args, deduplicator):
+    with InnerTubeStubServer(comments, latency=args.page_latency) as pages, \
+            TranslateStubServer(latency=args.latency) as translate, \
+            OpenAIStubServer(latency=args.latency) as llm:
+        extractor = get_extractor('https://youtu.be/dQw4w9WgXcQ', backend='innertube', base_url=pages.url)
+        # detector=False sends every comment to the translate stub, as for a non-English video
+        translator = CommentTranslator(url=translate.translate_url, detector=False)
+        analyzer = SentimentAnalyzer("stub-key", base_url=llm.base_url, batch_size=args.batch_size)
+        pipeline = StreamingPipeline(extractor, translator, analyzer, deduplicator=deduplicator)
+        start = time.perf_counter()
+        records = list(pipeline.run())
+        elapsed = time.perf_counter() - start
+    assert len(records) == len(comments)
+    return records, pipeline.stats, translate.requests, llm.requests, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--comments', type=int, default=2000)
+    parser.add_argument('--repeat', type=float, default=0.6, help="Fraction of comments copied from spam lines")
+    parser.add_argument('--opposites', type=float, default=0.05,
+                        help="Fraction of comments from near-identical pairs with opposite sentiment")
+    parser.add_argument('--threshold', type=float, default=0.85)
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--page-latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    comments = make_repetitive_comments(args.comments, repeat=args.repeat, opposites=args.opposites)
+    baseline, _, translate_requests, llm_requests, elapsed = run(comments, args, None)
+    deduplicator = CommentDeduplicator(threshold=args.threshold)
+    deduped, stats, dedup_translate, dedup_llm, dedup_elapsed = run(comments, args, deduplicator)
+
+    labels = {record['index']: record['sentiment'] for record in baseline}
+    duplicates = [record for record in deduped if record['duplicate_of'] is not None]
+    agreement = sum(labels[record['index']] == record['sentiment'] for record in duplicates)
+
+    print(f"{'mode':>8} {'translate reqs':>15} {'llm reqs':>9} {'seconds':>8}")
+    print(f"{'off':>8} {translate_requests:>15} {llm_requests:>9} {elapsed:>8.2f}")
+    print(f"{'on':>8} {dedup_translate:>15} {dedup_llm:>9} {dedup_elapsed:>8.2f}")
+    groups = deduplicator.stats()
+    print(f"deduplicated: {stats['deduplicated']} of {len(comments)} "
+          f"({groups['exact']} exact, {groups['near']} near, {groups['kept_apart']} kept apart)  "
+          f"groups: {groups['groups']}  "
+          f"agreement: {agreement / max(len(duplicates), 1) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
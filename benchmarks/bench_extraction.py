@@ -0,0 +1,53 @@
+"""Time the InnerTube extractor against the local continuation-page stub.
+
+Run from the repository root:
+    python -m benchmarks.bench_extraction --comments 2000 --page-size 20 --latency 0.05
+
+With --replies-every N, every Nth comment gets a reply thread of
+--replies replies, and the extractor is told to expand them.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.corpus import make_comments
+from benchmarks.stubs import InnerTubeStubServer
+from extractor import get_extractor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--comments', type=int, default=2000)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--layout', choices=('entity', 'renderer'), default='entity')
+    parser.add_argument('--replies-every', type=int, default=0)
+    parser.add_argument('--replies', type=int, default=5)
+    args = parser.parse_args()
+
+    comments = make_comments(args.comments)
+    replies = {}
+    if args.replies_every:
+        for position in range(0, len(comments), args.replies_every):
+            replies[position] = [f"Reply {n} to comment {position}" for n in range(args.replies)]
+    total = len(comments) + sum(len(texts) for texts in replies.values())
+    with InnerTubeStubServer(comments, page_size=args.page_size, layout=args.layout,
+                             latency=args.latency, replies=replies) as stub, tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            extractor = get_extractor('https://youtu.be/dQw4w9WgXcQ', backend='innertube', base_url=stub.url,
+                                      expand_replies=bool(replies))
+            start = time.perf_counter()
+            count = extractor.extract_comments()
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    print(f"comments: {count}/{total}  requests: {stub.requests}  "
+          f"seconds: {elapsed:.2f}  comments/s: {count / elapsed:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Reading comments off a loaded page: one WebDriver call per element
+(find_elements + .text) vs one execute_script per step, and how big the
+DOM grows with and without pruning.
+
+Needs a local Chrome. Run from the repository root:
+    python -m benchmarks.bench_harvest --comments 2000
+"""
+import argparse
+import time
+from contextlib import nullcontext
+
+from selenium.webdriver.common.by import By
+
+from benchmarks.corpus import make_comments
+from benchmarks.stubs import LazyPageStubServer
+from browser import WebDriverPool
+from extractor import COMMENT_SELECTOR, CONTINUATION_SELECTOR, HARVEST_JS, YouTubeCommentExtractor
+
+DOM_SIZE_JS = "return document.getElementsByTagName('*').length"
+PENDING_JS = "return document.querySelectorAll(arguments[0]).length"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--comments', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=50)
+    args = parser.parse_args()
+
+    comments = [f"Fixture comment {i}: {text}" for i, text in enumerate(make_comments(args.comments), 1)]
+    pool = WebDriverPool(size=1)
+    try:
+        with LazyPageStubServer(comments, batch=args.batch, delay=0.05) as stub:
+            url = f"{stub.url}/watch?v=fixture0001"
+
+            # Load everything once, then time the two ways of reading it back
+            with pool.driver() as driver:
+                driver.get(url)
+                while driver.execute_script(PENDING_JS, CONTINUATION_SELECTOR):
+                    driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
+                    time.sleep(0.05)
+
+                start = time.perf_counter()
+                per_element = [element.text for element in driver.find_elements(By.CSS_SELECTOR, COMMENT_SELECTOR)]
+                per_element_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                bulk = driver.execute_script(HARVEST_JS, COMMENT_SELECTOR, False)
+                bulk_seconds = time.perf_counter() - start
+
+            # Whole scrapes, recording the DOM size at the end
+            sizes = {}
+            for prune in (False, True):
+                with pool.driver() as driver:
+                    extractor = YouTubeCommentExtractor(url, pool=_Borrowed(driver), prune_dom=prune)
+                    found = list(extractor.iter_records())
+                    sizes[prune] = (len(found), driver.execute_script(DOM_SIZE_JS))
+    finally:
+        pool.close()
+
+    print(f"{'read':>14} {'seconds':>8} {'comments':>9}")
+    print(f"{'per element':>14} {per_element_seconds:>8.2f} {len(per_element):>9}")
+    print(f"{'one script':>14} {bulk_seconds:>8.2f} {len(bulk):>9}")
+    print()
+    print(f"{'scrape':>14} {'comments':>9} {'DOM nodes':>10}")
+    for prune, (found, nodes) in sizes.items():
+        print(f"{'pruned' if prune else 'kept':>14} {found:>9} {nodes:>10}")
+
+
+class _Borrowed:
+    """Hands one already-borrowed driver to an extractor, so the page can
+    be inspected after the scrape"""
+
+    def __init__(self, driver):
+        self._driver = driver
+
+    def driver(self):
+        return nullcontext(self._driver)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Translation calls saved by local language detection on a mixed-language corpus.
+
+Run from the repository root:
+    python -m benchmarks.bench_language --comments 1000
+"""
+import argparse
+import time
+
+from benchmarks.corpus import ENGLISH, FOREIGN, MIXED, make_comments
+from benchmarks.stubs import TranslateStubServer
+from language import LanguageDetector
+from store import make_record
+from translator import CommentTranslator
+
+
+def expected_language(text):
+    base = text.rsplit(' #', 1)[0]
+    if base in FOREIGN:
+        return FOREIGN[base][1]
+    return 'en' if base in ENGLISH else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--comments', type=int, default=1000)
+    parser.add_argument('--pack-size', type=int, default=1,
+                        help="comments per translate request (1 counts calls per comment)")
+    args = parser.parse_args()
+
+    comments = make_comments(args.comments, pool=MIXED)
+
+    detector = LanguageDetector()
+    start = time.perf_counter()
+    detections = [detector.detect(text) for text in comments]
+    detect_seconds = time.perf_counter() - start
+    correct = sum(language == expected_language(text) for text, (language, _) in zip(comments, detections))
+    print(f"detection: {len(comments) / detect_seconds:,.0f} comments/s, "
+          f"{correct / len(comments) * 100:.1f}% match the corpus label")
+
+    print(f"{'detector':>9} {'requests':>9} {'skipped':>8} {'english comments':>17}")
+    english = sum(expected_language(text) == 'en' for text in comments)
+    for enabled in (False, True):
+        with TranslateStubServer() as stub:
+            translator = CommentTranslator(url=stub.translate_url, max_pack_size=args.pack_size,
+                                           detector=None if enabled else False)
+            records = [make_record(index=i, original=text) for i, text in enumerate(comments, 1)]
+            translator.translate_records(records)
+            skipped = sum(record['translation_status'] == 'skipped' for record in records)
+            print(f"{'on' if enabled else 'off':>9} {stub.requests:>9} {skipped:>8} {english:>17}")
+
+
+if __name__ == '__main__':
+    main()
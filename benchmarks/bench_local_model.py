@@ -0,0 +1,73 @@
+"""Escalation rate and LLM agreement of the local sentiment tier.
+
+Run from the repository root:
+    python -m benchmarks.bench_local_model --thresholds 0.3 0.5 0.7
+
+By default the LLM is the stub, a keyword matcher that never sees the
+fixture labels. Its answers say nothing about how a real model would label
+the comments, so agreement with the LLM ("local=LLM") is only reported
+with --base-url/--api-key pointing at a real model; against the stub,
+compare with the hand-assigned fixture labels ("local=gold").
+"""
+import argparse
+import contextlib
+import json
+import os
+import time
+
+from benchmarks.stubs import OpenAIStubServer
+from local_model import LexiconSentimentModel
+from sentiment import SentimentAnalyzer
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'labeled_comments.jsonl')
+
+
+def load_fixture(path=FIXTURE):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--fixture', default=FIXTURE)
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.3, 0.5, 0.7])
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--base-url', default=None, help="OpenAI-compatible endpoint to use instead of the stub")
+    parser.add_argument('--api-key', default=os.environ.get('NVIDIA_API_KEY', 'stub-key'))
+    args = parser.parse_args()
+
+    rows = load_fixture(args.fixture)
+    texts = [row['text'] for row in rows]
+    gold = [row['label'] for row in rows]
+
+    model = LexiconSentimentModel()
+    start = time.perf_counter()
+    model.predict(texts * 100)
+    local_rate = len(texts) * 100 / (time.perf_counter() - start)
+    print(f"local model: {local_rate:,.0f} comments/s on one CPU")
+
+    stub = OpenAIStubServer(latency=args.latency)
+    with stub if args.base_url is None else contextlib.nullcontext():
+        base_url = args.base_url or stub.base_url
+        llm_only = SentimentAnalyzer(args.api_key, base_url=base_url)
+        llm_labels = [a['sentiment'] for a in llm_only.score_statements(texts)]
+        print(f"{'LLM' if args.base_url else 'Stub LLM'} only: {llm_only.tier_counts['llm']} comments sent, "
+              f"{sum(l == g for l, g in zip(llm_labels, gold)) / len(rows) * 100:.1f}% match the fixture labels")
+
+        print(f"{'threshold':>10} {'escalated':>10}" + (f" {'local=LLM':>10}" if args.base_url else "") +
+              f" {'local=gold':>11} {'overall=gold':>13} {'LLM calls':>10}")
+        for threshold in args.thresholds:
+            analyzer = SentimentAnalyzer(args.api_key, base_url=base_url,
+                                         local_model=model, local_threshold=threshold)
+            analyses = analyzer.score_statements(texts)
+            local = [i for i, a in enumerate(analyses) if a['scored_by'] == 'local']
+            agree_llm = sum(analyses[i]['sentiment'] == llm_labels[i] for i in local) / len(local) if local else 1.0
+            agree_gold = sum(analyses[i]['sentiment'] == gold[i] for i in local) / len(local) if local else 1.0
+            overall = sum(a['sentiment'] == g for a, g in zip(analyses, gold)) / len(rows)
+            print(f"{threshold:>10.2f} {analyzer.escalation_rate() * 100:>9.1f}%" +
+                  (f" {agree_llm * 100:>9.1f}%" if args.base_url else "") +
+                  f" {agree_gold * 100:>10.1f}% {overall * 100:>12.1f}% {analyzer.tier_counts['llm']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Time-to-first-result and total time, staged vs streaming pipeline.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline --comments 500 --page-latency 0.2
+"""
+import argparse
+import time
+
+from benchmarks.corpus import make_comments
+from benchmarks.stubs import InnerTubeStubServer, OpenAIStubServer
+from extractor import get_extractor
+from pipeline import StreamingPipeline
+from sentiment import SentimentAnalyzer
+
+
+class PassthroughTranslator:
+    """Stands in for CommentTranslator so only extraction and scoring are timed"""
+
+    def translate_records(self, records):
+        for record in records:
+            record['translation'] = record['original']
+        return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--comments', type=int, default=500)
+    parser.add_argument('--page-latency', type=float, default=0.2)
+    parser.add_argument('--llm-latency', type=float, default=0.05)
+    parser.add_argument('--batch-size', type=int, default=10)
+    args = parser.parse_args()
+
+    comments = make_comments(args.comments)
+    with InnerTubeStubServer(comments, latency=args.page_latency) as pages, \
+            OpenAIStubServer(latency=args.llm_latency) as llm:
+        def analyzer():
+            return SentimentAnalyzer("stub-key", base_url=llm.base_url, batch_size=args.batch_size)
+
+        def extractor():
+            return get_extractor('https://youtu.be/dQw4w9WgXcQ', backend='innertube', base_url=pages.url)
+
+        # Staged: nothing is scored until every page has been fetched
+        start = time.perf_counter()
+        texts = list(extractor().iter_comments())
+        analyses = analyzer().score_statements(texts)
+        staged_total = time.perf_counter() - start
+        assert len(analyses) == len(comments)
+
+        pipeline = StreamingPipeline(extractor(), PassthroughTranslator(), analyzer())
+        records = list(pipeline.run())
+        assert len(records) == len(comments)
+
+    print(f"{'mode':>10} {'first result s':>15} {'total s':>9}")
+    print(f"{'staged':>10} {staged_total:>15.2f} {staged_total:>9.2f}")
+    print(f"{'streaming':>10} {pipeline.stats['first_result_seconds']:>15.2f} {pipeline.stats['elapsed']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""Compare sequential and concurrent sentiment scoring against a local stub.
+
+Run from the repository root:
+    python -m benchmarks.bench_scoring --comments 200 --latency 0.05
+"""
+import argparse
+
+from benchmarks.corpus import make_comments
+from benchmarks.stubs import OpenAIStubServer
+from sentiment import SentimentAnalyzer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--comments', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--in-flight', type=int, nargs='+', default=[1, 4, 16, 32])
+    parser.add_argument('--rate-limit', type=float, default=None)
+    args = parser.parse_args()
+
+    statements = make_comments(args.comments)
+
+    with OpenAIStubServer(latency=args.latency) as stub:
+        print(f"{'in-flight':>10} {'seconds':>10} {'comments/s':>12}")
+        for in_flight in args.in_flight:
+            analyzer = SentimentAnalyzer("stub-key", base_url=stub.base_url,
+                                         max_in_flight=in_flight, rate_limit=args.rate_limit)
+            analyses = analyzer.score_statements(statements)
+            assert len(analyses) == len(statements)
+            print(f"{in_flight:>10} {len(statements) / analyzer.throughput:>10.2f} {analyzer.throughput:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
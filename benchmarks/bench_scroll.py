@@ -0,0 +1,77 @@
+"""Scrape time and coverage: the old fixed-sleep scroll loop vs the
+event-driven one, on the local lazy-loading comment page.
+
+Every `--slow-every`-th batch takes `--slow-delay` seconds, longer than the
+old loop's 2 s pause, like a slow network. Needs a local Chrome.
+Run from the repository root:
+    python -m benchmarks.bench_scroll --comments 200 --batch 20 --delay 0.3
+"""
+import argparse
+import time
+
+from selenium.webdriver.common.by import By
+
+from benchmarks.corpus import make_comments
+from benchmarks.stubs import LazyPageStubServer
+from browser import WebDriverPool
+from extractor import YouTubeCommentExtractor
+
+
+def fixed_sleep_scrape(driver, url):
+    """The scroll loop as it was: fixed sleeps, stop at the first unchanged height"""
+    driver.get(url)
+    time.sleep(5)
+    driver.execute_script("window.scrollTo(0, 800);")
+    time.sleep(3)
+    last_height = driver.execute_script("return document.documentElement.scrollHeight")
+    while True:
+        driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
+        time.sleep(2)
+        new_height = driver.execute_script("return document.documentElement.scrollHeight")
+        if new_height == last_height:
+            break
+        last_height = new_height
+    texts = [element.text.strip() for element in driver.find_elements(By.XPATH, '//*[@id="content-text"]')]
+    # The old selector also matched the description; drop it, as the extractor did
+    return [text for text in texts if text][1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--comments', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=20)
+    parser.add_argument('--delay', type=float, default=0.3)
+    parser.add_argument('--slow-every', type=int, default=4)
+    parser.add_argument('--slow-delay', type=float, default=3.0)
+    args = parser.parse_args()
+
+    # Numbered so coverage counts distinct comments
+    comments = [f"Fixture comment {i}: {text}" for i, text in enumerate(make_comments(args.comments), 1)]
+    pool = WebDriverPool(size=1)
+    rows = []
+    try:
+        with LazyPageStubServer(comments, batch=args.batch, delay=args.delay,
+                                slow_every=args.slow_every, slow_delay=args.slow_delay) as stub:
+            url = f"{stub.url}/watch?v=fixture0001"
+            # Warm the browser so neither mode pays for Chrome startup
+            with pool.driver() as driver:
+                driver.get("about:blank")
+
+            start = time.perf_counter()
+            with pool.driver() as driver:
+                found = fixed_sleep_scrape(driver, url)
+            rows.append(('fixed sleep', time.perf_counter() - start, len(set(found))))
+
+            start = time.perf_counter()
+            found = [record['original'] for record in YouTubeCommentExtractor(url, pool=pool).iter_records()]
+            rows.append(('adaptive', time.perf_counter() - start, len(set(found))))
+    finally:
+        pool.close()
+
+    print(f"{'mode':>12} {'seconds':>8} {'coverage':>9}")
+    for mode, seconds, found in rows:
+        print(f"{mode:>12} {seconds:>8.2f} {found:>4}/{len(comments):<4}")
+
+
+if __name__ == '__main__':
+    main()
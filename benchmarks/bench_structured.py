@@ -0,0 +1,75 @@
+"""Compare output tokens and latency of compact (label + confidence) and
+full (with key words and reasoning) answers, and how re-asking recovers
+from malformed ones.
+
+Run from the repository root:
+    python -m benchmarks.bench_structured --comments 200 --batch-sizes 1 10
+    python -m benchmarks.bench_structured --comments 200 --garble-rate 0.2
+
+The stub charges --token-latency per output token on top of --latency, as
+generation does on a real server. With --garble-rate, that fraction of
+answers comes back truncated, with an unknown label or without a
+confidence, and the re-ask has to fix them.
+"""
+import argparse
+import random
+import time
+
+from benchmarks.corpus import make_comments
+from benchmarks.stubs import OpenAIStubServer, label_text, sentiment_responder
+from metrics import Metrics
+from sentiment import SentimentAnalyzer
+
+
+def garbling_responder(rate, seed=0):
+    rng = random.Random(seed)
+
+    def respond(prompt):
+        answer = sentiment_responder(prompt)
+        if rng.random() >= rate:
+            return answer
+        kind = rng.choice(('truncated', 'label', 'confidence'))
+        if kind == 'truncated':
+            return answer[:len(answer) // 2]
+        if kind == 'label':
+            return answer.replace('"Positive"', '"Mixed"').replace('"Negative"', '"Mixed"').replace('"Neutral"', '"Mixed"')
+        return answer.replace('"confidence": 90', '"confidence": "high"')
+    return respond
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--comments', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--token-latency', type=float, default=0.01, help="Seconds per output token")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--in-flight', type=int, default=4)
+    parser.add_argument('--garble-rate', type=float, default=0.0, help="Fraction of answers the stub garbles")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    statements = make_comments(args.comments)
+    expected = [label_text(text) for text in statements]
+    print(f"{'detail':>8} {'batch':>6} {'requests':>9} {'re-asks':>8} {'output tok/c':>13} "
+          f"{'ms/comment':>11} {'failed':>7} {'agreement':>10}")
+    for detail in ('full', 'compact'):
+        for batch_size in args.batch_sizes:
+            with OpenAIStubServer(latency=args.latency, token_latency=args.token_latency,
+                                  responder=garbling_responder(args.garble_rate, args.seed)) as stub:
+                metrics = Metrics()
+                analyzer = SentimentAnalyzer("stub-key", base_url=stub.base_url, max_in_flight=args.in_flight,
+                                             batch_size=batch_size, detail=detail, metrics=metrics)
+                start = time.perf_counter()
+                analyses = analyzer.score_statements(statements)
+                elapsed = time.perf_counter() - start
+                n = len(statements)
+                failed = sum(analysis['sentiment'] == 'Error' for analysis in analyses)
+                agreement = sum(analysis['sentiment'] == label
+                                for analysis, label in zip(analyses, expected)) / n
+                print(f"{detail:>8} {batch_size:>6} {stub.requests:>9} {metrics.counter('llm_reasks_total'):>8} "
+                      f"{stub.completion_tokens / n:>13.1f} {elapsed / n * 1000:>11.2f} {failed:>7} "
+                      f"{agreement * 100:>9.1f}%")
+
+
+if __name__ == '__main__':
+    main()
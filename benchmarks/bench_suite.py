@@ -0,0 +1,259 @@
+"""End-to-end pipeline benchmark over growing corpus sizes, fully offline.
+
+Run from the repository root:
+    python -m benchmarks.bench_suite --sizes 100 1000 10000 50000
+    python -m benchmarks.bench_suite --sizes 100 1000 --compare          # against the latest saved run
+    python -m benchmarks.bench_suite --compare benchmarks/results/<file>.json
+
+Every size runs the real extractor, CommentTranslator and SentimentAnalyzer
+through the StreamingPipeline, in a fresh process so peak memory is its
+own. They talk to local stand-ins: the InnerTube stub (or, with
+--backend selenium, the lazy-loading fixture page in a local Chrome), the
+translate stub and the OpenAI-compatible stub, each with the latency and
+error rate given. The corpus and the stubs' failures are seeded, so two
+runs with the same options do the same work.
+
+Each run is saved to benchmarks/results/<time>-<commit>.json. --compare
+prints the change against an earlier file and exits with status 1 if any
+size got slower, heavier or lower in throughput by more than --tolerance.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+STAGES = ('extract', 'translate', 'score')
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, or None where unknown"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(size, options):
+    """Analyze `size` stub comments end to end and return the measurements"""
+    from benchmarks.corpus import MIXED, make_comments
+    from benchmarks.stubs import InnerTubeStubServer, LazyPageStubServer, OpenAIStubServer, TranslateStubServer
+    from dedup import CommentDeduplicator
+    from extractor import InnerTubeCommentExtractor, YouTubeCommentExtractor
+    from local_model import LexiconSentimentModel
+    from metrics import Metrics
+    from pipeline import StreamingPipeline
+    from sentiment import SentimentAnalyzer
+    from translator import CommentTranslator
+
+    comments = make_comments(size, seed=options['seed'], pool=MIXED)
+    baseline_rss = peak_rss_mb()
+    metrics = Metrics()
+    with ExitStack() as stack:
+        translate = stack.enter_context(TranslateStubServer(latency=options['translate_latency'],
+                                                            error_rate=options['error_rate'], seed=options['seed']))
+        llm = stack.enter_context(OpenAIStubServer(latency=options['llm_latency'],
+                                                   error_rate=options['error_rate'], seed=options['seed']))
+        if options['backend'] == 'selenium':
+            from browser import WebDriverPool
+            pages = stack.enter_context(LazyPageStubServer(comments, batch=20, delay=options['page_latency']))
+            pool = WebDriverPool(size=1)
+            stack.callback(pool.close)
+            extractor = YouTubeCommentExtractor(f"{pages.url}/watch?v=fixture0001", pool=pool, metrics=metrics)
+        else:
+            pages = stack.enter_context(InnerTubeStubServer(comments, latency=options['page_latency']))
+            extractor = InnerTubeCommentExtractor('https://youtu.be/dQw4w9WgXcQ', base_url=pages.url,
+                                                  metrics=metrics)
+        translator = CommentTranslator(url=translate.translate_url, backoff=options['backoff'], metrics=metrics)
+        local_threshold = options['local_threshold']
+        analyzer = SentimentAnalyzer("stub-key", base_url=llm.base_url, batch_size=options['batch_size'],
+                                     max_in_flight=options['max_in_flight'], backoff=options['backoff'],
+                                     local_model=LexiconSentimentModel() if local_threshold is not None else None,
+                                     local_threshold=local_threshold or 0.0, metrics=metrics)
+        deduplicator = CommentDeduplicator() if options['dedup'] else None
+        pipeline = StreamingPipeline(extractor, translator, analyzer, deduplicator=deduplicator, metrics=metrics)
+
+        start = time.perf_counter()
+        # Kept, as the app keeps them, so peak memory includes the results
+        records = list(pipeline.run())
+        wall = time.perf_counter() - start
+        requests = {'pages': pages.requests, 'translate': translate.requests, 'llm': llm.requests}
+
+    stats = pipeline.stats
+    counts = {'extract': stats['extracted'], 'translate': stats['translated'], 'score': stats['scored']}
+    stage_seconds = {stage: metrics.gauge('stage_seconds', stage=stage) for stage in STAGES}
+    p95 = {}
+    for name, key in (('scrape_step_seconds', 'scrape'), ('translation_request_seconds', 'translate'),
+                      ('llm_request_seconds', 'llm')):
+        rows = [row for row in metrics.snapshot()['histograms']
+                if row['name'] == name and row['labels'].get('outcome', 'ok') == 'ok']
+        p95[key] = round(rows[0]['p95'] * 1000, 1) if rows and rows[0]['count'] else None
+    return {
+        'comments': size,
+        'scored': len(records),
+        'failed': sum(record['sentiment'] == 'Error' for record in records),
+        'wall_seconds': round(wall, 3),
+        'first_result_seconds': round(stats['first_result_seconds'] or 0.0, 3),
+        'comments_per_second': round(size / wall, 1) if wall else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1) if baseline_rss is not None else None,
+        'baseline_rss_mb': round(baseline_rss, 1) if baseline_rss is not None else None,
+        'requests': requests,
+        'stage_seconds': {stage: round(seconds, 3) for stage, seconds in stage_seconds.items()
+                          if seconds is not None},
+        # Comments each stage got through per second of the run, up to when it finished
+        'stage_throughput': {stage: round(counts[stage] / seconds, 1) for stage, seconds in stage_seconds.items()
+                             if seconds},
+        'p95_ms': p95,
+        'llm_retries': metrics.counter('llm_retries_total'),
+        'llm_tokens': metrics.counter('llm_tokens_total'),
+        'deduplicated': stats['deduplicated'],
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'commit': _git('rev-parse', '--short', 'HEAD') or 'unknown',
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def latest_result(exclude=None):
+    paths = sorted(glob.glob(os.path.join(RESULTS_DIR, '*.json')), key=os.path.getmtime)
+    paths = [path for path in paths if exclude is None or os.path.abspath(path) != os.path.abspath(exclude)]
+    return paths[-1] if paths else None
+
+
+def _change(new, old):
+    if new is None or not old:
+        return None
+    return (new - old) / old
+
+
+def compare(current, previous, tolerance):
+    """Print the change per size; returns the list of regressions found"""
+    if current['params'] != previous['params']:
+        print("note: the runs used different options; differences are not only the code's")
+    old_rows = {row['comments']: row for row in previous['results']}
+    regressions = []
+    print(f"\nvs {previous['environment']['commit']} ({previous['environment']['time']})")
+    print(f"{'comments':>9} {'wall s':>16} {'peak MB':>16} {'comments/s':>18}")
+    for row in current['results']:
+        old = old_rows.get(row['comments'])
+        if old is None:
+            continue
+        cells = []
+        for key, worse_when_higher in (('wall_seconds', True), ('peak_rss_mb', True),
+                                       ('comments_per_second', False)):
+            change = _change(row[key], old[key])
+            if change is None:
+                cells.append('n/a')
+                continue
+            worse = change > tolerance if worse_when_higher else change < -tolerance
+            if worse:
+                regressions.append((row['comments'], key, old[key], row[key]))
+            cells.append(f"{row[key]} ({change * 100:+.0f}%){'!' if worse else ''}")
+        print(f"{row['comments']:>9} {cells[0]:>16} {cells[1]:>16} {cells[2]:>18}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 50000])
+    parser.add_argument('--backend', choices=('innertube', 'selenium'), default='innertube',
+                        help="selenium needs a local Chrome")
+    parser.add_argument('--page-latency', type=float, default=0.01)
+    parser.add_argument('--translate-latency', type=float, default=0.02)
+    parser.add_argument('--llm-latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.02, help="Fraction of stub requests that fail")
+    parser.add_argument('--backoff', type=float, default=0.05, help="Retry backoff base for translate and LLM calls")
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--max-in-flight', type=int, default=8)
+    parser.add_argument('--local-threshold', type=float, default=-1,
+                        help="Offline model threshold; negative (the default) sends everything to the LLM")
+    parser.add_argument('--dedup', action='store_true', help="Score repeated comments once")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Where to save the results (default: benchmarks/results/)")
+    parser.add_argument('--compare', nargs='?', const='latest', default=None,
+                        help="Earlier results file to compare with ('latest' if no path is given)")
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    options = {
+        'backend': args.backend,
+        'page_latency': args.page_latency,
+        'translate_latency': args.translate_latency,
+        'llm_latency': args.llm_latency,
+        'error_rate': args.error_rate,
+        'backoff': args.backoff,
+        'batch_size': args.batch_size,
+        'max_in_flight': args.max_in_flight,
+        'local_threshold': args.local_threshold if args.local_threshold >= 0 else None,
+        'dedup': args.dedup,
+        'seed': args.seed,
+    }
+    previous_path = latest_result() if args.compare == 'latest' else args.compare
+
+    print(f"{'comments':>9} {'wall s':>8} {'first s':>8} {'peak MB':>8} {'comments/s':>11} "
+          f"{'pages':>6} {'translate':>9} {'llm':>6} {'extract/s':>10} {'translate/s':>12} {'score/s':>9}")
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for size in args.sizes:
+        # A fresh process per size keeps each peak-memory reading its own
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            row = pool.submit(run_case, size, options).result()
+        results.append(row)
+        requests, throughput = row['requests'], row['stage_throughput']
+        print(f"{size:>9} {row['wall_seconds']:>8.2f} {row['first_result_seconds']:>8.2f} "
+              f"{row['peak_rss_mb'] if row['peak_rss_mb'] is not None else 'n/a':>8} {row['comments_per_second']:>11} "
+              f"{requests['pages']:>6} {requests['translate']:>9} {requests['llm']:>6} "
+              f"{throughput.get('extract', 'n/a'):>10} {throughput.get('translate', 'n/a'):>12} "
+              f"{throughput.get('score', 'n/a'):>9}")
+
+    run = {'environment': environment(), 'params': options, 'results': results}
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{run['environment']['commit']}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=2)
+    print(f"\nsaved {output}")
+
+    if args.compare:
+        if not previous_path or not os.path.exists(previous_path):
+            print("nothing to compare with yet")
+            return 0
+        with open(previous_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        regressions = compare(run, previous, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance * 100:.0f}%:")
+            for size, key, old, new in regressions:
+                print(f"  {size} comments: {key} {old} -> {new}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
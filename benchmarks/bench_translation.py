@@ -0,0 +1,44 @@
+"""Translation throughput: one request per comment vs packed, concurrent requests.
+
+Run from the repository root:
+    python -m benchmarks.bench_translation --comments 500 --latency 0.05 --error-rate 0.05
+"""
+import argparse
+import time
+
+from benchmarks.corpus import MIXED, make_comments
+from benchmarks.stubs import TranslateStubServer
+from store import make_record
+from translator import CommentTranslator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--comments', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="fraction of requests the stub answers with HTTP 429")
+    args = parser.parse_args()
+
+    comments = make_comments(args.comments, pool=MIXED)
+    configs = [
+        ('sequential', dict(max_workers=1, max_pack_size=1)),
+        ('concurrent', dict(max_workers=8, max_pack_size=1)),
+        ('packed', dict(max_workers=1, max_pack_size=25)),
+        ('packed+concurrent', dict(max_workers=8, max_pack_size=25)),
+    ]
+
+    print(f"{'mode':>18} {'requests':>9} {'seconds':>8} {'comments/s':>11} {'failed':>7}")
+    for name, options in configs:
+        with TranslateStubServer(latency=args.latency, error_rate=args.error_rate) as stub:
+            translator = CommentTranslator(url=stub.translate_url, backoff=0.05, **options)
+            records = [make_record(index=i, original=text) for i, text in enumerate(comments, 1)]
+            start = time.perf_counter()
+            translator.translate_records(records)
+            elapsed = time.perf_counter() - start
+            failed = sum(record['translation_status'] == 'failed' for record in records)
+            print(f"{name:>18} {stub.requests:>9} {elapsed:>8.2f} {len(records) / elapsed:>11.1f} {failed:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Re-analyze a video after new comments arrive: only the comments past the
+trend store's watermark, against scoring everything again.
+
+Run from the repository root:
+    python -m benchmarks.bench_trends --comments 2000 --new 100
+
+The first run scores every comment into an empty trend store. --new
+comments are then posted in the --later hours since and the video is
+analyzed again, once incrementally and once from scratch into
+a second store. Both must end up with the same number of comments per
+sentiment; the incremental run reads the comment list newest first and
+stops after the first page of comments it has seen before.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.corpus import make_comments
+from benchmarks.stubs import InnerTubeStubServer, OpenAIStubServer, TranslateStubServer, default_age
+from extractor import get_extractor
+from pipeline import StreamingPipeline
+from sentiment import SENTIMENT_LABELS, SentimentAnalyzer
+from translator import CommentTranslator
+from trends import TrendStore
+
+VIDEO_URL = 'https://youtu.be/dQw4w9WgXcQ'
+VIDEO_ID = 'dQw4w9WgXcQ'
+
+
+def run(comments, ages, store, args, only_new=True):
+    with InnerTubeStubServer(comments, ages=ages, latency=args.page_latency) as pages, \
+            TranslateStubServer(latency=args.latency) as translate, \
+            OpenAIStubServer(latency=args.latency) as llm:
+        extractor = get_extractor(VIDEO_URL, backend='innertube', base_url=pages.url)
+        translator = CommentTranslator(url=translate.translate_url, detector=False)
+        analyzer = SentimentAnalyzer("stub-key", base_url=llm.base_url, batch_size=args.batch_size)
+        pipeline = StreamingPipeline(extractor, translator, analyzer, trends=store.video(VIDEO_ID),
+                                     only_new=only_new)
+        start = time.perf_counter()
+        records = list(pipeline.run())
+        elapsed = time.perf_counter() - start
+    return len(records), pipeline.stats['skipped'], pages.requests, llm.requests, elapsed
+
+
+def totals(store):
+    series = store.series(VIDEO_ID, 'hour')
+    return {label: int(series[label].sum()) for label in SENTIMENT_LABELS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--comments', type=int, default=2000)
+    parser.add_argument('--new', type=int, default=100, help="Comments posted before the second run")
+    parser.add_argument('--later', type=float, default=6.0, help="Hours between the two runs")
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--page-latency', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    comments = make_comments(args.comments + args.new)
+    # The stubs run on the real clock, so both runs see the same ages for
+    # old comments, all older than --later, and the new ones are younger
+    later = args.later * 3600
+    first_ages = [default_age(position) + later for position in range(args.comments)]
+    # New comments go to the end of the top-comments list, so every comment keeps its id
+    ages = first_ages + [rng.uniform(60, later) for _ in range(args.new)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        incremental = TrendStore(os.path.join(directory, 'incremental.sqlite3'))
+        scratch = TrendStore(os.path.join(directory, 'scratch.sqlite3'))
+        print(f"{'run':>12} {'scored':>7} {'skipped':>8} {'page reqs':>10} {'llm reqs':>9} {'seconds':>8}")
+        for name, run_comments, run_ages, store, only_new in (
+                ('first', comments[:args.comments], first_ages, incremental, True),
+                ('incremental', comments, ages, incremental, True),
+                ('from scratch', comments, ages, scratch, False)):
+            scored, skipped, page_requests, llm_requests, elapsed = run(run_comments, run_ages, store, args,
+                                                                        only_new)
+            print(f"{name:>12} {scored:>7} {skipped:>8} {page_requests:>10} {llm_requests:>9} {elapsed:>8.2f}")
+        incremental_totals, scratch_totals = totals(incremental), totals(scratch)
+        print(f"trend totals  incremental: {incremental_totals}  from scratch: {scratch_totals}  "
+              f"{'match' if incremental_totals == scratch_totals else 'DIFFER'}")
+        incremental.close()
+        scratch.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Synthetic comment corpora for the benchmarks."""
+import random
+
+ENGLISH = [
+    "This is a great video, thanks for sharing",
+    "I love how clearly you explained this",
+    "Worst tutorial I have watched, total waste of time",
+    "Who is here in 2026?",
+    "The audio is a bit quiet around the middle",
+    "Amazing editing, the best channel on this topic",
+    "I hate the background music, it is so boring",
+    "Can you make a video about the second part?",
+    "first!",
+    "Nice work, keep it up",
+]
+
+# Non-English comments with the translation and language the stub translate
+# endpoint answers with
+FOREIGN = {
+    "Este video es increíble, gracias": ("This video is incredible, thanks", "es"),
+    "No me gustó nada, muy aburrido": ("I did not like it at all, very boring", "es"),
+    "Super vidéo, merci beaucoup": ("Great video, thank you very much", "fr"),
+    "C'est la pire vidéo que j'ai vue": ("This is the worst video I have seen", "fr"),
+    "Das ist ein tolles Tutorial": ("This is a great tutorial", "de"),
+    "Ich hasse diese Musik": ("I hate this music", "de"),
+    "Ottimo lavoro, complimenti": ("Great work, congratulations", "it"),
+    "Que vídeo ruim, perdi meu tempo": ("What a bad video, I wasted my time", "pt"),
+    "Bu video çok güzel": ("This video is very nice", "tr"),
+    "Wie schaut das im Jahr 2026?": ("Who is watching this in 2026?", "de"),
+}
+
+MIXED = ENGLISH + list(FOREIGN)
+
+
+def make_comments(n, seed=0, pool=ENGLISH):
+    """Return n comments drawn from pool with small variations"""
+    rng = random.Random(seed)
+    comments = []
+    for i in range(n):
+        text = rng.choice(pool)
+        if rng.random() < 0.5:
+            text = f"{text} #{i}"
+        comments.append(text)
+    return comments
+
+# Lines that get copy-pasted under popular videos
+SPAM = [
+    "Who's here in 2026?",
+    "Anyone watching this in 2026?",
+    "first!",
+    "Like if you're watching at 3am",
+    "The algorithm brought me here",
+    "Check out my channel for more videos like this",
+]
+
+# Near-identical comments that say opposite things; a copied label is wrong
+# for one of each pair
+OPPOSITES = [
+    ("This is the best tutorial I have ever watched on this topic",
+     "This is the worst tutorial I have ever watched on this topic"),
+    ("Great explanation and the editing is really good",
+     "Great explanation and the editing is really bad"),
+    ("I don't love this video at all honestly", "I do love this video at all honestly"),
+    ("The new intro is good, I expected less from this channel",
+     "The new intro is not good, I expected more from this channel"),
+]
+
+
+def _spam_variant(text, rng):
+    # The small edits that survive copy-paste: case, punctuation, stretched letters
+    edit = rng.randrange(4)
+    if edit == 1:
+        text = text.lower().replace("'", "")
+    elif edit == 2:
+        text = text.rstrip('?!') + rng.choice(['!!', '??', '!!!', ' 😂'])
+    elif edit == 3:
+        text = text.replace('o', 'ooo', 1)
+    return text
+
+
+def make_repetitive_comments(n, repeat=0.6, opposites=0.05, seed=0):
+    """Return n comments where about `repeat` of them are edited copies of
+    a few spam lines, about `opposites` are either side of a pair that
+    differs only in sentiment, and the rest are distinct sentences"""
+    rng = random.Random(seed)
+    words = sorted({word for line in ENGLISH for word in line.lower().rstrip('?!').split()})
+    comments = []
+    for i in range(n):
+        draw = rng.random()
+        if draw < repeat:
+            comments.append(_spam_variant(rng.choice(SPAM), rng))
+        elif draw < repeat + opposites:
+            comments.append(rng.choice(rng.choice(OPPOSITES)))
+        else:
+            comments.append(" ".join(rng.choice(words) for _ in range(rng.randint(6, 14))))
+    return comments
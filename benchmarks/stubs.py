@@ -0,0 +1,533 @@
+"""Local stand-ins for the external services the pipeline talks to."""
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.corpus import FOREIGN
+
+POSITIVE_WORDS = ('great', 'love', 'amazing', 'awesome', 'best', 'thanks', 'good', 'nice')
+NEGATIVE_WORDS = ('bad', 'hate', 'worst', 'boring', 'terrible', 'awful', 'waste', 'dislike')
+# A positive word right after a negation ("not good", "don't love") is negative
+NEGATED_POSITIVE_RE = re.compile(r"\b(?:not|never|\w+n't|dont|didnt)\s+(?:really\s+)?(?:%s)\b"
+                                 % '|'.join(POSITIVE_WORDS))
+
+
+def label_text(text):
+    """Cheap keyword labeller used by the stubs to produce deterministic
+    answers. It never looks at fixture labels, so it disagrees with them
+    wherever keywords are not enough."""
+    lower = text.lower()
+    if any(word in lower for word in NEGATIVE_WORDS) or NEGATED_POSITIVE_RE.search(lower):
+        return 'Negative'
+    if any(word in lower for word in POSITIVE_WORDS):
+        return 'Positive'
+    return 'Neutral'
+
+
+def sentiment_responder(prompt):
+    """Answer both the single-comment and the numbered batch prompt formats,
+    with key words and reasoning only when the prompt asks for them"""
+    full = '"reasoning"' in prompt
+    if 'COMMENTS:' in prompt:
+        items = []
+        for match in re.finditer(r'^(\d+)\. (".*")$', prompt, re.MULTILINE):
+            item = {'id': int(match.group(1)), 'sentiment': label_text(json.loads(match.group(2))),
+                    'confidence': 90}
+            if full:
+                item.update(key_words='stub', reasoning='Stub classification')
+            items.append(item)
+        return json.dumps({'results': items})
+
+    match = re.search(r'^TEXT: (".*")$', prompt, re.MULTILINE)
+    answer = {'sentiment': label_text(json.loads(match.group(1)) if match else prompt), 'confidence': 90}
+    if full:
+        answer.update(key_words='stub', reasoning='Stub classification')
+    return json.dumps(answer)
+
+
+def count_tokens(text):
+    # Rough whitespace/punctuation split, close enough to compare prompt formats
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+class _StubServer:
+    handler_class = None
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        handler = type('Handler', (self.handler_class,), {'stub': self})
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _should_fail(self):
+        with self._lock:
+            self.requests += 1
+            return self.random.random() < self.error_rate
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    stub = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _ChatHandler(_QuietHandler):
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        stub = self.stub
+
+        with stub._lock:
+            stub.in_flight += 1
+            stub.peak_in_flight = max(stub.peak_in_flight, stub.in_flight)
+            throttle = stub.max_concurrent is not None and stub.in_flight > stub.max_concurrent
+            if throttle:
+                stub.in_flight -= 1
+                stub.requests += 1
+                stub.throttled += 1
+        if throttle:
+            headers = {'Retry-After': f"{stub.retry_after:g}"} if stub.retry_after is not None else {}
+            self._send_json(429, {'error': {'message': 'rate limit exceeded', 'type': 'rate_limit_error'}}, headers)
+            return
+        try:
+            prompt = "\n".join(m.get('content', '') for m in request.get('messages', []))
+            content = stub.responder(prompt)
+            prompt_tokens = count_tokens(prompt)
+            completion_tokens = count_tokens(content)
+            if stub.latency or stub.token_latency:
+                time.sleep(stub.latency + stub.token_latency * completion_tokens)
+        finally:
+            with stub._lock:
+                stub.in_flight -= 1
+        if stub._should_fail():
+            self._send_json(500, {'error': {'message': 'stub failure', 'type': 'server_error'}})
+            return
+
+        with stub._lock:
+            stub.prompt_tokens += prompt_tokens
+            stub.completion_tokens += completion_tokens
+            stub.response_formats += 'response_format' in request
+
+        self._send_json(200, {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        })
+
+
+class OpenAIStubServer(_StubServer):
+    """OpenAI-compatible /v1/chat/completions endpoint with configurable
+    latency and error rate. With max_concurrent, requests beyond that many
+    at once get a 429, with a Retry-After header if retry_after is set."""
+
+    handler_class = _ChatHandler
+
+    def __init__(self, latency=0.0, error_rate=0.0, responder=sentiment_responder, seed=0, token_latency=0.0,
+                 max_concurrent=None, retry_after=None):
+        super().__init__(latency, error_rate, seed)
+        self.responder = responder
+        # Extra seconds per completion token, as generation takes on a real server
+        self.token_latency = token_latency
+        self.response_formats = 0
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.in_flight = 0
+        # Most requests the stub was serving at once
+        self.peak_in_flight = 0
+        self.throttled = 0
+
+    @property
+    def base_url(self):
+        return self.url + "/v1"
+
+
+def _continuation_item(token):
+    return {'continuationItemRenderer': {'continuationEndpoint': {
+        'commandMetadata': {'webCommandMetadata': {'apiUrl': '/youtubei/v1/next'}},
+        'continuationCommand': {'token': token},
+    }}}
+
+
+def innertube_watch_page(video_id):
+    """Watch page HTML trimmed to the parts the InnerTube extractor reads"""
+    ytcfg = {
+        'INNERTUBE_API_KEY': 'stub-key',
+        'INNERTUBE_CONTEXT': {'client': {'clientName': 'WEB', 'clientVersion': '2.20240101'}},
+    }
+    initial_data = {'contents': {'twoColumnWatchNextResults': {'results': {'results': {'contents': [
+        {'videoPrimaryInfoRenderer': {'title': {'runs': [{'text': f'Video {video_id}'}]}}},
+        {'itemSectionRenderer': {
+            'sectionIdentifier': 'comment-item-section',
+            'contents': [_continuation_item('page-0')],
+        }},
+    ]}}}}}
+    return (f"<html><head><script>ytcfg.set({json.dumps(ytcfg)});</script></head><body>"
+            f"<script>var ytInitialData = {json.dumps(initial_data)};</script></body></html>")
+
+
+def published_text(age):
+    """How YouTube shows a comment posted `age` seconds ago, rounded down"""
+    for unit, seconds in (('year', 365 * 86400), ('month', 30 * 86400), ('week', 7 * 86400),
+                          ('day', 86400), ('hour', 3600), ('minute', 60)):
+        if age >= seconds:
+            count = int(age // seconds)
+            return f"{count} {unit}{'s' if count > 1 else ''} ago"
+    return f"{max(1, int(age))} seconds ago"
+
+
+def default_age(position):
+    """Seconds since the comment at `position` was posted: spread over
+    about ten days, in an order that is not the list order"""
+    return (position * 7919) % 240 * 3600 + 1800
+
+
+def _comment_item(comment_id, text, author, likes, layout, published='1 day ago'):
+    """(continuation item, entity mutation or None) for one comment"""
+    if layout == 'renderer':
+        return {'commentRenderer': {
+            'commentId': comment_id,
+            'contentText': {'runs': [{'text': text}]},
+            'authorText': {'simpleText': author},
+            'voteCount': {'simpleText': str(likes)},
+            'publishedTimeText': {'runs': [{'text': published}]},
+        }}, None
+    key = f"comment-key-{comment_id}"
+    return {'commentViewModel': {'commentViewModel': {'commentKey': key, 'commentId': comment_id}}}, {
+        'entityKey': key, 'payload': {'commentEntityPayload': {
+            'key': key,
+            'properties': {'commentId': comment_id, 'content': {'content': text},
+                           'publishedTime': published},
+            'author': {'displayName': author, 'channelId': f'UC{author}'},
+            'toolbar': {'likeCountNotliked': str(likes), 'replyCount': '0'},
+        }}}
+
+
+def _comment_response(action_name, target, items, mutations):
+    response = {'onResponseReceivedEndpoints': [{action_name: {
+        'targetId': target, 'continuationItems': items,
+    }}]}
+    if mutations:
+        response['frameworkUpdates'] = {'entityBatchUpdate': {'mutations': mutations}}
+    return response
+
+
+def _sort_menu():
+    """The header's sort menu, [Top comments, Newest first]"""
+    return {'sortFilterSubMenuRenderer': {'subMenuItems': [
+        {'title': title, 'selected': token == 'page-0',
+         'serviceEndpoint': _continuation_item(token)['continuationItemRenderer']['continuationEndpoint']}
+        for title, token in (('Top comments', 'page-0'), ('Newest first', 'newest-0'))
+    ]}}
+
+
+def innertube_comment_page(comments, page, page_size, layout='entity', replies=None, ages=None,
+                           newest_first=False):
+    """One youtubei/v1/next response in either the commentRenderer or the
+    commentEntityPayload layout. `replies` maps a comment's position to the
+    texts of its replies, which are fetched with their own continuations.
+    `ages` gives each comment's age in seconds (default_age otherwise);
+    with newest_first, the list is ordered by it instead of as given."""
+    replies = replies or {}
+    ages = ages or [default_age(position) for position in range(len(comments))]
+    order = sorted(range(len(comments)), key=ages.__getitem__) if newest_first else range(len(comments))
+    start = page * page_size
+    items, mutations = [], []
+    for offset, position in enumerate(order[start:start + page_size]):
+        item, mutation = _comment_item(f"Ugz{position:08d}", comments[position], f'@user{position}', offset,
+                                       layout, published_text(ages[position]))
+        # The old layout nests the comment under 'comment', the new one inlines its view model
+        thread = {'comment': item} if layout == 'renderer' else dict(item)
+        if replies.get(position):
+            thread['replies'] = {'commentRepliesRenderer': {
+                'contents': [_continuation_item(f'replies-{position}-0')],
+            }}
+        items.append({'commentThreadRenderer': thread})
+        if mutation:
+            mutations.append(mutation)
+    if start + page_size < len(comments):
+        items.append(_continuation_item(f"{'newest' if newest_first else 'page'}-{page + 1}"))
+    if page == 0:
+        # The first page opens with the comment count, replies included
+        total = len(comments) + sum(len(texts) for texts in replies.values())
+        items.insert(0, {'commentsHeaderRenderer': {'countText': {'runs': [
+            {'text': f"{total:,}"}, {'text': ' Comments'}]}, 'sortMenu': _sort_menu()}})
+
+    action_name = 'reloadContinuationItemsCommand' if page == 0 else 'appendContinuationItemsAction'
+    return _comment_response(action_name, 'comments-section', items, mutations)
+
+
+def innertube_reply_page(replies, position, page, page_size, layout='entity'):
+    """One page of the replies to the comment at `position`"""
+    parent_id = f"Ugz{position:08d}"
+    start = page * page_size
+    items, mutations = [], []
+    for offset, text in enumerate(replies[start:start + page_size]):
+        item, mutation = _comment_item(f"{parent_id}.r{start + offset:04d}", text,
+                                       f'@replier{start + offset}', offset, layout)
+        items.append(item)
+        if mutation:
+            mutations.append(mutation)
+    if start + page_size < len(replies):
+        # Further reply pages hang off a "Show more replies" button
+        items.append({'continuationItemRenderer': {'button': {'buttonRenderer': {'command': {
+            'commandMetadata': {'webCommandMetadata': {'apiUrl': '/youtubei/v1/next'}},
+            'continuationCommand': {'token': f'replies-{position}-{page + 1}'},
+        }}}}})
+    return _comment_response('appendContinuationItemsAction', f'comment-replies-item-{parent_id}',
+                             items, mutations)
+
+
+class _InnerTubeHandler(_QuietHandler):
+    def do_GET(self):
+        stub = self.stub
+        parsed = urlparse(self.path)
+        if parsed.path != '/watch':
+            self._send_json(404, {'error': 'not found'})
+            return
+        video_id = parse_qs(parsed.query).get('v', ['unknown'])[0]
+        body = innertube_watch_page(video_id).encode('utf-8')
+        with stub._lock:
+            stub.requests += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        stub = self.stub
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if stub.latency:
+            time.sleep(stub.latency)
+        if stub._should_fail():
+            self._send_json(503, {'error': {'message': 'stub failure'}})
+            return
+        token = request.get('continuation', 'page-0')
+        if token.startswith('replies-'):
+            _, position, page = token.split('-')
+            self._send_json(200, innertube_reply_page(stub.replies[int(position)], int(position), int(page),
+                                                      stub.page_size, stub.layout))
+            return
+        if not re.fullmatch(r'(page|newest)-\d+', token):
+            # What YouTube answers for an expired or made-up continuation
+            self._send_json(400, {'error': {'message': 'Request contains an invalid argument.'}})
+            return
+        order, page = token.split('-')
+        self._send_json(200, innertube_comment_page(stub.comments, int(page), stub.page_size, stub.layout,
+                                                    stub.replies, stub.ages, newest_first=order == 'newest'))
+
+
+class InnerTubeStubServer(_StubServer):
+    """Serves a watch page and youtubei/v1/next continuation pages for a
+    fixed list of comments, shaped like the real responses"""
+
+    handler_class = _InnerTubeHandler
+
+    def __init__(self, comments, page_size=20, layout='entity', latency=0.0, error_rate=0.0, seed=0,
+                 replies=None, ages=None):
+        super().__init__(latency, error_rate, seed)
+        self.comments = list(comments)
+        self.page_size = page_size
+        self.layout = layout
+        # {comment position: [reply texts]}
+        self.replies = replies or {}
+        # Seconds since each comment was posted, in list order
+        self.ages = ages
+
+
+class _ReplayHandler(_QuietHandler):
+    def do_GET(self):
+        stub = self.stub
+        if urlparse(self.path).path != '/watch':
+            self._send_json(404, {'error': 'not found'})
+            return
+        body = stub.watch_page.encode('utf-8')
+        with stub._lock:
+            stub.requests += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        stub = self.stub
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        token = request.get('continuation')
+        with stub._lock:
+            stub.requests += 1
+            stub.tokens.append(token)
+        if token not in stub.responses:
+            self._send_json(400, {'error': {'message': 'Request contains an invalid argument.'}})
+            return
+        self._send_json(200, stub.responses[token])
+
+
+class InnerTubeReplayServer(_StubServer):
+    """Replays saved InnerTube responses: `watch_page` for /watch and, for
+    youtubei/v1/next, the response saved under the request's continuation
+    token. `tokens` lists the continuations asked for, in order."""
+
+    handler_class = _ReplayHandler
+
+    def __init__(self, watch_page, responses):
+        super().__init__()
+        self.watch_page = watch_page
+        self.responses = dict(responses)
+        self.tokens = []
+
+
+def translate_line(line):
+    """Stub translation: corpus phrases map to English, anything else is
+    treated as already English"""
+    match = re.match(r'^(.*?)( #\d+)?$', line, re.DOTALL)
+    base, suffix = match.group(1), match.group(2) or ''
+    if base in FOREIGN:
+        english, language = FOREIGN[base]
+        return english + suffix, language
+    return line, 'en'
+
+
+class _TranslateHandler(_QuietHandler):
+    def do_GET(self):
+        stub = self.stub
+        if stub.latency:
+            time.sleep(stub.latency)
+        if stub._should_fail():
+            self._send_json(429, {'error': 'rate limited'})
+            return
+        text = parse_qs(urlparse(self.path).query).get('q', [''])[0]
+        lines = text.split('\n')
+        segments, languages = [], []
+        for i, line in enumerate(lines):
+            translated, language = translate_line(line)
+            languages.append(language)
+            # merge_lines runs the lines together, as Google sometimes does
+            ending = (' ' if stub.merge_lines else '\n') if i < len(lines) - 1 else ''
+            segments.append([translated + ending, line + ending, None, None, 10])
+        with stub._lock:
+            stub.characters += len(text)
+            stub.queries.append(text)
+        language = max(set(languages), key=languages.count)
+        self._send_json(200, [segments, None, language])
+
+
+class TranslateStubServer(_StubServer):
+    """translate_a/single endpoint answering in Google's nested-list shape,
+    one segment per line. `queries` lists the texts it was sent."""
+
+    handler_class = _TranslateHandler
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0, merge_lines=False):
+        super().__init__(latency, error_rate, seed)
+        self.characters = 0
+        self.merge_lines = merge_lines
+        self.queries = []
+
+    @property
+    def translate_url(self):
+        return self.url + "/translate_a/single"
+
+
+def lazy_comments_page(comments, batch=20, delay=0.3, slow_every=0, slow_delay=3.0,
+                       replies_every=0, replies=3):
+    """The lazy-loading fixture page with its comments and timings filled in"""
+    path = os.path.join(os.path.dirname(__file__), 'fixtures', 'lazy_comments.html')
+    with open(path, encoding='utf-8') as f:
+        page = f.read()
+    settings = {'batch': batch, 'delay': int(delay * 1000), 'slow_every': slow_every,
+                'slow_delay': int(slow_delay * 1000), 'replies_every': replies_every, 'replies': replies}
+    # </ inside a JSON string would end the script element early
+    page = page.replace('/*COMMENTS*/[]', json.dumps(list(comments)).replace('</', '<\\/'))
+    return page.replace('/*SETTINGS*/{}', json.dumps(settings))
+
+
+class _LazyPageHandler(_QuietHandler):
+    def do_GET(self):
+        stub = self.stub
+        body = lazy_comments_page(stub.comments, stub.batch, stub.delay, stub.slow_every,
+                                  stub.slow_delay, stub.replies_every, stub.replies).encode('utf-8')
+        with stub._lock:
+            stub.requests += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LazyPageStubServer(_StubServer):
+    """Serves a watch page whose comment section loads in delayed batches
+    as it is scrolled, like YouTube's, for driving the Selenium extractor"""
+
+    handler_class = _LazyPageHandler
+
+    def __init__(self, comments, batch=20, delay=0.3, slow_every=0, slow_delay=3.0,
+                 replies_every=0, replies=3):
+        super().__init__()
+        self.comments = list(comments)
+        self.replies_every = replies_every
+        self.replies = replies
+        self.batch = batch
+        self.delay = delay
+        self.slow_every = slow_every
+        self.slow_delay = slow_delay
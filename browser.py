@@ -0,0 +1,188 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+
+DRIVER_PATH_CACHE = '.cache/chromedriver.json'
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def resolve_driver_path(cache_path=DRIVER_PATH_CACHE):
+    """Path of a chromedriver binary, resolved at most once.
+
+    CHROMEDRIVER_PATH wins if set. Otherwise the path webdriver-manager
+    found last time is read back from `cache_path`, and only if that file
+    is missing or stale is webdriver-manager asked again (which checks
+    for updates over the network)."""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path and os.path.exists(_driver_path):
+            return _driver_path
+        path = os.environ.get('CHROMEDRIVER_PATH')
+        if not path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    path = json.load(f).get('path')
+            except (OSError, ValueError):
+                path = None
+        if not path or not os.path.exists(path):
+            from webdriver_manager.chrome import ChromeDriverManager
+            path = ChromeDriverManager().install()
+            directory = os.path.dirname(cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump({'path': path}, f)
+        _driver_path = path
+        return path
+
+
+def chrome_options():
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    return options
+
+
+def launch_chrome():
+    return webdriver.Chrome(service=Service(resolve_driver_path()), options=chrome_options())
+
+
+class _PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.created = time.monotonic()
+
+
+class WebDriverPool:
+    """Keeps up to `size` headless Chrome instances warm between videos.
+
+    `driver()` hands out an idle browser, starting one only when none is
+    free and the pool is below `size`, or waits for one to come back.
+    Idle browsers are health-checked before reuse and trimmed back to a
+    single blank tab, so consecutive videos load in the same tab. A
+    browser is quit and replaced after `max_pages` videos, which bounds
+    the memory Chrome leaks over a long session."""
+
+    def __init__(self, size=2, max_pages=20, factory=launch_chrome):
+        self.size = size
+        self.max_pages = max_pages
+        self.factory = factory
+        self.launched = 0
+        self.reused = 0
+        self._idle = []
+        self._busy = 0
+        self._closed = False
+        self._available = threading.Condition()
+
+    def _healthy(self, pooled):
+        try:
+            handles = pooled.driver.window_handles
+            if not handles:
+                return False
+            # Stray tabs opened by a page are closed; the first one is reused
+            for handle in handles[1:]:
+                pooled.driver.switch_to.window(handle)
+                pooled.driver.close()
+            pooled.driver.switch_to.window(handles[0])
+            return pooled.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _quit(self, pooled):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError("WebDriverPool is closed")
+                if self._idle:
+                    pooled = self._idle.pop()
+                    self._busy += 1
+                    break
+                if self._busy < self.size:
+                    pooled = None
+                    self._busy += 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("No browser became free in time")
+                self._available.wait(remaining)
+        try:
+            # Launching and health checks happen outside the lock
+            if pooled is not None and self._healthy(pooled):
+                self.reused += 1
+                return pooled
+            if pooled is not None:
+                self._quit(pooled)
+            pooled = _PooledDriver(self.factory())
+            self.launched += 1
+            return pooled
+        except Exception:
+            with self._available:
+                self._busy -= 1
+                self._available.notify()
+            raise
+
+    def release(self, pooled):
+        pooled.pages += 1
+        keep = pooled.pages < self.max_pages and not self._closed
+        if keep:
+            try:
+                # Stops scripts and media of the last video while idle
+                pooled.driver.get("about:blank")
+            except Exception:
+                keep = False
+        if not keep:
+            self._quit(pooled)
+        with self._available:
+            self._busy -= 1
+            if keep:
+                self._idle.append(pooled)
+            self._available.notify()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        pooled = self.acquire(timeout)
+        try:
+            yield pooled.driver
+        finally:
+            self.release(pooled)
+
+    def close(self):
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    """Process-wide pool shared by every Selenium extractor that is not
+    given its own"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = WebDriverPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
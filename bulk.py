@@ -0,0 +1,254 @@
+"""Headless bulk analysis of many videos, without Streamlit.
+
+    python bulk.py videos.txt --api-key $NVIDIA_API_KEY --processes 4 --rate-limit 20
+
+The input file lists one video URL per line; blank lines and lines
+starting with '#' are ignored. Videos are spread over worker processes,
+and every process draws LLM requests from one shared rate budget. Each
+video ends up as <output dir>/<video id>.jsonl with every record field,
+and summary.json lists how each video went. Interrupted videos resume
+from their checkpoint on the next run. Every video's hourly and daily
+sentiment counts are kept in a trend store and exported as
+<video id>.trend.csv; with --only-new, a later run scores only comments
+no earlier run has counted and appends them to the video's dataset.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from backends import DEFAULT_BASE_URL, DEFAULT_MODEL, LLMEndpoint, parse_endpoint
+from cache import DEFAULT_CACHE_PATH, ResultCache
+from checkpoint import DEFAULT_CHECKPOINT_ROOT, RunCheckpoint
+from dedup import CommentDeduplicator
+from extractor import EXTRACTOR_BACKENDS, extract_video_id, get_extractor
+from local_model import LexiconSentimentModel
+from metrics import Metrics
+from pipeline import StreamingPipeline
+from scoring import SharedTokenBucket
+from sentiment import SentimentAnalyzer
+from store import CommentStore, like_weighted_counts, summarize
+from translator import CommentTranslator
+from trends import DEFAULT_TRENDS_PATH, TrendStore
+
+# Set in each worker process by _init_worker
+_bucket = None
+
+
+def _init_worker(bucket):
+    global _bucket
+    _bucket = bucket
+
+
+def read_video_urls(path):
+    """Video URLs from a file ('-' for stdin), deduplicated by video id"""
+    f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        lines = [line.strip() for line in f]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    urls, seen = [], set()
+    for line in lines:
+        if not line or line.startswith('#'):
+            continue
+        key = extract_video_id(line) or line
+        if key not in seen:
+            seen.add(key)
+            urls.append(line)
+    return urls
+
+
+def analyze_video(video_url, options):
+    """Run one video through the pipeline and write its dataset.
+    Returns a summary dict; failures are reported, not raised."""
+    video_id = extract_video_id(video_url)
+    summary = {'url': video_url, 'video_id': video_id, 'status': 'failed'}
+    start = time.perf_counter()
+    analyzer = None
+    try:
+        if not video_id:
+            raise ValueError(f"Could not find a video id in {video_url!r}")
+        cache = ResultCache(options['cache_path']) if options['cache_path'] else None
+        metrics = Metrics()
+        extractor = get_extractor(video_url, backend=options['backend'], metrics=metrics,
+                                  **options.get('extractor_options', {}))
+        translator = CommentTranslator(cache=cache, metrics=metrics, **options.get('translator_options', {}))
+        model = options.get('model', DEFAULT_MODEL)
+        endpoints = [parse_endpoint(spec) for spec in options.get('endpoints', ())]
+        if options['api_key']:
+            endpoints.insert(0, LLMEndpoint(options['base_url'], api_key=options['api_key'], model=model))
+        analyzer = SentimentAnalyzer(options['api_key'], base_url=options['base_url'], model=model,
+                                     endpoints=endpoints or None,
+                                     max_in_flight=options['max_in_flight'],
+                                     batch_size=options['batch_size'], cache=cache,
+                                     local_model=LexiconSentimentModel() if options['local_threshold'] is not None else None,
+                                     local_threshold=options['local_threshold'] or 0.0,
+                                     bucket=_bucket, metrics=metrics, detail=options.get('detail', 'compact'))
+        checkpoint = RunCheckpoint(video_id, root=options['checkpoint_dir'])
+        deduplicator = (CommentDeduplicator(threshold=options['dedup_threshold'])
+                        if options.get('dedup_threshold') is not None else None)
+        trend_store = TrendStore(options['trends_path']) if options.get('trends_path') else None
+        only_new = trend_store is not None and options.get('only_new', False)
+        pipeline = StreamingPipeline(extractor, translator, analyzer, checkpoint=checkpoint,
+                                     deduplicator=deduplicator,
+                                     trends=trend_store.video(video_id) if trend_store else None,
+                                     only_new=only_new, metrics=metrics)
+
+        records = sorted(pipeline.run(), key=lambda record: record['index'])
+        dataset = CommentStore(os.path.join(options['output_dir'], f"{video_id}.jsonl"))
+        if only_new:
+            # Earlier runs' comments stay; `index` is only unique within a run
+            dataset.append(records)
+        else:
+            dataset.write(records)
+        if trend_store is not None:
+            summary['trend'] = os.path.join(options['output_dir'], f"{video_id}.trend.csv")
+            trend_store.series(video_id, 'hour').to_csv(summary['trend'])
+            trend_store.close()
+        failed = checkpoint.finish(records)
+
+        sentiment_counts = summarize(records)[1]
+        summary.update({
+            'status': 'done',
+            'dataset': dataset.path,
+            'comments': len(records),
+            'sentiment_counts': sentiment_counts,
+            'like_weighted_counts': like_weighted_counts(records),
+            'replies': sum(bool(record['parent_id']) for record in records),
+            'failed': failed,
+            'resumed': pipeline.stats['resumed'],
+            'skipped': pipeline.stats['skipped'],
+            'deduplicated': pipeline.stats['deduplicated'],
+            'tier_counts': dict(analyzer.tier_counts),
+            'endpoints': analyzer.backends.stats(),
+            'comments_per_second': round(pipeline.stats['comments_per_second'], 2),
+        })
+        if options.get('metrics_format'):
+            extension = 'json' if options['metrics_format'] == 'json' else 'prom'
+            summary['metrics'] = metrics.write(os.path.join(options['output_dir'],
+                                                            f"{video_id}.metrics.{extension}"))
+    except Exception as e:
+        summary['error'] = str(e)
+    finally:
+        if analyzer is not None:
+            analyzer.close()
+    summary['seconds'] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+def run(urls, options, processes=2, rate_limit=None, log=print):
+    """Analyze every URL across `processes` worker processes.
+    Returns one summary dict per video, in input order."""
+    os.makedirs(options['output_dir'], exist_ok=True)
+    bucket = SharedTokenBucket(rate_limit) if rate_limit else None
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(bucket,)) as pool:
+        futures = {pool.submit(analyze_video, url, options): url for url in urls}
+        for done, future in enumerate(as_completed(futures), 1):
+            summary = future.result()
+            summaries[futures[future]] = summary
+            if summary['status'] == 'done':
+                counts = summary['sentiment_counts']
+                log(f"[{done}/{len(urls)}] {summary['video_id']}: {summary['comments']} comments "
+                    f"(+{counts['Positive']} -{counts['Negative']} ={counts['Neutral']}) "
+                    f"in {summary['seconds']}s")
+            else:
+                log(f"[{done}/{len(urls)}] {summary['url']}: failed: {summary['error']}")
+    return [summaries[url] for url in urls]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('videos', help="File with one video URL per line, or '-' for stdin")
+    parser.add_argument('--api-key', default=os.environ.get('NVIDIA_API_KEY'),
+                        help="LLM API key (default: $NVIDIA_API_KEY)")
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL)
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--endpoint', action='append', default=[], metavar='SPEC',
+                        help="Another OpenAI-compatible endpoint to spread requests over and fail over to, "
+                             "e.g. 'http://localhost:8080/v1 model=llama-3.1-8b weight=2 key_env=LOCAL_KEY' "
+                             "(repeatable)")
+    parser.add_argument('--output-dir', default='bulk_results')
+    parser.add_argument('--backend', choices=list(EXTRACTOR_BACKENDS), default='innertube')
+    parser.add_argument('--max-comments', type=int, default=None, help="Stop each video after this many comments")
+    parser.add_argument('--max-seconds', type=float, default=None, help="Stop extracting each video after this long")
+    parser.add_argument('--replies', action='store_true', help="Open reply threads and analyze replies too")
+    parser.add_argument('--prune-dom', action='store_true',
+                        help="Remove comment threads from the page once read, so Chrome's memory stays flat "
+                             "on long scrapes (selenium backend only)")
+    parser.add_argument('--processes', type=int, default=2, help="Videos analyzed at once")
+    parser.add_argument('--rate-limit', type=float, default=None,
+                        help="LLM requests per second across all processes")
+    parser.add_argument('--max-in-flight', type=int, default=8, help="Concurrent LLM requests per video")
+    parser.add_argument('--batch-size', type=int, default=10, help="Comments per LLM request")
+    parser.add_argument('--local-threshold', type=float, default=0.5,
+                        help="Offline model confidence threshold; negative disables the local tier")
+    parser.add_argument('--dedup-threshold', type=float, default=0.85,
+                        help="Similarity at which comments share one label; negative disables deduplication")
+    parser.add_argument('--explain', action='store_true',
+                        help="Ask the LLM for key words and reasoning with every label, not just label and confidence")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="Result cache path ('' disables it)")
+    parser.add_argument('--checkpoint-dir', default=DEFAULT_CHECKPOINT_ROOT)
+    parser.add_argument('--trend-db', default=DEFAULT_TRENDS_PATH,
+                        help="Hourly/daily sentiment trend store ('' disables it)")
+    parser.add_argument('--only-new', action='store_true',
+                        help="Skip comments an earlier run already counted in the trend store")
+    parser.add_argument('--metrics', choices=('json', 'prometheus'), default=None,
+                        help="Also write each video's timings and counters as <video id>.metrics.json or .prom")
+    args = parser.parse_args(argv)
+
+    if args.prune_dom and args.backend != 'selenium':
+        parser.error("--prune-dom only applies to --backend selenium")
+    if not args.api_key and not args.endpoint:
+        parser.error("an API key is required (--api-key or $NVIDIA_API_KEY), or an --endpoint")
+    for spec in args.endpoint:
+        try:
+            parse_endpoint(spec)
+        except ValueError as e:
+            parser.error(str(e))
+    urls = read_video_urls(args.videos)
+    if not urls:
+        parser.error("no video URLs found")
+
+    extractor_options = {'max_comments': args.max_comments, 'max_seconds': args.max_seconds,
+                         'expand_replies': args.replies}
+    if args.backend == 'selenium':
+        extractor_options['prune_dom'] = args.prune_dom
+
+    options = {
+        'api_key': args.api_key,
+        'base_url': args.base_url,
+        'model': args.model,
+        'endpoints': args.endpoint,
+        'output_dir': args.output_dir,
+        'backend': args.backend,
+        'extractor_options': extractor_options,
+        'max_in_flight': args.max_in_flight,
+        'batch_size': args.batch_size,
+        'detail': 'full' if args.explain else 'compact',
+        'local_threshold': args.local_threshold if args.local_threshold >= 0 else None,
+        'dedup_threshold': args.dedup_threshold if args.dedup_threshold >= 0 else None,
+        'cache_path': args.cache,
+        'checkpoint_dir': args.checkpoint_dir,
+        'trends_path': args.trend_db,
+        'only_new': args.only_new,
+        'metrics_format': args.metrics,
+    }
+    start = time.perf_counter()
+    summaries = run(urls, options, processes=args.processes, rate_limit=args.rate_limit)
+
+    summary_path = os.path.join(args.output_dir, 'summary.json')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summaries, f, indent=2)
+    failed = [summary for summary in summaries if summary['status'] != 'done']
+    print(f"Analyzed {len(summaries) - len(failed)} of {len(summaries)} videos in "
+          f"{time.perf_counter() - start:.1f}s; summary in {summary_path}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import json
+import os
+import re
+import shutil
+
+from store import CommentStore
+
+DEFAULT_CHECKPOINT_ROOT = '.runs'
+
+
+class RunCheckpoint:
+    """Durable per-video progress for the streaming pipeline.
+
+    Every stage appends finished records to its own JSON Lines file under
+    `.runs/<video id>/`, and state.json records how far extraction got
+    (plus whatever the extractor needs to pick up from there). Comments
+    that the LLM failed on are kept in retry.jsonl instead of results.jsonl,
+    so the next run scores them again."""
+
+    def __init__(self, video_id, root=DEFAULT_CHECKPOINT_ROOT):
+        self.video_id = video_id
+        self.directory = os.path.join(root, re.sub(r'[^\w-]', '_', video_id))
+        self.comments = CommentStore.for_stage('comments', self.directory)
+        self.translated = CommentStore.for_stage('translated', self.directory)
+        self.results = CommentStore.for_stage('results', self.directory)
+        self.retry = CommentStore.for_stage('retry', self.directory)
+        self.state_path = os.path.join(self.directory, 'state.json')
+
+    def exists(self):
+        return os.path.exists(self.state_path) or self.comments.exists()
+
+    def load_state(self):
+        state = {'extracted': 0, 'extraction_complete': False, 'extractor_state': None}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state.update(json.load(f))
+        return state
+
+    def save_state(self, **updates):
+        state = self.load_state()
+        state.update(updates)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+        return state
+
+    def pending(self):
+        """Split saved progress into what each stage still has to do.
+
+        Returns (state, scored, to_score, to_translate): records already
+        scored, records translated but not (successfully) scored, and
+        records extracted but not translated."""
+        state = self.load_state()
+        scored = {record['index']: record for record in self.results}
+        translated = {record['index']: record for record in self.translated}
+        to_score = [record for index, record in sorted(translated.items()) if index not in scored]
+        to_translate = []
+        extracted = 0
+        for record in self.comments:
+            extracted = max(extracted, record['index'])
+            if record['index'] not in translated and record['index'] not in scored:
+                to_translate.append(record)
+        # A crash between appending comments and saving state leaves the file ahead
+        state['extracted'] = max(state['extracted'], extracted)
+        return state, list(scored.values()), to_score, to_translate
+
+    def summary(self):
+        state, scored, to_score, to_translate = self.pending()
+        return {
+            'extracted': state['extracted'],
+            'extraction_complete': state['extraction_complete'],
+            'scored': len(scored),
+            'to_score': len(to_score),
+            'to_translate': len(to_translate),
+            'failed': len(self.retry.read()),
+        }
+
+    def finish(self, records):
+        """Close a run given every record it produced. Returns how many
+        failed to score; those stay in the checkpoint so the next run
+        retries them, and with none the checkpoint is removed."""
+        failed = sum(record['sentiment'] == 'Error' for record in records)
+        if not failed:
+            self.remove()
+        return failed
+
+    def remove(self):
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
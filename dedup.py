@@ -0,0 +1,186 @@
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+from cache import normalize_text
+from local_model import NEGATORS, TOKEN_RE, LexiconSentimentModel
+
+# Mersenne prime above every crc32 value; keeps a*x + b inside uint64
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+TRANSLATION_COLUMNS = ('translation', 'language', 'translation_status')
+SENTIMENT_COLUMNS = ('sentiment', 'confidence', 'key_words', 'reasoning', 'scored_by')
+
+
+def normalize_for_dedup(text):
+    """Reduce a comment to what makes it a copy of another: case,
+    punctuation, stretched letters and spacing are ignored ("Soooo GOOD!!!"
+    and "sooo good" normalize the same)"""
+    text = normalize_text(text, casefold=True)
+    text = re.sub(r"['\u2019]", '', text)
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'(\w)\1{2,}', r'\1\1', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class CommentDeduplicator:
+    """Groups exact and near-identical comments so only one per group is
+    translated and scored.
+
+    Exact copies are found by hashing the normalized text. Near copies
+    ("Anyone else watching this in 2026 because of the algorithm?" /
+    "anyone else watching this in 2026 cause of the algorithm") are found
+    with MinHash signatures over character shingles, bucketed by LSH bands
+    so each comment is only compared with a handful of candidates. A
+    candidate joins a group when the signatures agree on at least
+    `threshold` of their positions (the estimated Jaccard similarity) and
+    both texts carry the same sentiment cues: the local model's label and
+    matched words, and the negators.
+    "The editing is really good" / "really bad" or "I don't like this" /
+    "I do like this" are nearly the same text but not the same comment.
+    Texts shorter than `min_length` after normalization are matched
+    exactly only, since a changed word is most of a short comment."""
+
+    def __init__(self, threshold=0.85, num_perm=64, bands=16, shingle_size=4, min_length=12, seed=1,
+                 model=None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_length = min_length
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        # Decides which words carry sentiment
+        self.model = model or LexiconSentimentModel()
+        self._exact = {}
+        self._buckets = {}
+        self._signatures = {}
+        # Normalized text of each group with a signature, and its cues once computed
+        self._texts = {}
+        self._cues = {}
+        self.exact = 0
+        self.near = 0
+        # Near matches kept apart because their sentiment cues differ
+        self.kept_apart = 0
+
+    def _shingles(self, text):
+        size = self.shingle_size
+        shingles = {text[i:i + size] for i in range(len(text) - size + 1)} or {text}
+        return np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                           dtype=np.uint64, count=len(shingles))
+
+    def signature(self, text):
+        """MinHash signature of already normalized text"""
+        hashes = self._shingles(text)
+        return ((np.outer(self._a, hashes) % _PRIME + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def sentiment_cues(self, text):
+        """(local model label, matched lexicon words, negators) of already
+        normalized text; a near copy must have the same"""
+        label, _, matched = self.model.predict([text])[0]
+        return label, frozenset(matched), frozenset(token for token in TOKEN_RE.findall(text) if token in NEGATORS)
+
+    def _group_cues(self, key):
+        if key not in self._cues:
+            self._cues[key] = self.sentiment_cues(self._texts[key])
+        return self._cues[key]
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    def _near(self, signature, text):
+        seen = set()
+        cues = None
+        for band_key in self._band_keys(signature):
+            for key in self._buckets.get(band_key, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                if np.mean(self._signatures[key] == signature) >= self.threshold:
+                    # Only worked out for texts that are already close
+                    cues = cues or self.sentiment_cues(text)
+                    if self._group_cues(key) == cues:
+                        return key
+                    self.kept_apart += 1
+        return None
+
+    def _index(self, key, digest, signature, text):
+        self._exact[digest] = key
+        if signature is not None:
+            self._signatures[key] = signature
+            self._texts[key] = text
+            for band_key in self._band_keys(signature):
+                self._buckets.setdefault(band_key, []).append(key)
+
+    def assign(self, key, text):
+        """Return the key of the group `text` belongs to; a text unlike
+        every one seen before starts a group of its own under `key`"""
+        normalized = normalize_for_dedup(text)
+        digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+        found = self._exact.get(digest)
+        if found is not None:
+            self.exact += 1
+            return found
+        signature = self.signature(normalized) if len(normalized) >= self.min_length else None
+        if signature is not None:
+            found = self._near(signature, normalized)
+            if found is not None:
+                self.near += 1
+                # Further exact copies of this variant skip the signature compare
+                self._exact[digest] = found
+                return found
+        self._index(key, digest, signature, normalized)
+        return key
+
+    def stats(self):
+        return {'groups': len(set(self._exact.values())), 'exact': self.exact, 'near': self.near,
+                'kept_apart': self.kept_apart}
+
+
+def copy_translation(source, record):
+    """Give a duplicate the translation of the record it repeats. Text that
+    did not need translating keeps its own wording."""
+    record['duplicate_of'] = source['index']
+    if source['translation_status'] == 'skipped':
+        record['translation'] = record['original']
+        record['language'] = source['language']
+        record['translation_status'] = 'skipped'
+    else:
+        for column in TRANSLATION_COLUMNS:
+            record[column] = source[column]
+    return record
+
+
+def copy_sentiment(source, record):
+    """Give a duplicate the sentiment of the record it repeats"""
+    record['duplicate_of'] = source['index']
+    for column in SENTIMENT_COLUMNS:
+        record[column] = source[column]
+    return record
+
+
+def copy_labels(source, record):
+    """Give a duplicate the translation and sentiment of the record it repeats"""
+    return copy_sentiment(source, copy_translation(source, record))
+
+
+def split_duplicates(records, deduplicator):
+    """Split records into (unique, duplicates), where duplicates pairs each
+    later copy with the first record of its group"""
+    unique, duplicates, by_key = [], [], {}
+    for record in records:
+        key = deduplicator.assign(record['index'], record['original'])
+        if key == record['index']:
+            by_key[key] = record
+            unique.append(record)
+        else:
+            duplicates.append((record, by_key[key]))
+    return unique, duplicates
@@ -0,0 +1,566 @@
+import json
+import re
+import time
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlparse
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from browser import get_default_pool
+from metrics import Metrics
+from sessions import make_session
+from store import Comment, CommentStore
+
+# Only text inside the comment section: the description also uses #content-text
+COMMENT_SELECTOR = 'ytd-comments #content-text'
+# "1,234 Comments" above the list; YouTube's count includes replies
+COMMENT_COUNT_SELECTOR = 'ytd-comments-header-renderer #count'
+# Harvested comment nodes are tagged so later steps only look at new ones
+NEW_COMMENT_SELECTOR = COMMENT_SELECTOR + ':not([data-harvested])'
+# YouTube keeps a continuation item (showing a spinner) at the end of the
+# comment list for as long as there are more comments to load. Reply threads
+# have their own, which say nothing about the top-level list.
+CONTINUATION_SELECTOR = ('ytd-comments ytd-continuation-item-renderer'
+                         ':not(ytd-comment-replies-renderer ytd-continuation-item-renderer)')
+LOAD_STATE_JS = """
+return [document.querySelectorAll(arguments[0]).length,
+        document.querySelectorAll(arguments[1]).length];
+"""
+# Reads every comment node not harvested yet in one round trip and returns
+# plain records. Replies carry the id of the comment that opens their thread.
+# With arguments[1] set, comment threads whose nodes have all been harvested
+# are removed, except the last one, so the DOM stays small. With arguments[2]
+# also set, threads with a reply section are kept, since their replies may
+# still be loading.
+HARVEST_JS = """
+const [selector, prune, keepReplies] = arguments;
+const ITEM = 'ytd-comment-view-model, ytd-comment-renderer';
+const commentId = (item) => {
+    const link = item && item.querySelector('#published-time-text a, a[href*="lc="]');
+    const match = link && /[?&]lc=([\\w.-]+)/.exec(link.getAttribute('href') || '');
+    return [match ? match[1] : null, link ? link.textContent.trim() : null];
+};
+const records = [];
+for (const node of document.querySelectorAll(selector + ':not([data-harvested])')) {
+    node.setAttribute('data-harvested', '1');
+    const item = node.closest(ITEM);
+    const pick = (query) => {
+        const element = item && item.querySelector(query);
+        return element ? element.textContent.trim() : null;
+    };
+    const [id, published] = commentId(item);
+    let parent = null;
+    if (node.closest('ytd-comment-replies-renderer')) {
+        const thread = node.closest('ytd-comment-thread-renderer');
+        parent = thread ? commentId(thread.querySelector(ITEM))[0] : null;
+    }
+    records.push({
+        text: node.innerText,
+        author: pick('#author-text'),
+        likes: pick('#vote-count-middle'),
+        id: id,
+        parent: parent,
+        published: published,
+    });
+}
+if (prune) {
+    const threads = Array.from(document.querySelectorAll('ytd-comment-thread-renderer'));
+    for (const thread of threads.slice(0, -1)) {
+        if (keepReplies && thread.querySelector('ytd-comment-replies-renderer')) {
+            continue;
+        }
+        if (!thread.querySelector(selector + ':not([data-harvested])')) {
+            thread.remove();
+        }
+    }
+}
+return records;
+"""
+# Opens collapsed reply threads and their "Show more replies" buttons,
+# each once; returns how many were clicked
+EXPAND_REPLIES_JS = """
+let clicked = 0;
+for (const button of document.querySelectorAll(
+        'ytd-comment-replies-renderer #more-replies button:not([data-clicked]), ' +
+        'ytd-comment-replies-renderer ytd-continuation-item-renderer button:not([data-clicked])')) {
+    button.setAttribute('data-clicked', '1');
+    button.click();
+    clicked += 1;
+}
+return clicked;
+"""
+
+
+class YouTubeCommentExtractor:
+    def __init__(self, video_url, pool=None, max_comments=None, max_seconds=None,
+                 load_timeout=10, stall_retries=2, prune_dom=False, expand_replies=False, metrics=None):
+        self.video_url = video_url
+        # Warm browsers shared across videos; see browser.WebDriverPool
+        self.pool = pool
+        # Budgets: stop after this many comments or this much scraping time
+        self.max_comments = max_comments
+        self.max_seconds = max_seconds
+        # How long one scroll may take to load more before it counts as a stall,
+        # and how many stalls in a row end the scrape
+        self.load_timeout = load_timeout
+        self.stall_retries = stall_retries
+        # Drop harvested comment threads from the page so long scrapes keep
+        # browser memory flat
+        self.prune_dom = prune_dom
+        # Also collect replies, each right after the comment it answers
+        self.expand_replies = expand_replies
+        # A page scrape cannot seek, so resumed runs scrape from the top
+        # again and the caller skips what it already has
+        self.resume = None
+        self.state = None
+        # Comment count shown by YouTube, once the extractor has seen it
+        self.expected_total = None
+        # Publish time (parse_published) of the newest comment an earlier run
+        # analyzed. Backends that can list comments newest first stop once
+        # they are past it; the caller skips the ones it already has.
+        self.since = None
+        self.metrics = metrics or Metrics()
+        
+    def remove_emojis(self, text):
+        emoji_pattern = re.compile("["
+                                  u"\U0001F600-\U0001F64F"  # emoticons
+                                  u"\U0001F300-\U0001F5FF"  # symbols & pictographs
+                                  u"\U0001F680-\U0001F6FF"  # transport & map symbols
+                                  u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
+                                  u"\U00002702-\U000027B0"
+                                  u"\U000024C2-\U0001F251"
+                                  u"\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
+                                  u"\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
+                                  u"\U00002600-\U000026FF"  # Miscellaneous Symbols
+                                  u"\U00002700-\U000027BF"  # Dingbats
+                                  "]+", flags=re.UNICODE)
+        return emoji_pattern.sub(r'', text)
+    
+    def save_comments(self, records, store=None):
+        store = store or CommentStore.for_stage('comments')
+        return store.write(records)
+    
+    def _harvest(self, driver):
+        """Return the comments rendered since the last call, cleaned, in one
+        execute_script round trip instead of one per element"""
+        new_comments = []
+        for comment in driver.execute_script(HARVEST_JS, COMMENT_SELECTOR, self.prune_dom, self.expand_replies):
+            comment_text = (comment['text'] or '').strip()
+            if comment_text != "":
+                clean_comment = self.remove_emojis(comment_text).strip()
+                if clean_comment != "":
+                    new_comments.append(Comment(clean_comment, comment_id=comment['id'],
+                                                parent_id=comment['parent'], author=comment['author'],
+                                                likes=parse_count(comment['likes']),
+                                                published=comment['published'],
+                                                published_at=parse_published(comment['published'])))
+        return new_comments
+    
+    def _time_left(self, start):
+        if not self.max_seconds:
+            return self.load_timeout
+        return max(0.0, min(self.load_timeout, self.max_seconds - (time.monotonic() - start)))
+    
+    def _wait_for_more(self, driver, timeout, allow_end=True):
+        """Block until the page shows comments not harvested yet ('more'), has
+        nothing left to load ('end'), or `timeout` passes ('timeout')"""
+        def loaded(driver):
+            count, pending = driver.execute_script(LOAD_STATE_JS, NEW_COMMENT_SELECTOR, CONTINUATION_SELECTOR)
+            if count:
+                return 'more'
+            return 'end' if allow_end and not pending else False
+        try:
+            return WebDriverWait(driver, timeout, poll_frequency=0.1).until(loaded)
+        except TimeoutException:
+            return 'timeout'
+    
+    def iter_records(self):
+        """Yield a store record per cleaned comment as each scroll step loads it.
+        Each scroll waits only as long as the page takes to load more."""
+        pool = self.pool or get_default_pool()
+        start = time.monotonic()
+        try:
+            with pool.driver() as driver:
+                driver.get(self.video_url)
+                
+                # The comment section only renders once it is scrolled into view
+                driver.execute_script("window.scrollTo(0, 800);")
+                try:
+                    WebDriverWait(driver, self._time_left(start), poll_frequency=0.1).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, COMMENT_SELECTOR)))
+                except TimeoutException:
+                    # Comments are disabled, or the page is too slow for the budget
+                    return
+                header = driver.find_elements(By.CSS_SELECTOR, COMMENT_COUNT_SELECTOR)
+                if header:
+                    self.expected_total = parse_count(header[0].text)
+                
+                yielded = 0
+                stalls = 0
+                finished = False
+                seen_ids = set()
+                
+                while True:
+                    for comment in self._harvest(driver):
+                        # YouTube re-renders threads now and then; ids tell the copies apart
+                        if comment.comment_id:
+                            if comment.comment_id in seen_ids:
+                                continue
+                            seen_ids.add(comment.comment_id)
+                        yielded += 1
+                        yield comment.to_record(yielded)
+                        if self.max_comments and yielded >= self.max_comments:
+                            return
+                    if finished:
+                        break
+                    
+                    timeout = self._time_left(start)
+                    if timeout <= 0:
+                        break
+                    with self.metrics.time('scrape_step_seconds', backend='selenium'):
+                        clicked = driver.execute_script(EXPAND_REPLIES_JS) if self.expand_replies else 0
+                        driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
+                        # Replies just opened still count as loading even at the end of the list
+                        outcome = self._wait_for_more(driver, timeout, allow_end=not clicked)
+                    if outcome == 'end':
+                        break
+                    if outcome == 'timeout':
+                        # A slow load is scrolled at again before giving up on it
+                        stalls += 1
+                        # One more harvest picks up anything that landed just too late
+                        finished = stalls > self.stall_retries
+                    else:
+                        stalls = 0
+            
+        except Exception as e:
+            raise Exception(f"Error extracting comments: {e}")
+    
+    def iter_comments(self):
+        for record in self.iter_records():
+            yield record['original']
+    
+    def extract_comments(self):
+        return self.save_comments(self.iter_records())
+
+
+YT_CFG_RE = re.compile(r'ytcfg\.set\s*\(\s*({.+?})\s*\)\s*;')
+YT_INITIAL_DATA_RE = re.compile(
+    r'(?:window\s*\[\s*["\']ytInitialData["\']\s*\]|ytInitialData)\s*=\s*({.+?})\s*;\s*(?:var\s+meta|</script|\n)'
+)
+COMMENT_SECTION_TARGETS = ('comments-section', 'engagement-panel-comments-section',
+                           'shorts-engagement-panel-comments-section')
+
+
+def extract_video_id(video_url):
+    """Return the 11-character video id from the usual YouTube URL shapes"""
+    parsed = urlparse(video_url)
+    if parsed.hostname and parsed.hostname.endswith('youtu.be'):
+        return parsed.path.lstrip('/').split('/')[0] or None
+    query = parse_qs(parsed.query)
+    if 'v' in query:
+        return query['v'][0]
+    match = re.search(r'/(?:shorts|embed|live|v)/([\w-]{11})', parsed.path)
+    if match:
+        return match.group(1)
+    return video_url if re.fullmatch(r'[\w-]{11}', video_url or '') else None
+
+
+def parse_count(text):
+    """Turn a displayed count such as '1.2K' or '3 M' into an int ('' is 0)"""
+    if text is None:
+        return None
+    text = text.strip().replace(',', '').upper()
+    if not text:
+        return 0
+    match = re.match(r'^([\d.]+)\s*([KMB]?)', text)
+    if not match:
+        return None
+    multiplier = {'': 1, 'K': 1_000, 'M': 1_000_000, 'B': 1_000_000_000}[match.group(2)]
+    return int(round(float(match.group(1)) * multiplier))
+
+
+RELATIVE_TIME_RE = re.compile(r'(\d+)\s*(second|minute|hour|day|week|month|year)s?\s+ago', re.IGNORECASE)
+UNIT_SECONDS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400, 'week': 7 * 86400,
+                'month': 30 * 86400, 'year': 365 * 86400}
+
+
+def parse_published(text, now=None):
+    """Turn a relative time such as '3 hours ago' or '2 days ago (edited)'
+    into a UTC ISO 8601 timestamp, or None. YouTube rounds down, so this is
+    the latest time the comment can have been posted; timestamps made here
+    compare in time order as plain strings."""
+    match = RELATIVE_TIME_RE.search(text or '')
+    if not match:
+        return None
+    seconds = int(match.group(1)) * UNIT_SECONDS[match.group(2).lower()]
+    now = time.time() if now is None else now
+    return datetime.fromtimestamp(now - seconds, timezone.utc).isoformat(timespec='seconds')
+
+
+def search_dict(partial, search_key):
+    """Yield every value stored under search_key anywhere in a nested structure"""
+    stack = [partial]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            for key, value in current.items():
+                if key == search_key:
+                    yield value
+                else:
+                    stack.append(value)
+        elif isinstance(current, list):
+            stack.extend(current)
+
+
+class InnerTubeCommentExtractor(YouTubeCommentExtractor):
+    """Fetches comments over HTTP by following the continuation tokens that
+    the watch page and the youtubei/v1/next endpoint hand out, instead of
+    driving a browser"""
+    
+    def __init__(self, video_url, session=None, base_url="https://www.youtube.com",
+                 max_comments=None, max_seconds=None, timeout=30, resume=None, expand_replies=False,
+                 metrics=None):
+        super().__init__(video_url, max_comments=max_comments, max_seconds=max_seconds,
+                         expand_replies=expand_replies, metrics=metrics)
+        # resume/state: {'ytcfg', 'endpoint', 'index', 'fetched'} of the page
+        # being read, enough to continue from that page in a later process,
+        # plus whether the list is read newest first and the `since` the run
+        # started with
+        self.resume = resume
+        self.session = session or make_session()
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+    
+    def _load_watch_page(self):
+        video_id = extract_video_id(self.video_url)
+        if not video_id:
+            raise ValueError(f"Could not find a video id in {self.video_url!r}")
+        response = self.session.get(f"{self.base_url}/watch", params={'v': video_id},
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        html = response.text
+        
+        cfg_match = YT_CFG_RE.search(html)
+        data_match = YT_INITIAL_DATA_RE.search(html)
+        if not cfg_match or not data_match:
+            raise ValueError("Watch page is missing ytcfg or ytInitialData")
+        return json.loads(cfg_match.group(1)), json.loads(data_match.group(1))
+    
+    def _next_page(self, endpoint, ytcfg):
+        api_url = (endpoint.get('commandMetadata', {}).get('webCommandMetadata', {})
+                   .get('apiUrl', '/youtubei/v1/next'))
+        payload = {
+            'context': ytcfg['INNERTUBE_CONTEXT'],
+            'continuation': endpoint['continuationCommand']['token'],
+        }
+        with self.metrics.time('scrape_step_seconds', backend='innertube'):
+            response = self.session.post(self.base_url + api_url,
+                                         params={'key': ytcfg.get('INNERTUBE_API_KEY', '')},
+                                         json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+    
+    def _parse_comment(self, item, entities, parent_id=None):
+        """Comment from a commentRenderer or commentViewModel item, or None"""
+        # Older layout carries the text inline, newer one points at an entity payload
+        renderer = item.get('commentRenderer')
+        if renderer:
+            runs = renderer.get('contentText', {}).get('runs', [])
+            published = renderer.get('publishedTimeText', {}).get('runs', [{}])[0].get('text')
+            return Comment(''.join(run.get('text', '') for run in runs),
+                           comment_id=renderer.get('commentId'), parent_id=parent_id,
+                           author=renderer.get('authorText', {}).get('simpleText'),
+                           likes=parse_count(renderer.get('voteCount', {}).get('simpleText', '')),
+                           published=published, published_at=parse_published(published))
+        view_model = item.get('commentViewModel', {})
+        view_model = view_model.get('commentViewModel', view_model)
+        entity = entities.get(view_model.get('commentKey'))
+        if entity:
+            properties = entity['properties']
+            published = properties.get('publishedTime')
+            return Comment(properties['content']['content'],
+                           comment_id=properties.get('commentId'), parent_id=parent_id,
+                           author=entity.get('author', {}).get('displayName'),
+                           likes=parse_count(entity.get('toolbar', {}).get('likeCountNotliked', '')),
+                           published=published, published_at=parse_published(published))
+        return None
+    
+    def _newest_first_endpoint(self, page):
+        """Continuation endpoint of the comment list sorted newest first, from
+        the sort menu in the first page's header, or None"""
+        menu = next(search_dict(page, 'sortFilterSubMenuRenderer'), None)
+        items = (menu or {}).get('subMenuItems', [])
+        # Titles are localized; the menu is always [Top comments, Newest first]
+        if len(items) < 2 or items[1].get('selected'):
+            return None
+        return items[1].get('serviceEndpoint')
+    
+    def _parse_page(self, page, parent_id=None):
+        """Return (comments, next continuation endpoint, reply endpoints by
+        comment id) for a page of top-level comments, or of the replies to
+        `parent_id`"""
+        comments = []
+        next_endpoint = None
+        reply_endpoints = {}
+        
+        entities = {payload.get('key'): payload for payload in search_dict(page, 'commentEntityPayload')}
+        actions = (list(search_dict(page, 'reloadContinuationItemsCommand')) +
+                   list(search_dict(page, 'appendContinuationItemsAction')))
+        for action in actions:
+            target = action.get('targetId') or ''
+            if parent_id is None and target not in COMMENT_SECTION_TARGETS:
+                continue
+            if parent_id is not None and not target.startswith('comment-replies-item'):
+                continue
+            for item in action.get('continuationItems', []):
+                if 'continuationItemRenderer' in item:
+                    # Top-level pages continue via an endpoint, reply pages via a "more replies" button
+                    next_endpoint = (next(search_dict(item, 'continuationEndpoint'), None) or
+                                     next(search_dict(item, 'command'), None))
+                    continue
+                thread = item.get('commentThreadRenderer')
+                comment = self._parse_comment(thread.get('comment', thread) if thread else item,
+                                              entities, parent_id)
+                if comment is None:
+                    continue
+                comments.append(comment)
+                replies = (thread or {}).get('replies', {}).get('commentRepliesRenderer')
+                endpoint = next(search_dict(replies, 'continuationEndpoint'), None) if replies else None
+                if endpoint and comment.comment_id:
+                    reply_endpoints[comment.comment_id] = endpoint
+        return comments, next_endpoint, reply_endpoints
+    
+    def _iter_replies(self, parent_id, endpoint, ytcfg):
+        while endpoint:
+            replies, endpoint, _ = self._parse_page(self._next_page(endpoint, ytcfg), parent_id)
+            yield from replies
+    
+    def iter_comment_pages(self):
+        """Yield the comments of each continuation page, each top-level
+        comment followed by its replies when expand_replies is set"""
+        if self.resume:
+            ytcfg, endpoint = self.resume['ytcfg'], self.resume['endpoint']
+        else:
+            ytcfg, data = self._load_watch_page()
+            sections = list(search_dict(data, 'itemSectionRenderer'))
+            item_section = next((section for section in sections
+                                 if section.get('sectionIdentifier') == 'comment-item-section'),
+                                sections[0] if sections else None)
+            renderer = next(search_dict(item_section, 'continuationItemRenderer'), None) if item_section else None
+            if not renderer:
+                # Comments are disabled or the page layout is unknown
+                return
+            endpoint = renderer['continuationEndpoint']
+        
+        if self.resume:
+            # A list resumed in top order cannot end early. One resumed newest
+            # first ends at the watermark its run started with, which its own
+            # comments may have moved since
+            newest_first = self.resume.get('newest_first', False)
+            since = self.resume.get('since') if newest_first else None
+            self._since = self.resume.get('since')
+        else:
+            newest_first, since = False, self.since
+            self._since = self.since
+        
+        # Counts toward max_comments across resumes; states saved without it
+        # only have the record index, which is close
+        fetched = self.resume.get('fetched', self.resume['index']) if self.resume else 0
+        sort_tried = False
+        start = time.monotonic()
+        self._ytcfg = ytcfg
+        self._newest_first = newest_first
+        while endpoint:
+            if self.max_seconds and time.monotonic() - start >= self.max_seconds:
+                return
+            self._page_endpoint = endpoint
+            self._fetched = fetched
+            page = self._next_page(endpoint, ytcfg)
+            if self.expected_total is None:
+                header = next(search_dict(page, 'commentsHeaderRenderer'), None)
+                if header:
+                    count_text = header.get('countText', {})
+                    self.expected_total = parse_count(''.join(run.get('text', '') for run in count_text.get('runs', []))
+                                                      or count_text.get('simpleText', ''))
+            if since and not newest_first and fetched == 0 and not sort_tried:
+                # Newest first, a later run can stop as soon as it reaches comments it has seen
+                sort_tried = True
+                newest = self._newest_first_endpoint(page)
+                if newest:
+                    endpoint = newest
+                    newest_first = self._newest_first = True
+                    continue
+            page_comments, endpoint, reply_endpoints = self._parse_page(page)
+            if newest_first and since and page_comments and all(
+                    comment.published_at and comment.published_at < since for comment in page_comments):
+                # A whole page older than the newest comment analyzed before:
+                # everything after it is older still
+                return
+            if self.expand_replies and reply_endpoints:
+                threaded = []
+                for comment in page_comments:
+                    threaded.append(comment)
+                    if comment.comment_id in reply_endpoints:
+                        threaded.extend(self._iter_replies(comment.comment_id,
+                                                           reply_endpoints[comment.comment_id], ytcfg))
+                page_comments = threaded
+            if self.max_comments and fetched + len(page_comments) >= self.max_comments:
+                yield page_comments[:self.max_comments - fetched]
+                return
+            fetched += len(page_comments)
+            yield page_comments
+    
+    def fetch_comments(self):
+        """Every comment as a compact Comment, deduplicated by id"""
+        seen_ids = set()
+        comments = []
+        for page in self.iter_comment_pages():
+            for comment in page:
+                if comment.comment_id:
+                    if comment.comment_id in seen_ids:
+                        continue
+                    seen_ids.add(comment.comment_id)
+                comments.append(comment)
+        return comments
+    
+    def fetch_comment_texts(self):
+        return [comment.text for comment in self.fetch_comments()]
+    
+    def iter_records(self):
+        try:
+            index = self.resume['index'] if self.resume else 0
+            seen_ids = set()
+            for page in self.iter_comment_pages():
+                # Refetching this page later yields the same comments from here on
+                self.state = {'ytcfg': self._ytcfg, 'endpoint': self._page_endpoint, 'index': index,
+                              'fetched': self._fetched, 'newest_first': self._newest_first,
+                              'since': self._since}
+                for comment in page:
+                    # A comment can come back on a later page once the list shifts
+                    if comment.comment_id:
+                        if comment.comment_id in seen_ids:
+                            continue
+                        seen_ids.add(comment.comment_id)
+                    comment.text = self.remove_emojis(comment.text.strip()).strip()
+                    if comment.text != "":
+                        index += 1
+                        yield comment.to_record(index)
+        except Exception as e:
+            raise Exception(f"Error extracting comments: {e}")
+
+
+EXTRACTOR_BACKENDS = {
+    'selenium': YouTubeCommentExtractor,
+    'innertube': InnerTubeCommentExtractor,
+}
+
+
+def get_extractor(video_url, backend='selenium', **kwargs):
+    try:
+        extractor_class = EXTRACTOR_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown extractor backend {backend!r}")
+    return extractor_class(video_url, **kwargs)
@@ -0,0 +1,120 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+
+
+class AnalysisJob:
+    """One background analysis, shared by every session watching it.
+
+    The job's target publishes scored records with `add` as they arrive.
+    Readers poll `snapshot()` for a consistent copy, so a Streamlit rerun
+    can drop its view and pick the job up again by id."""
+
+    def __init__(self, key, label=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.label = label or key
+        self.status = 'queued'
+        self.error = None
+        self.stats = {}
+        self.context = {}
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._records = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def add(self, record, stats=None):
+        with self._lock:
+            self._records.append(record)
+            if stats is not None:
+                self.stats = dict(stats)
+
+    def set_stats(self, stats):
+        with self._lock:
+            self.stats = dict(stats)
+
+    def snapshot(self):
+        """Return (records, stats) as of now"""
+        with self._lock:
+            return list(self._records), dict(self.stats)
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def run(self, target, args, kwargs):
+        self.status = 'running'
+        self.started = time.time()
+        try:
+            target(self, *args, **kwargs)
+            self.status = 'done'
+        except Exception as e:
+            self.error = e
+            self.status = 'failed'
+        finally:
+            self.finished = time.time()
+            self._done.set()
+
+
+class JobManager:
+    """Runs analysis jobs on a fixed pool of worker threads.
+
+    `max_jobs` caps how many run at once; the rest wait as 'queued'.
+    Submitting a key that already has an unfinished job returns that job
+    instead of starting a second one, so the same video is only scraped
+    and scored once however many people ask for it. Finished jobs stay
+    around (up to `history`) so their results can still be shown."""
+
+    def __init__(self, max_jobs=2, history=50):
+        self.max_jobs = max_jobs
+        self.history = history
+        self._pool = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='analysis-job')
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, target, *args, label=None, **kwargs):
+        """Start `target(job, *args, **kwargs)` in the background.
+        Returns (job, created)."""
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None and not job.done:
+                return job, False
+            job = AnalysisJob(key, label=label)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._prune()
+        self._pool.submit(job.run, target, args, kwargs)
+        return job, True
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            job = self._jobs.pop(job_id)
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """All known jobs, newest first"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def counts(self):
+        jobs = self.jobs()
+        return {status: sum(job.status == status for job in jobs) for status in JOB_STATUSES}
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
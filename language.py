@@ -0,0 +1,134 @@
+import re
+import unicodedata
+
+# Unicode blocks that identify a language (or a close family) on their own
+SCRIPT_RANGES = (
+    ('hi', 0x0900, 0x097F),  # Devanagari
+    ('bn', 0x0980, 0x09FF),  # Bengali
+    ('pa', 0x0A00, 0x0A7F),  # Gurmukhi
+    ('gu', 0x0A80, 0x0AFF),  # Gujarati
+    ('ta', 0x0B80, 0x0BFF),  # Tamil
+    ('te', 0x0C00, 0x0C7F),  # Telugu
+    ('kn', 0x0C80, 0x0CFF),  # Kannada
+    ('ml', 0x0D00, 0x0D7F),  # Malayalam
+    ('th', 0x0E00, 0x0E7F),  # Thai
+    ('el', 0x0370, 0x03FF),  # Greek
+    ('ru', 0x0400, 0x04FF),  # Cyrillic
+    ('he', 0x0590, 0x05FF),  # Hebrew
+    ('ar', 0x0600, 0x06FF),  # Arabic
+    ('ko', 0xAC00, 0xD7AF),  # Hangul
+    ('ja', 0x3040, 0x30FF),  # Hiragana and Katakana
+    ('zh', 0x4E00, 0x9FFF),  # CJK ideographs
+)
+
+# Frequent function words per Latin-script language. Romanized Hindi is
+# listed as 'hi' because it is common in comment sections and Google
+# translates it as Hindi.
+STOPWORDS = {
+    'en': {'the', 'and', 'is', 'are', 'was', 'were', 'this', 'that', 'it', 'you', 'your', 'i',
+           'my', 'me', 'we', 'they', 'he', 'she', 'of', 'to', 'in', 'on', 'for', 'with', 'what',
+           'have', 'has', 'be', 'not', 'but', 'so', 'just', 'can', 'do', 'does', 'at', 'who',
+           'how', 'why', 'from', 'about', 'all', 'very', 'really', 'love', 'great', 'video',
+           'good', 'thanks', 'thank', 'like', 'best', 'here', 'will', 'would', 'an', 'or'},
+    'es': {'el', 'la', 'los', 'las', 'es', 'que', 'y', 'muy', 'pero', 'por', 'para', 'con',
+           'una', 'un', 'del', 'lo', 'mi', 'gracias', 'este', 'esta', 'como', 'más', 'mas',
+           'nada', 'me', 'se', 'su', 'yo', 'hay', 'bueno', 'todo', 'también', 'sí'},
+    'fr': {'le', 'les', 'est', 'et', 'des', 'une', 'un', 'pour', 'pas', 'que', 'qui', 'dans',
+           'sur', 'avec', 'ce', "c'est", 'je', 'vous', 'tu', 'mais', 'merci', 'très', 'tres',
+           'du', 'au', 'aux', 'cette', 'ça', 'ca', 'vidéo', 'bien', 'trop', 'beaucoup'},
+    'de': {'der', 'die', 'das', 'und', 'ist', 'nicht', 'ein', 'eine', 'ich', 'du', 'sie',
+           'mit', 'auf', 'für', 'fur', 'sehr', 'auch', 'aber', 'wie', 'was', 'danke', 'noch',
+           'dem', 'den', 'des', 'zu', 'es', 'im', 'schaut', 'diese', 'dieser', 'tolles'},
+    'it': {'il', 'che', 'di', 'è', 'e', 'per', 'una', 'sono', 'non', 'della', 'con', 'lo',
+           'gli', 'ma', 'mi', 'ti', 'questo', 'questa', 'grazie', 'molto', 'bravo', 'bella',
+           'ottimo', 'lavoro', 'anche', 'come', 'cosa', 'tutto', 'complimenti'},
+    'pt': {'o', 'os', 'que', 'é', 'não', 'nao', 'uma', 'um', 'com', 'para', 'muito', 'mas',
+           'eu', 'você', 'voce', 'meu', 'minha', 'obrigado', 'obrigada', 'vídeo', 'isso',
+           'esse', 'essa', 'ruim', 'perdi', 'tempo', 'tá', 'ta', 'bom', 'também'},
+    'nl': {'de', 'het', 'een', 'en', 'is', 'niet', 'dat', 'van', 'ik', 'je', 'jij', 'zijn',
+           'wat', 'maar', 'ook', 'heel', 'erg', 'bedankt', 'dank', 'mooi', 'goed', 'voor'},
+    'tr': {'bu', 've', 'bir', 'çok', 'cok', 'için', 'icin', 'ama', 'ne', 'da', 'de', 'mi',
+           'ben', 'sen', 'güzel', 'guzel', 'teşekkürler', 'tesekkurler', 'harika', 'video',
+           'değil', 'degil', 'var', 'yok', 'gibi'},
+    'id': {'yang', 'dan', 'ini', 'itu', 'tidak', 'saya', 'aku', 'kamu', 'dengan', 'untuk',
+           'ada', 'sangat', 'bagus', 'terima', 'kasih', 'juga', 'sudah', 'banget', 'keren'},
+    'hi': {'hai', 'hain', 'nahi', 'nahin', 'kya', 'bhai', 'bahut', 'bohot', 'bhot', 'accha',
+           'acha', 'achha', 'yeh', 'ye', 'aur', 'ka', 'ki', 'ke', 'mein', 'tha', 'thi', 'karo',
+           'kuch', 'sab', 'bhi', 'kaise', 'kyu', 'kyun', 'hum', 'tum', 'aap', 'mera', 'meri',
+           'tera', 'sahi', 'bilkul', 'dhanyavad', 'shukriya', 'wala', 'wali'},
+}
+
+# Letters that practically only occur in one of the Latin-script languages above
+DIACRITICS = {
+    'es': 'ñ¿¡',
+    'fr': 'çèêëàâîïôûœ',
+    'de': 'äöüß',
+    'pt': 'ãõ',
+    'tr': 'şğı',
+}
+
+WORD_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+
+
+class LanguageDetector:
+    """Offline, dependency-free language identification for short comments.
+
+    Non-Latin scripts are identified from their Unicode block. Latin-script
+    text is scored against per-language function-word lists and
+    language-specific letters. `detect` returns (language code,
+    confidence in 0..1), or (None, 0.0) when there is no signal."""
+
+    def __init__(self, script_share=0.3):
+        self.script_share = script_share
+
+    def _script_language(self, text):
+        letters = [ch for ch in text if ch.isalpha()]
+        if not letters:
+            return None, 0.0
+        counts = {}
+        for ch in letters:
+            code = ord(ch)
+            for language, start, end in SCRIPT_RANGES:
+                if start <= code <= end:
+                    counts[language] = counts.get(language, 0) + 1
+                    break
+        if not counts:
+            return None, 0.0
+        language = max(counts, key=counts.get)
+        share = counts[language] / len(letters)
+        return (language, share) if share >= self.script_share else (None, 0.0)
+
+    def detect(self, text):
+        text = unicodedata.normalize('NFC', text or '')
+        language, share = self._script_language(text)
+        if language:
+            return language, share
+
+        words = [word.lower() for word in WORD_RE.findall(text)]
+        if not words:
+            return None, 0.0
+
+        scores = {language: sum(word in stopwords for word in words)
+                  for language, stopwords in STOPWORDS.items()}
+        lower = text.lower()
+        for language, letters in DIACRITICS.items():
+            # A language-specific letter counts as much as two function words
+            scores[language] += 2 * sum(lower.count(letter) for letter in letters)
+        if not lower.isascii():
+            # Accented letters are rare in English comments
+            scores['en'] = max(0, scores['en'] - 1)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        (best, best_score), (_, runner_up) = ranked[0], ranked[1]
+        if best_score == 0 or best_score == runner_up:
+            # A tie says nothing about which language it is
+            return None, 0.0
+        # Laplace-smoothed share of the evidence held by the winner, scaled
+        # down for texts too short to say much
+        margin = (best_score + 1) / (best_score + runner_up + 2)
+        coverage = min(1.0, best_score / max(1, len(words)) * 2)
+        return best, round(margin * (0.5 + 0.5 * coverage), 3)
+
+    def is_language(self, text, language, threshold=0.6):
+        detected, confidence = self.detect(text)
+        return detected == language and confidence >= threshold
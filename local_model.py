@@ -0,0 +1,140 @@
+import re
+import zlib
+
+import numpy as np
+
+# Polarity weights for unigrams and a few fixed phrases, roughly on the
+# VADER -4..4 scale, tuned for YouTube comment vocabulary
+LEXICON = {
+    # positive
+    'love': 3.0, 'loved': 3.0, 'loving': 2.5, 'awesome': 3.0, 'amazing': 3.0, 'great': 2.5,
+    'best': 3.0, 'excellent': 3.0, 'perfect': 3.0, 'beautiful': 2.5, 'brilliant': 3.0,
+    'fantastic': 3.0, 'wonderful': 3.0, 'incredible': 3.0, 'outstanding': 3.0, 'superb': 3.0,
+    'masterpiece': 3.5, 'legend': 2.5, 'legendary': 3.0, 'goat': 2.0, 'fire': 1.5,
+    'nice': 2.0, 'good': 1.9, 'cool': 1.5, 'wow': 2.0, 'enjoyed': 2.5, 'enjoy': 2.0,
+    'hilarious': 2.5, 'funny': 1.5, 'lol': 1.0, 'inspiring': 2.5, 'inspired': 2.0,
+    'helpful': 2.5, 'helped': 2.0, 'useful': 2.0, 'informative': 2.5, 'clear': 1.0,
+    'thanks': 2.0, 'thank': 2.0, 'thx': 1.5, 'appreciate': 2.5,
+    'appreciated': 2.5, 'recommend': 2.0, 'underrated': 2.0, 'subscribed': 2.0,
+    'favorite': 2.5, 'favourite': 2.5, 'happy': 2.5, 'glad': 2.0, 'proud': 2.0,
+    'impressive': 2.5, 'impressed': 2.5, 'genius': 2.5, 'epic': 2.5, 'congrats': 2.5,
+    'congratulations': 2.5, 'respect': 2.0, 'worth': 1.5, 'excited': 2.0, 'exciting': 2.0,
+    'satisfying': 2.0, 'gem': 2.5, 'well done': 2.5, 'must watch': 2.5, 'thumbs up': 2.0,
+    'keep it up': 2.0,
+    # negative
+    'bad': -2.5, 'worst': -3.5, 'terrible': -3.0, 'awful': -3.0, 'horrible': -3.0,
+    'hate': -3.0, 'hated': -3.0, 'poor': -2.0, 'annoying': -2.5, 'annoyed': -2.0,
+    'disappointed': -2.5, 'disappointing': -2.5, 'disappointment': -2.5, 'stupid': -2.5,
+    'trash': -3.0, 'garbage': -3.0, 'sucks': -3.0, 'suck': -2.5, 'ugly': -2.5,
+    'wrong': -1.5, 'confusing': -2.0, 'confused': -1.5, 'lame': -2.0, 'overrated': -2.0,
+    'unsubscribed': -2.5, 'unsubscribe': -2.5, 'waste': -2.5, 'wasted': -2.5,
+    'boring': -2.5, 'bored': -2.0, 'pathetic': -3.0, 'ridiculous': -2.5, 'rubbish': -3.0,
+    'broken': -1.5, 'fail': -2.0, 'failed': -2.0, 'lies': -2.5, 'liar': -3.0,
+    'clickbait': -2.5, 'cringe': -2.5, 'scam': -3.0, 'fake': -2.0, 'misleading': -2.5,
+    'useless': -2.5, 'pointless': -2.5, 'meh': -1.0, 'sad': -2.0, 'angry': -2.5,
+    'disgusting': -3.0, 'dislike': -2.0, 'disliked': -2.0, 'nonsense': -2.5,
+    'worse': -2.5, 'mess': -2.0, 'thumbs down': -2.0, 'waste of time': -3.0,
+}
+
+NEGATORS = {'not', 'no', 'never', 'nothing', 'hardly', 'without', 'nor', 'neither',
+            "don't", 'dont', "doesn't", 'doesnt', "didn't", 'didnt', "isn't", 'isnt',
+            "wasn't", 'wasnt', "aren't", 'arent', "can't", 'cant', "won't", 'wont',
+            "couldn't", 'couldnt', "shouldn't", 'shouldnt'}
+INTENSIFIERS = {'very': 1.4, 'really': 1.4, 'so': 1.3, 'extremely': 1.6, 'super': 1.4,
+                'absolutely': 1.5, 'totally': 1.4, 'truly': 1.3, 'incredibly': 1.5,
+                'most': 1.3, 'too': 1.2, 'literally': 1.2}
+NEGATION_SCOPE = 3
+NEGATION_FACTOR = -0.75
+TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+MAX_PHRASE = 3
+
+
+def _bucket(feature, n_buckets):
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(feature.encode('utf-8')) % n_buckets
+
+
+class LexiconSentimentModel:
+    """CPU-only sentiment scorer over hashed word n-grams.
+
+    Lexicon weights are stored in a hashed weight vector. A batch of texts
+    is turned into (document, bucket, multiplier) triples, where the
+    multiplier carries negation, intensifiers and contrast ("but"). The
+    scores then come from a few NumPy gathers and bincounts. `predict`
+    returns one (label, confidence, matched words) tuple per text, with
+    confidence in 0..1."""
+
+    def __init__(self, lexicon=None, n_buckets=2 ** 16):
+        self.n_buckets = n_buckets
+        self.lexicon = dict(LEXICON if lexicon is None else lexicon)
+        self.weights = np.zeros(n_buckets, dtype=np.float32)
+        for feature, weight in self.lexicon.items():
+            self.weights[_bucket(feature, n_buckets)] = weight
+
+    def _features(self, text):
+        """Yield (feature, multiplier) for every word n-gram in the lexicon"""
+        tokens = TOKEN_RE.findall(text.lower().replace('’', "'"))
+        # Words after "but" carry the point of the sentence, words before it less so
+        contrast = [1.0] * len(tokens)
+        if 'but' in tokens:
+            pivot = tokens.index('but')
+            contrast = [0.5] * pivot + [1.0] + [1.5] * (len(tokens) - pivot - 1)
+
+        negated_until = -1
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token in NEGATORS:
+                negated_until = i + NEGATION_SCOPE
+                i += 1
+                continue
+            # Longest lexicon phrase starting here wins
+            for size in range(min(MAX_PHRASE, len(tokens) - i), 0, -1):
+                feature = ' '.join(tokens[i:i + size])
+                if feature in self.lexicon:
+                    multiplier = contrast[i]
+                    if i > 0 and tokens[i - 1] in INTENSIFIERS:
+                        multiplier *= INTENSIFIERS[tokens[i - 1]]
+                    if i <= negated_until:
+                        multiplier *= NEGATION_FACTOR
+                    yield feature, multiplier
+                    i += size
+                    break
+            else:
+                i += 1
+
+    def predict(self, texts):
+        texts = list(texts)
+        doc_ids, buckets, multipliers, features = [], [], [], []
+        for doc, text in enumerate(texts):
+            for feature, multiplier in self._features(text or ''):
+                doc_ids.append(doc)
+                buckets.append(_bucket(feature, self.n_buckets))
+                multipliers.append(multiplier)
+                features.append(feature)
+
+        n = len(texts)
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        contributions = self.weights[np.asarray(buckets, dtype=np.int64)] * np.asarray(multipliers, dtype=np.float32)
+        positive = np.bincount(doc_ids, weights=np.clip(contributions, 0, None), minlength=n)
+        negative = np.bincount(doc_ids, weights=np.clip(-contributions, 0, None), minlength=n)
+
+        # Polarity: how one-sided the evidence is; strength: how much there is
+        total = positive + negative
+        polarity = (positive - negative) / (total + 1.0)
+        strength = 1.0 - np.exp(-total / 2.0)
+        confidence = np.abs(polarity) * strength
+
+        matched = [[] for _ in range(n)]
+        for doc, feature in zip(doc_ids.tolist(), features):
+            matched[doc].append(feature)
+
+        predictions = []
+        for doc in range(n):
+            if total[doc] == 0:
+                # No evidence either way; only the LLM can tell neutral from subtle
+                predictions.append(('Neutral', 0.0, []))
+            else:
+                label = 'Positive' if polarity[doc] > 0 else 'Negative' if polarity[doc] < 0 else 'Neutral'
+                predictions.append((label, float(confidence[doc]), matched[doc]))
+        return predictions
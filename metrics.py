@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+# Every metric the pipeline records: name -> (type, help text, buckets)
+METRICS = {
+    'scrape_step_seconds': ('histogram', "Time to load one more batch of comments: a scroll step "
+                                         "(Selenium) or a continuation page (InnerTube)", LATENCY_BUCKETS),
+    'translation_request_seconds': ('histogram', "Latency of one translate request", LATENCY_BUCKETS),
+    'translation_requests_total': ('counter', "Translate requests by HTTP status", None),
+    'translation_retries_total': ('counter', "Translate requests that were retried", None),
+    'translations_total': ('counter', "Comments by translation status", None),
+    'llm_request_seconds': ('histogram', "Latency of one LLM completion attempt, by outcome", LATENCY_BUCKETS),
+    'llm_requests_total': ('counter', "LLM completion calls by outcome, after retries", None),
+    'llm_retries_total': ('counter', "LLM attempts that failed and were retried", None),
+    'llm_endpoint_calls_total': ('counter', "LLM attempts per endpoint, by outcome (ok, throttled, error)", None),
+    'llm_concurrency_limit': ('gauge', "Requests an endpoint may have in flight, as adapted to its 429s", None),
+    'llm_reasks_total': ('counter', "Answer items asked for again because they were missing or malformed", None),
+    'llm_tokens_total': ('counter', "LLM tokens used, by kind", None),
+    'llm_tokens_per_call': ('histogram', "LLM tokens per completion call, by kind", TOKEN_BUCKETS),
+    'cache_lookups_total': ('counter', "Result cache lookups by kind and result", None),
+    'scored_total': ('counter', "Comments scored, by tier", None),
+    'stage_batch_seconds': ('histogram', "Time one pipeline stage spent on one batch", LATENCY_BUCKETS),
+    'pipeline_comments_total': ('counter', "Comments through each pipeline stage", None),
+    'stage_seconds': ('gauge', "Seconds from the start of the run until a stage handled its last comment", None),
+    'queue_depth': ('gauge', "Records waiting between pipeline stages", None),
+    'queue_depth_max': ('gauge', "Most records seen waiting between pipeline stages", None),
+    'comments_per_second': ('gauge', "Comments scored per second in this run", None),
+    'eta_seconds': ('gauge', "Estimated seconds until every expected comment is scored", None),
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram, cumulative like Prometheus's"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimate of the q-quantile, interpolated inside its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            if count and seen + count >= rank:
+                if bound == float('inf'):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return lower
+
+    def summary(self):
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        cumulative['+Inf'] = self.count
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': cumulative,
+        }
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+
+class Metrics:
+    """Counters, gauges and histograms for one analysis run.
+
+    Every stage is handed the same instance and records into it from its
+    own threads. `snapshot()` gives a JSON-ready copy for the Performance
+    panel, and `write()` exports it as JSON or in the Prometheus text
+    format, depending on the file extension."""
+
+    def __init__(self):
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def set_max(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = max(self._gauges.get(key, value), value)
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                buckets = METRICS.get(name, (None, None, None))[2] or LATENCY_BUCKETS
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def time(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name, **labels):
+        """Sum of a counter over every label set matching `labels`"""
+        wanted = set(self._key(name, labels)[1])
+        with self._lock:
+            return sum(value for (key_name, key_labels), value in self._counters.items()
+                       if key_name == name and wanted <= set(key_labels))
+
+    def gauge(self, name, **labels):
+        with self._lock:
+            return self._gauges.get(self._key(name, labels))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self._counters.items())],
+                'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                           for (name, labels), value in sorted(self._gauges.items())],
+                'histograms': [dict({'name': name, 'labels': dict(labels)}, **histogram.summary())
+                               for (name, labels), histogram in sorted(self._histograms.items())],
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix='ytsentiment_'):
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                help_text = METRICS.get(name, (None, name))[1]
+                lines.append(f"# HELP {prefix}{name} {help_text}")
+                lines.append(f"# TYPE {prefix}{name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                describe(name, 'counter')
+                lines.append(f"{prefix}{name}{_label_text(labels)} {value}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                if value is None:
+                    continue
+                describe(name, 'gauge')
+                lines.append(f"{prefix}{name}{_label_text(labels)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                describe(name, 'histogram')
+                for bound, count in histogram.summary()['buckets'].items():
+                    lines.append(f"{prefix}{name}_bucket{_label_text(labels + (('le', bound),))} {count}")
+                lines.append(f"{prefix}{name}_sum{_label_text(labels)} {histogram.sum}")
+                lines.append(f"{prefix}{name}_count{_label_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Export to `path`: JSON for .json files, Prometheus text otherwise"""
+        text = self.to_json() if path.endswith('.json') else self.to_prometheus()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
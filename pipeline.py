@@ -0,0 +1,449 @@
+import queue
+import threading
+import time
+
+from dedup import copy_labels
+from metrics import Metrics
+from trends import comment_key
+
+_DONE = object()
+
+
+class _ResumeFailed(Exception):
+    pass
+
+
+class _StageError:
+    def __init__(self, error):
+        self.error = error
+
+
+class StreamingPipeline:
+    """Extract -> translate -> score with every comment flowing downstream
+    as soon as it is scraped.
+
+    Stages run on their own threads and are joined by bounded queues, so a
+    slow stage applies backpressure to the ones before it instead of
+    letting work pile up in memory. `run()` yields one store record per
+    scored comment, in completion order; `index` gives extraction order.
+
+    With a RunCheckpoint, every stage appends its finished records to the
+    checkpoint as it goes. A later run over the same checkpoint yields the
+    records scored before, feeds saved work back into the stage that still
+    owes it, and only extracts comments it does not have yet, numbered
+    after the saved ones. Comments the LLM failed on get one more pass at
+    the end of the run and are kept in the checkpoint's retry file if they
+    fail again.
+
+    With a CommentDeduplicator, a comment that repeats (or nearly repeats)
+    one already sent downstream is not translated or scored again; it
+    waits for that comment's labels and is yielded with a copy of them.
+
+    With a trend store (trends.VideoTrends), every scored comment is added
+    to the video's hourly and daily sentiment counts. Unless only_new is
+    off, comments counted by an earlier run are skipped rather than scored
+    again, and the extractor is told the watermark so it can stop early.
+
+    Stage timings and queue depths go into `metrics`; `stats` carries the
+    live throughput and, once the number of comments to expect is known,
+    an estimate of the time left.
+    """
+
+    def __init__(self, extractor, translator, analyzer, queue_size=64,
+                 translate_workers=4, translate_batch_size=25, score_workers=None, batch_linger=0.2,
+                 results_store=None, flush_every=50, checkpoint=None, deduplicator=None, trends=None,
+                 only_new=True, metrics=None):
+        self.extractor = extractor
+        self.translator = translator
+        self.analyzer = analyzer
+        self.queue_size = queue_size
+        self.translate_workers = translate_workers
+        self.translate_batch_size = translate_batch_size
+        self.score_workers = score_workers or analyzer.max_in_flight
+        self.batch_linger = batch_linger
+        self.results_store = results_store
+        self.flush_every = flush_every
+        self.checkpoint = checkpoint
+        self.deduplicator = deduplicator
+        self.trends = trends
+        self.only_new = only_new
+        self.metrics = metrics or Metrics()
+        self.stats = {
+            'resumed': 0,
+            'retried': 0,
+            'extracted': 0,
+            'translated': 0,
+            'scored': 0,
+            # Comments that reused another comment's labels, each one a
+            # translation and a scoring not done
+            'deduplicated': 0,
+            # Comments an earlier run already counted in the trend store
+            'skipped': 0,
+            'first_result_seconds': None,
+            'elapsed': 0.0,
+            # Comments scored per second by this run, the number it expects
+            # to score in total (None until known) and the seconds left
+            'comments_per_second': 0.0,
+            'expected': None,
+            'eta_seconds': None,
+        }
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._failed = []
+        # Index of each comment sent downstream -> [its scored record, or
+        # None until scored; the duplicates waiting for it]
+        self._groups = {}
+        self._extraction_done = False
+        # Keys of the comments the trend store has counted before this run
+        self._known = set()
+        self._queues = {}
+        self._start = time.perf_counter()
+
+    def _put(self, q, item):
+        # Bounded put that still notices cancellation from the consumer
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        # Blocking get that turns cancellation into an end-of-stream marker
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+        self.metrics.inc('pipeline_comments_total', stage=key)
+
+    def _extract(self, to_translate, to_score, output, state=None, untranslated=(), unscored=()):
+        try:
+            # Work a previous run left unfinished goes first
+            for record in unscored:
+                if not self._route(record, to_score, output):
+                    return
+            for record in untranslated:
+                if not self._route(record, to_translate, output):
+                    return
+            if state is None or not state['extraction_complete']:
+                self._extract_new(to_translate, output, state)
+            self._extraction_done = not self._stop.is_set()
+            self._stage_finished('extract')
+        except Exception as e:
+            output.put(_StageError(e))
+        finally:
+            for _ in range(self.translate_workers):
+                self._put(to_translate, _DONE)
+
+    def _route(self, record, q, output):
+        """Put a record on `q`, unless it repeats one already sent: then it
+        waits for that one's labels, or takes them if they are ready"""
+        if self.deduplicator is None:
+            return self._put(q, record)
+        key = self.deduplicator.assign(record['index'], record['original'])
+        if key == record['index']:
+            return self._put(q, record)
+        self._count('deduplicated')
+        with self._lock:
+            group = self._groups.setdefault(key, [None, []])
+            source = group[0]
+            if source is None:
+                group[1].append(record)
+        if source is not None:
+            output.put(copy_labels(source, record))
+        return True
+
+    def _resolve(self, record):
+        """Copy a scored record's labels to the duplicates waiting on it"""
+        if self.deduplicator is None:
+            return []
+        with self._lock:
+            group = self._groups.setdefault(record['index'], [None, []])
+            group[0] = record
+            waiting, group[1] = group[1], []
+        return [copy_labels(record, duplicate) for duplicate in waiting]
+
+    def _extract_new(self, to_translate, output, state):
+        self._last_index = state['extracted'] if state else 0
+        self._unsaved = []
+        # A resumed scrape may start over, on a list that changed since:
+        # what the checkpoint has is told apart by comment, not position
+        self._saved_keys = ({comment_key(record) for record in self.checkpoint.comments}
+                            if state and self.checkpoint is not None else set())
+        if state and state['extractor_state']:
+            self.extractor.resume = state['extractor_state']
+        try:
+            try:
+                finished = self._pull(to_translate, output)
+            except _ResumeFailed:
+                # Continuation tokens expire: start over and skip what we have.
+                # The trend watermark may have moved past comments the run had
+                # yet to reach, so the restart stops where the run would have
+                self.extractor.since = self.extractor.resume.get('since')
+                self.extractor.resume = None
+                finished = self._pull(to_translate, output)
+            if finished and self.checkpoint is not None:
+                self._save_extracted()
+                self.checkpoint.save_state(extraction_complete=True)
+        finally:
+            if self._unsaved:
+                self._save_extracted()
+
+    def _pull(self, to_translate, output):
+        """Feed new records downstream; False if the run was cancelled"""
+        records = self.extractor.iter_records()
+        produced = False
+        try:
+            for record in records:
+                produced = True
+                key = comment_key(record)
+                if key in self._saved_keys:
+                    # Already saved by the run being resumed, or before a restart
+                    continue
+                self._saved_keys.add(key)
+                if self._known and key in self._known:
+                    self._count('skipped')
+                    continue
+                # Numbered after everything saved, wherever the list put it
+                self._last_index += 1
+                record['index'] = self._last_index
+                self._count('extracted')
+                if self.checkpoint is not None:
+                    self._unsaved.append(dict(record))
+                    if len(self._unsaved) >= self.flush_every:
+                        self._save_extracted()
+                if not self._route(record, to_translate, output):
+                    return False
+            return True
+        except Exception as e:
+            if not produced and self.extractor.resume:
+                raise _ResumeFailed() from e
+            raise
+        finally:
+            # Closing the generator releases the browser/session right away
+            records.close()
+
+    def _save_extracted(self):
+        self.checkpoint.comments.append(self._unsaved)
+        self._unsaved = []
+        self.checkpoint.save_state(extracted=self._last_index, extractor_state=self.extractor.state)
+
+    def _translate(self, to_translate, to_score, remaining, output):
+        try:
+            finished = False
+            while not finished:
+                # Micro-batches let the translator pack short comments together
+                batch, finished = self._next_batch(to_translate, self.translate_batch_size)
+                if batch:
+                    with self.metrics.time('stage_batch_seconds', stage='translate'):
+                        batch = self.translator.translate_records(batch)
+                if self.checkpoint is not None and batch:
+                    with self._write_lock:
+                        self.checkpoint.translated.append(batch)
+                for record in batch:
+                    self._count('translated')
+                    if not self._put(to_score, record):
+                        return
+        except Exception as e:
+            output.put(_StageError(e))
+        finally:
+            with self._lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._stage_finished('translate')
+                for _ in range(self.score_workers):
+                    self._put(to_score, _DONE)
+
+    def _next_batch(self, q, size):
+        item = self._get(q)
+        if item is _DONE:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.batch_linger
+        while len(batch) < size:
+            try:
+                item = q.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _score(self, to_score, output):
+        try:
+            finished = False
+            while not finished and not self._stop.is_set():
+                batch, finished = self._next_batch(to_score, self.analyzer.batch_size)
+                if not batch:
+                    continue
+                with self.metrics.time('stage_batch_seconds', stage='score'):
+                    analyses = self.analyzer.score_batch([record['translation'] for record in batch])
+                for record, analysis in zip(batch, analyses):
+                    record = self.analyzer.apply_analysis(record, analysis)
+                    if record['sentiment'] == 'Error':
+                        # Retried once the first pass is over
+                        with self._lock:
+                            self._failed.append(record)
+                    else:
+                        output.put(record)
+                        for duplicate in self._resolve(record):
+                            output.put(duplicate)
+        except Exception as e:
+            output.put(_StageError(e))
+        finally:
+            output.put(_DONE)
+
+    def run(self):
+        to_translate = queue.Queue(maxsize=self.queue_size)
+        to_score = queue.Queue(maxsize=self.queue_size)
+        output = queue.Queue()
+        remaining = [self.translate_workers]
+        self._queues = {'to_translate': to_translate, 'to_score': to_score, 'output': output}
+
+        start = self._start = time.perf_counter()
+        results_store = self.results_store
+        state, scored, unscored, untranslated = None, [], [], []
+        if self.checkpoint is not None:
+            state, scored, unscored, untranslated = self.checkpoint.pending()
+            results_store = self.checkpoint.results
+            self.stats['resumed'] = len(scored)
+            self.stats['extracted'] = state['extracted']
+            self.stats['translated'] = len(scored) + len(unscored)
+            self.stats['scored'] = len(scored)
+        if self.trends is not None:
+            if self.only_new:
+                self._known = self.trends.known()
+                self.extractor.since = self.trends.watermark()
+            # Counting is idempotent, so records the trend store already has are no harm
+            self.trends.add(scored)
+        if self.deduplicator is not None:
+            # Repeats of comments scored by the run being resumed reuse their labels
+            for record in sorted(scored, key=lambda r: r['index']):
+                if self.deduplicator.assign(record['index'], record['original']) == record['index']:
+                    self._groups[record['index']] = [record, []]
+
+        threads = [threading.Thread(target=self._extract,
+                                    args=(to_translate, to_score, output, state, untranslated, unscored),
+                                    daemon=True)]
+        threads += [threading.Thread(target=self._translate, args=(to_translate, to_score, remaining, output),
+                                     daemon=True)
+                    for _ in range(self.translate_workers)]
+        threads += [threading.Thread(target=self._score, args=(to_score, output), daemon=True)
+                    for _ in range(self.score_workers)]
+
+        for thread in threads:
+            thread.start()
+
+        pending = []
+        counted = []
+        try:
+            # Results of the run being resumed come first; they are already saved
+            for record in sorted(scored, key=lambda r: r['index']):
+                with self._lock:
+                    if self.stats['first_result_seconds'] is None:
+                        self.stats['first_result_seconds'] = time.perf_counter() - start
+                yield record
+
+            running = self.score_workers
+            while running:
+                self._sample_queues()
+                try:
+                    item = output.get(timeout=0.5)
+                except queue.Empty:
+                    self._update_progress(start)
+                    continue
+                if item is _DONE:
+                    running -= 1
+                    continue
+                if isinstance(item, _StageError):
+                    raise item.error
+                self._record_scored(start)
+                if results_store is not None:
+                    pending.append(item)
+                    if len(pending) >= self.flush_every:
+                        results_store.append(pending)
+                        pending = []
+                if self.trends is not None:
+                    counted.append(item)
+                    if len(counted) >= self.flush_every:
+                        self.trends.add(counted)
+                        counted = []
+                yield item
+
+            # Comments the LLM failed on get one more pass
+            self.analyzer.retry_failed(self._failed)
+            self.stats['retried'] = len(self._failed)
+            retried = list(self._failed)
+            for record in self._failed:
+                # Their duplicates waited for the second pass too
+                retried += self._resolve(record)
+            for record in retried:
+                self._record_scored(start)
+                # A checkpoint keeps failures in its retry file so the next run scores them
+                if results_store is not None and (self.checkpoint is None or record['sentiment'] != 'Error'):
+                    pending.append(record)
+                counted.append(record)
+                yield record
+            if self.checkpoint is not None:
+                self.checkpoint.retry.write([record for record in retried if record['sentiment'] == 'Error'])
+            self._stage_finished('score')
+        finally:
+            self._stop.set()
+            if pending:
+                results_store.append(pending)
+            if counted and self.trends is not None:
+                self.trends.add(counted)
+            self._update_progress(start)
+
+    def _stage_finished(self, stage):
+        self.metrics.set('stage_seconds', time.perf_counter() - self._start, stage=stage)
+
+    def _sample_queues(self):
+        for name, q in self._queues.items():
+            depth = q.qsize()
+            self.metrics.set('queue_depth', depth, queue=name)
+            self.metrics.set_max('queue_depth_max', depth, queue=name)
+
+    def _expected(self):
+        """How many comments this run will end up with, if that is known yet"""
+        if self._extraction_done:
+            return self.stats['extracted']
+        limits = [limit for limit in (getattr(self.extractor, 'expected_total', None),
+                                      getattr(self.extractor, 'max_comments', None)) if limit]
+        if not limits:
+            return None
+        # Filtered or vanished comments make YouTube's count an overestimate;
+        # comments counted by an earlier run are not scored again
+        return max(min(limits) - len(self._known), self.stats['extracted'])
+
+    def _update_progress(self, start):
+        with self._lock:
+            stats = self.stats
+            stats['elapsed'] = time.perf_counter() - start
+            # Comments carried over from an earlier run took no time in this one
+            new_scored = stats['scored'] - stats['resumed']
+            stats['comments_per_second'] = new_scored / stats['elapsed'] if stats['elapsed'] > 0 else 0.0
+            stats['expected'] = self._expected()
+            if stats['expected'] is not None and stats['comments_per_second'] > 0:
+                stats['eta_seconds'] = max(0, stats['expected'] - stats['scored']) / stats['comments_per_second']
+            else:
+                stats['eta_seconds'] = None
+        self.metrics.set('comments_per_second', stats['comments_per_second'])
+        self.metrics.set('eta_seconds', stats['eta_seconds'])
+
+    def _record_scored(self, start):
+        with self._lock:
+            self.stats['scored'] += 1
+            if self.stats['first_result_seconds'] is None:
+                self.stats['first_result_seconds'] = time.perf_counter() - start
+        self._update_progress(start)
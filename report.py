@@ -0,0 +1,78 @@
+import pandas as pd
+
+from language import WORD_RE
+from sentiment import SENTIMENT_LABELS
+from store import FIELDS
+
+# Scored labels first, then failed comments
+SENTIMENT_ORDER = SENTIMENT_LABELS + ('Error',)
+
+# Words too common to say anything about a comment's sentiment
+FUNCTION_WORDS = frozenset({
+    'the', 'and', 'is', 'are', 'was', 'were', 'this', 'that', 'these', 'those', 'it', 'its', "it's",
+    'you', 'your', "you're", 'i', "i'm", "i've", 'my', 'me', 'we', 'our', 'they', 'their', 'them',
+    'he', 'she', 'his', 'her', 'him', 'of', 'to', 'in', 'on', 'for', 'with', 'what', 'have', 'has',
+    'had', 'be', 'been', 'but', 'so', 'just', 'can', 'do', 'does', 'did', 'at', 'who', 'how', 'why',
+    'from', 'about', 'all', 'very', 'really', 'here', 'there', 'will', 'would', 'could', 'should',
+    'an', 'or', 'if', 'as', 'by', 'than', 'then', 'when', 'out', 'up', 'one', 'get', 'got', 'also',
+    'more', 'some', 'any', 'only', 'even', 'much', 'too', 'now', 'which', 'where', 'into', 'because',
+    'video', 'videos', 'watch', 'watching', 'comment', 'comments', 'none', 'identified',
+})
+
+# Displayed columns of the detail table, in order
+DETAIL_COLUMNS = ('index', 'sentiment', 'confidence', 'likes', 'translation', 'key_words', 'reasoning',
+                  'scored_by', 'author', 'published')
+
+
+def results_frame(records):
+    """All records of a run as one DataFrame, in comment order. Sentiment
+    is categorical, so counting and filtering 50k rows stays cheap."""
+    frame = pd.DataFrame.from_records(list(records), columns=list(FIELDS))
+    frame['sentiment'] = pd.Categorical(frame['sentiment'], categories=SENTIMENT_ORDER)
+    frame['confidence'] = pd.to_numeric(frame['confidence'], errors='coerce')
+    frame['likes'] = pd.to_numeric(frame['likes'], errors='coerce').fillna(0).astype('int64')
+    return frame.sort_values('index', kind='stable').reset_index(drop=True)
+
+
+def count_sentiments(frame):
+    """{'Positive': n, 'Negative': n, 'Neutral': n}, as store.summarize counts them"""
+    counts = frame['sentiment'].value_counts()
+    return {label: int(counts[label]) for label in SENTIMENT_LABELS}
+
+
+def count_sentiments_by_likes(frame):
+    """Sentiment counts where each comment counts once plus once per like,
+    as store.like_weighted_counts"""
+    weights = (frame['likes'] + 1).groupby(frame['sentiment'], observed=False).sum()
+    return {label: int(weights[label]) for label in SENTIMENT_LABELS}
+
+
+def filter_results(frame, sentiments=SENTIMENT_LABELS, min_confidence=0, max_confidence=100, search=None):
+    """Scored comments with one of `sentiments`, a confidence in the given
+    range and, if `search` is set, containing it (case-insensitive)"""
+    mask = frame['sentiment'].isin(sentiments) & frame['confidence'].between(min_confidence, max_confidence)
+    if search:
+        text = frame['translation'].fillna(frame['original'])
+        mask &= text.str.contains(search, case=False, regex=False, na=False)
+    return frame[mask]
+
+
+def keyword_frequency(frame, top=20):
+    """The `top` most frequent keywords, with how often each appears per
+    sentiment. A comment's keywords are the key words its label came with,
+    or, for comments labelled without them, the words of its translation
+    other than function words. Returns a DataFrame indexed by keyword with
+    one column per sentiment and a 'total', most frequent first."""
+    scored = frame[frame['sentiment'].isin(SENTIMENT_LABELS)]
+    key_words = scored['key_words'].fillna('').str.strip()
+    has_key_words = (key_words != '') & (key_words != 'None identified')
+    words = pd.concat([
+        key_words[has_key_words].str.lower().str.split(r'\s*,\s*', regex=True),
+        scored.loc[~has_key_words, 'translation'].fillna('').str.lower().str.findall(WORD_RE),
+    ]).explode().str.strip(" .!?\"'")
+    words = words[words.str.len().gt(2) & ~words.isin(FUNCTION_WORDS)]
+    table = pd.crosstab(words.to_numpy(), scored['sentiment'].loc[words.index].to_numpy())
+    table = table.reindex(columns=list(SENTIMENT_LABELS), fill_value=0)
+    table['total'] = table.sum(axis=1)
+    table.index.name, table.columns.name = 'keyword', None
+    return table.sort_values('total', ascending=False, kind='stable').head(top)
@@ -0,0 +1,95 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to cap the request rate to the LLM endpoint"""
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SharedTokenBucket:
+    """TokenBucket whose state lives in shared memory, so one rate budget
+    holds across every process it is handed to (pass it to the pool
+    initializer; it cannot be sent with individual tasks)"""
+
+    def __init__(self, rate, capacity=None, context=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        context = context or multiprocessing.get_context()
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = context.Value('d', self.capacity, lock=False)
+        self._last = context.Value('d', time.monotonic(), lock=False)
+        self._lock = context.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens.value = min(self.capacity, self._tokens.value + (now - self._last.value) * self.rate)
+                self._last.value = now
+                if self._tokens.value >= tokens:
+                    self._tokens.value -= tokens
+                    return
+                wait = (tokens - self._tokens.value) / self.rate
+            time.sleep(wait)
+
+
+class ConcurrentScorer:
+    """Runs a blocking score function over many items with a bounded number
+    of calls in flight, an optional token-bucket rate limit, and results
+    returned in input order."""
+
+    def __init__(self, score_fn, max_in_flight=8, rate_limit=None, burst=None):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.score_fn = score_fn
+        self.max_in_flight = int(max_in_flight)
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.elapsed = 0.0
+        self.throughput = 0.0
+
+    def _score(self, item):
+        if self.bucket:
+            self.bucket.acquire()
+        return self.score_fn(item)
+
+    def run(self, items, progress_callback=None):
+        items = list(items)
+        results = [None] * len(items)
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            futures = {pool.submit(self._score, item): i for i, item in enumerate(items)}
+            # as_completed is consumed on the calling thread, so the callback
+            # can safely touch Streamlit elements
+            for done, future in enumerate(as_completed(futures), 1):
+                results[futures[future]] = future.result()
+                if progress_callback:
+                    progress_callback(done, len(items))
+
+        self.elapsed = time.perf_counter() - start
+        self.throughput = len(items) / self.elapsed if self.elapsed > 0 else 0.0
+        return results
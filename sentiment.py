@@ -0,0 +1,559 @@
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+from openai import BadRequestError, RateLimitError
+
+from backends import DEFAULT_BASE_URL, DEFAULT_MODEL, EndpointPool, LLMEndpoint, retry_after
+from cache import cache_key
+from dedup import copy_sentiment, split_duplicates
+from metrics import Metrics
+from store import CommentStore, summarize
+from scoring import ConcurrentScorer, TokenBucket
+
+
+SENTIMENT_LABELS = ('Positive', 'Negative', 'Neutral')
+# Bump whenever the prompts change so cached answers from the old wording are ignored
+PROMPT_VERSION = 'sentiment-v2'
+
+# Output tokens allowed per comment: a compact answer is a label and a
+# confidence, a full one adds key words and a sentence of reasoning
+ANSWER_TOKENS = {'compact': 24, 'full': 160}
+
+FAILED_ANALYSIS = {
+    'sentiment': 'Error',
+    'confidence': 50,
+    'key_words': 'None identified',
+    'reasoning': 'No reasoning provided'
+}
+
+# "Sentiment: Positive", "**Confidence:** 90%", ... in answers that are not JSON
+LABELED_LINE = re.compile(r'\W*(sentiment|confidence|key[_ ]words|reasoning)\W*:\s*(.*)', re.IGNORECASE)
+
+
+def sentiment_schema(detail='compact', batch=False):
+    """JSON schema of an answer, for strict structured output. Batch
+    answers are wrapped in an object, since strict mode wants one at the top."""
+    properties = {
+        'sentiment': {'type': 'string', 'enum': list(SENTIMENT_LABELS)},
+        'confidence': {'type': 'integer', 'minimum': 0, 'maximum': 100},
+    }
+    if detail == 'full':
+        properties['key_words'] = {'type': 'string'}
+        properties['reasoning'] = {'type': 'string'}
+    if batch:
+        properties = dict({'id': {'type': 'integer'}}, **properties)
+    item = {'type': 'object', 'properties': properties, 'required': list(properties), 'additionalProperties': False}
+    if not batch:
+        return item
+    return {'type': 'object', 'properties': {'results': {'type': 'array', 'items': item}},
+            'required': ['results'], 'additionalProperties': False}
+
+
+def load_json(response):
+    """The first JSON value in a model answer, allowing for code fences or
+    text around it; None if there is none"""
+    if not response:
+        return None
+    text = response.strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    # The first complete object or array, whatever text follows it
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r'[{\[]', text):
+        try:
+            return decoder.raw_decode(text, match.start())[0]
+        except ValueError:
+            continue
+    return None
+
+
+def validate_analysis(item, detail='compact'):
+    """Check one answer object. Returns (analysis, problem), with problem
+    None when the answer is usable. Key words and reasoning are kept when
+    given, and required only for full answers."""
+    sentiment = str(item.get('sentiment', '')).strip(' .*"\'[]').capitalize()
+    if sentiment not in SENTIMENT_LABELS:
+        return None, f"sentiment must be Positive, Negative or Neutral, not {item.get('sentiment')!r}"
+    confidence = item.get('confidence')
+    if isinstance(confidence, str):
+        match = re.search(r'\d+(?:\.\d+)?', confidence)
+        confidence = float(match.group()) if match else None
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)) or not 0 <= confidence <= 100:
+        return None, f"confidence must be a number from 0 to 100, not {item.get('confidence')!r}"
+    key_words = item.get('key_words')
+    if isinstance(key_words, list):
+        key_words = ', '.join(str(word) for word in key_words)
+    analysis = {
+        'sentiment': sentiment,
+        'confidence': int(round(confidence)),
+        # Left empty by compact answers until asked for; see SentimentAnalyzer.explain
+        'key_words': str(key_words) if key_words else None,
+        'reasoning': str(item['reasoning']) if item.get('reasoning') else None
+    }
+    if detail == 'full' and not analysis['reasoning']:
+        return None, "reasoning is missing"
+    return analysis, None
+
+
+def reask_prompt(problems, count):
+    """Follow-up asking again for just the items that were wrong"""
+    if count == 1:
+        return f"That answer was not valid: {problems[1]}. Reply with only the JSON object, in the format asked for."
+    details = "; ".join(f"comment {position}: {problem}" for position, problem in sorted(problems.items()))
+    return (f"Some results were missing or not valid ({details}). Reply with only a JSON object "
+            '{"results": [...]} holding results for just those comments, with their ids.')
+
+
+class SentimentAnalyzer:
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, model=DEFAULT_MODEL,
+                 max_in_flight=8, rate_limit=None, batch_size=1, cache=None,
+                 local_model=None, local_threshold=0.5, bucket=None, backoff=1.0, metrics=None,
+                 detail='compact', structured_output=True, max_reasks=1, endpoints=None):
+        # One endpoint from api_key/base_url/model, or several to balance
+        # and fail over between: a list of backends.LLMEndpoint, or an
+        # EndpointPool to share its adaptive limits with other analyzers
+        self._owns_backends = not isinstance(endpoints, EndpointPool)
+        if not self._owns_backends:
+            self.backends = endpoints
+        else:
+            self.backends = EndpointPool(endpoints or [LLMEndpoint(base_url, api_key=api_key, model=model)],
+                                         max_in_flight=max_in_flight, backoff=backoff)
+        self.model = self.backends.model
+        self.cache = cache
+        # Requests kept going in total; the pool spreads them by weight and
+        # caps each endpoint at its own (adaptive) limit
+        self.max_in_flight = max_in_flight
+        self.rate_limit = rate_limit
+        # Shared by every caller of this analyzer so the cap holds across runs;
+        # pass a bucket to share one budget between analyzers (or processes)
+        self.bucket = bucket or (TokenBucket(rate_limit) if rate_limit else None)
+        self.batch_size = max(1, int(batch_size))
+        # Optional offline tier: confident local labels never reach the LLM
+        self.local_model = local_model
+        self.local_threshold = local_threshold
+        self.tier_counts = {'local': 0, 'llm': 0}
+        self.backoff = backoff
+        # 'compact' asks for a label and confidence only; 'full' adds key
+        # words and reasoning to every answer
+        if detail not in ANSWER_TOKENS:
+            raise ValueError(f"detail must be one of {', '.join(ANSWER_TOKENS)}")
+        self.detail = detail
+        # Send a strict JSON schema with each request, to every endpoint
+        # that has not rejected one
+        self.structured_output = structured_output
+        self.max_reasks = max_reasks
+        self.metrics = metrics or Metrics()
+        self.last_error = None
+        self._lock = threading.Lock()
+        self.throughput = 0.0
+    
+    def _get_completion(self, prompt, temperature=0.1, max_retries=3, max_tokens=64, schema=None, history=(),
+                        max_throttled=10):
+        """One completion from whichever endpoint the pool picks. A 429
+        rests that endpoint and the request moves to another one, or waits
+        for it, up to max_throttled times. Other failures move it to an
+        endpoint it has not tried yet, backing off with jittered
+        exponential delays once all of them have failed it, up to
+        max_retries failures. Returns "Error" when it gives up; the
+        exception is kept in last_error. `history` holds earlier turns of
+        the same conversation, and `schema` asks for strict JSON output."""
+        messages = list(history) + [{"role": "user", "content": prompt}]
+        failures = throttled = 0
+        tried = set()
+        while True:
+            if self.bucket:
+                self.bucket.acquire()
+            endpoint = self.backends.acquire(avoid=tried)
+            response_format = self._response_format(schema, endpoint)
+            start = time.perf_counter()
+            try:
+                options = {'response_format': response_format} if response_format else {}
+                completion = endpoint.client.chat.completions.create(
+                    model=endpoint.model,
+                    messages=messages,
+                    temperature=temperature,
+                    top_p=0.7,
+                    max_tokens=max_tokens,
+                    stream=False,
+                    **options
+                )
+                response = completion.choices[0].message.content
+            except Exception as e:
+                self.last_error = e
+                if isinstance(e, RateLimitError):
+                    self.metrics.observe('llm_request_seconds', time.perf_counter() - start, outcome='throttled')
+                    self._release(endpoint, 'throttled', retry_after(e))
+                    throttled += 1
+                    if throttled > max_throttled:
+                        break
+                    continue
+                self.metrics.observe('llm_request_seconds', time.perf_counter() - start, outcome='error')
+                if response_format and isinstance(e, BadRequestError):
+                    # This server does not take a response schema; the prompt
+                    # asks for the same JSON and every answer is validated anyway
+                    endpoint.structured_output = False
+                    self._release(endpoint, None)
+                    continue
+                self._release(endpoint, 'error')
+                failures += 1
+                if failures >= max_retries:
+                    break
+                self.metrics.inc('llm_retries_total')
+                tried.add(endpoint)
+                if len(tried) == len(self.backends.endpoints):
+                    # Every endpoint has failed this request: wait before going round again
+                    tried.clear()
+                    time.sleep(self.backoff * (2 ** (failures - 1)) * random.uniform(0.5, 1.5))
+                continue
+            self.metrics.observe('llm_request_seconds', time.perf_counter() - start, outcome='ok')
+            self.metrics.inc('llm_requests_total', outcome='ok')
+            self._release(endpoint, 'ok')
+            usage = getattr(completion, 'usage', None)
+            for kind in ('prompt', 'completion'):
+                tokens = getattr(usage, f'{kind}_tokens', None)
+                if tokens is not None:
+                    self.metrics.inc('llm_tokens_total', tokens, kind=kind)
+                    self.metrics.observe('llm_tokens_per_call', tokens, kind=kind)
+            return response or ""
+        self.metrics.inc('llm_requests_total', outcome='error')
+        return "Error"
+    
+    def _release(self, endpoint, outcome, wait=None):
+        self.backends.release(endpoint, outcome, wait)
+        if outcome is not None:
+            self.metrics.inc('llm_endpoint_calls_total', endpoint=endpoint.name, outcome=outcome)
+        self.metrics.set('llm_concurrency_limit', endpoint.limit, endpoint=endpoint.name)
+    
+    def _response_format(self, schema, endpoint):
+        if schema is None or not self.structured_output or not endpoint.structured_output:
+            return None
+        return {'type': 'json_schema', 'json_schema': {'name': 'sentiment', 'schema': schema, 'strict': True}}
+    
+    def _ask(self, prompt, schema, count, parse, detail):
+        """Send a prompt and validate the answer. Items that are missing or
+        malformed are asked for again in the same conversation, naming
+        what was wrong, up to max_reasks times. Returns `count` analyses,
+        with None for every item no answer got right."""
+        analyses = [None] * count
+        history = []
+        message = prompt
+        pending = count
+        for reask in range(self.max_reasks + 1):
+            response = self._get_completion(message, max_tokens=ANSWER_TOKENS[detail] * pending + 16,
+                                            schema=schema, history=history)
+            if response == "Error":
+                break
+            parsed, problems = parse(response)
+            for i, analysis in enumerate(parsed):
+                if analyses[i] is None:
+                    analyses[i] = analysis
+            problems = {position: problem for position, problem in problems.items()
+                        if analyses[position - 1] is None}
+            if not problems or reask == self.max_reasks:
+                break
+            self.metrics.inc('llm_reasks_total', len(problems))
+            history += [{"role": "user", "content": message}, {"role": "assistant", "content": response}]
+            message = reask_prompt(problems, count)
+            pending = len(problems)
+        return analyses
+    
+    def _cache_key(self, text, detail=None):
+        return cache_key('sentiment', text, casefold=True, model=self.model,
+                         prompt=f"{PROMPT_VERSION}-{detail or self.detail}")
+    
+    def _cached(self, text, detail=None):
+        if self.cache is None:
+            return None
+        cached = self.cache.get(self._cache_key(text, detail))
+        self.metrics.inc('cache_lookups_total', kind='sentiment', result='miss' if cached is None else 'hit')
+        return cached
+    
+    def _store(self, text, result, detail=None):
+        if self.cache is not None and result['sentiment'] != 'Error':
+            self.cache.put(self._cache_key(text, detail), result)
+        return result
+    
+    def analyze_sentiment(self, text):
+        cached = self._cached(text)
+        if cached is not None:
+            return cached
+        return self._score_single(text)
+    
+    def explain(self, text, sentiment=None):
+        """Key words and reasoning for one comment, asked for on demand
+        (e.g. when a comment is opened in the UI) instead of with every
+        label. With `sentiment`, the label being explained is part of the
+        question; the answer's own sentiment says whether the model still
+        agrees with it. Returns a full analysis dict."""
+        cached = self._cached(text, 'full')
+        if cached is not None and sentiment in (None, cached['sentiment']):
+            return cached
+        if sentiment is None:
+            return self._score_single(text, detail='full')
+        cached = self._cached(text, f'explain-{sentiment}')
+        if cached is not None:
+            return cached
+        return self._score_single(text, detail='full', label=sentiment)
+    
+    def _score_single(self, text, detail=None, label=None):
+        detail = detail or self.detail
+        fields = ('\n  "key_words": "words that indicate the sentiment",'
+                  '\n  "reasoning": "one short sentence"') if detail == 'full' else ''
+        labeled = (f"\nThis text has been labeled {label}. Give the key words and reasoning that make it {label}. "
+                   f"If it clearly is not {label}, answer with the sentiment it has instead, and explain that.\n"
+                   if label else '')
+        prompt = f"""
+Analyze the SENTIMENT of this text - meaning the emotional tone expressed in the words.
+
+TEXT: {json.dumps(text, ensure_ascii=False)}
+{labeled}
+Classify the sentiment as:
+- Positive: Expresses satisfaction, happiness, approval, gratitude, or other positive emotions
+- Negative: Expresses dissatisfaction, anger, disappointment, frustration, or other negative emotions
+- Neutral: Factual, balanced, or lacks clear emotional indicators
+
+ANSWER FORMAT:
+Reply with only this JSON object:
+{{
+  "sentiment": "Positive|Negative|Neutral",
+  "confidence": 0-100,{fields}
+}}
+"""
+        
+        def parse(response):
+            analysis, problem = self._parse_sentiment_response(response, detail)
+            return [analysis], {1: problem} if problem else {}
+        
+        analysis = self._ask(prompt, sentiment_schema(detail), 1, parse, detail)[0]
+        if analysis is None:
+            return dict(FAILED_ANALYSIS)
+        # An answer steered by a given label is not reused as an unprompted one
+        return self._store(text, analysis, f'explain-{label}' if label else detail)
+    
+    def analyze_batch(self, texts):
+        """Score several comments with one request, re-asking about items
+        the model missed or garbled and scoring any still missing on their own"""
+        results = [self._cached(text) for text in texts]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if len(pending) <= 1:
+            for i in pending:
+                results[i] = self._score_single(texts[i])
+            return results
+        
+        uncached = [texts[i] for i in pending]
+        numbered = "\n".join(f"{i}. {json.dumps(text, ensure_ascii=False)}"
+                             for i, text in enumerate(uncached, 1))
+        fields = (', "key_words": "words that indicate the sentiment", "reasoning": "one short sentence"'
+                  if self.detail == 'full' else '')
+        prompt = f"""
+Analyze the SENTIMENT of each numbered comment below - meaning the emotional tone expressed in the words.
+
+Classify each comment as:
+- Positive: Expresses satisfaction, happiness, approval, gratitude, or other positive emotions
+- Negative: Expresses dissatisfaction, anger, disappointment, frustration, or other negative emotions
+- Neutral: Factual, balanced, or lacks clear emotional indicators
+
+COMMENTS:
+{numbered}
+
+ANSWER FORMAT:
+Reply with only a JSON object holding one result per comment, in the same order:
+{{"results": [{{"id": 1, "sentiment": "Positive|Negative|Neutral", "confidence": 0-100{fields}}}]}}
+"""
+        
+        parsed = self._ask(prompt, sentiment_schema(self.detail, batch=True), len(uncached),
+                           lambda response: self._parse_batch_response(response, len(uncached)), self.detail)
+        for i, item in zip(pending, parsed):
+            results[i] = self._store(texts[i], item) if item is not None else self._score_single(texts[i])
+        return results
+    
+    def score_batch(self, texts):
+        """Label what the local model is confident about and send only the
+        rest to the LLM"""
+        results = [None] * len(texts)
+        escalate = list(range(len(texts)))
+        if self.local_model is not None and texts:
+            escalate = []
+            for i, (label, confidence, words) in enumerate(self.local_model.predict(texts)):
+                if label in SENTIMENT_LABELS and confidence >= self.local_threshold:
+                    results[i] = {
+                        'sentiment': label,
+                        'confidence': int(round(confidence * 100)),
+                        'key_words': ', '.join(words),
+                        'reasoning': f"Local lexicon model (confidence {confidence:.2f})",
+                        'scored_by': 'local'
+                    }
+                else:
+                    escalate.append(i)
+        
+        if escalate:
+            for i, analysis in zip(escalate, self.analyze_batch([texts[i] for i in escalate])):
+                analysis.setdefault('scored_by', 'llm')
+                results[i] = analysis
+        
+        with self._lock:
+            self.tier_counts['local'] += len(texts) - len(escalate)
+            self.tier_counts['llm'] += len(escalate)
+        self.metrics.inc('scored_total', len(texts) - len(escalate), tier='local')
+        self.metrics.inc('scored_total', len(escalate), tier='llm')
+        return results
+    
+    def close(self):
+        """Close the HTTP connections of the endpoint pool this analyzer
+        made; a pool passed in is closed by whoever made it"""
+        if self._owns_backends:
+            self.backends.close()
+    
+    def escalation_rate(self):
+        total = self.tier_counts['local'] + self.tier_counts['llm']
+        return self.tier_counts['llm'] / total if total else 0.0
+    
+    def _parse_batch_response(self, response, count):
+        """Parse a batch answer into `count` analyses, with None for every
+        item that is missing or malformed. Returns (analyses, problems),
+        where problems maps each such item's id to what was wrong."""
+        parsed = [None] * count
+        data = load_json(response)
+        if isinstance(data, dict):
+            data = data.get('results')
+        if not isinstance(data, list):
+            return parsed, {position: "the answer was not a JSON object with a results array"
+                            for position in range(1, count + 1)}
+        
+        problems = {}
+        # Positions stand in for ids only when no item has one; otherwise an
+        # item without an id cannot be placed, and its comment is asked again
+        has_ids = any(isinstance(item, dict) and 'id' in item for item in data)
+        for position, item in enumerate(data, 1):
+            if not isinstance(item, dict) or (has_ids and 'id' not in item):
+                continue
+            try:
+                index = int(item.get('id', position))
+            except (TypeError, ValueError):
+                continue
+            if not 1 <= index <= count or parsed[index - 1] is not None:
+                # The first valid answer for a comment wins
+                continue
+            analysis, problem = validate_analysis(item, self.detail)
+            if problem:
+                problems[index] = problem
+            else:
+                parsed[index - 1] = analysis
+        return parsed, {position: problems.get(position, "no result was given")
+                        for position in range(1, count + 1) if parsed[position - 1] is None}
+    
+    def _parse_sentiment_response(self, response, detail=None):
+        """Parse a single-comment answer. Returns (analysis, problem), with
+        problem None when the answer is valid. Plain "Sentiment: ..." lines
+        are accepted from servers without structured output; the label is
+        only ever read from its own field, never from anywhere in the text."""
+        detail = detail or self.detail
+        if not response or response == "Error":
+            return None, "the answer was empty"
+        data = load_json(response)
+        if isinstance(data, list) and len(data) == 1:
+            data = data[0]
+        if isinstance(data, dict):
+            return validate_analysis(data, detail)
+        
+        fields = {}
+        for line in response.splitlines():
+            match = LABELED_LINE.match(line)
+            if match:
+                fields.setdefault(match.group(1).lower().replace(' ', '_'), match.group(2).strip(' *[]'))
+        if 'sentiment' in fields:
+            return validate_analysis(fields, detail)
+        return None, "the answer was not a JSON object"
+    
+    def score_statements(self, statements, progress_callback=None):
+        """Score statements concurrently, keeping input order"""
+        batches = [statements[i:i + self.batch_size]
+                   for i in range(0, len(statements), self.batch_size)]
+        scorer = ConcurrentScorer(self.score_batch, max_in_flight=self.max_in_flight)
+        
+        def on_batch(done, total):
+            if progress_callback:
+                progress_callback(min(done * self.batch_size, len(statements)), len(statements))
+        
+        analyses = [analysis for batch in scorer.run(batches, on_batch) for analysis in batch]
+        self.throughput = len(statements) / scorer.elapsed if scorer.elapsed > 0 else 0.0
+        return analyses
+    
+    def apply_analysis(self, record, analysis):
+        """Copy an analysis dict into the sentiment columns of a store record"""
+        record['sentiment'] = analysis['sentiment']
+        record['confidence'] = analysis['confidence']
+        record['key_words'] = analysis['key_words']
+        record['reasoning'] = analysis['reasoning']
+        record['scored_by'] = analysis.get('scored_by')
+        return record
+    
+    def retry_failed(self, records):
+        """Score records whose sentiment is 'Error' once more.
+        Returns the records that failed again."""
+        failed = [record for record in records if record['sentiment'] == 'Error']
+        if failed:
+            analyses = self.score_statements([record['translation'] for record in failed])
+            for record, analysis in zip(failed, analyses):
+                self.apply_analysis(record, analysis)
+        return [record for record in failed if record['sentiment'] == 'Error']
+    
+    def analyze_comments(self, progress_callback=None, source=None, destination=None, retry=None,
+                         deduplicator=None):
+        source = source or CommentStore.for_stage('translated')
+        destination = destination or CommentStore.for_stage('results')
+        retry = retry or CommentStore.for_stage('retry')
+        
+        records = source.read()
+        if not records:
+            raise Exception("No translated comments found")
+        
+        # Repeated comments are scored once and share the label
+        unique, duplicates = split_duplicates(records, deduplicator) if deduplicator else (records, [])
+        analyses = self.score_statements([record['translation'] for record in unique], progress_callback)
+        for record, analysis in zip(unique, analyses):
+            self.apply_analysis(record, analysis)
+        self.retry_failed(unique)
+        for record, original in duplicates:
+            copy_sentiment(original, record)
+        # Failures are kept for another run rather than dropped from the report
+        retry.write([record for record in records if record['sentiment'] == 'Error'])
+        destination.write(records)
+        
+        results, sentiment_counts = summarize(records)
+        
+        # Save results
+        with open('result.txt', 'w', encoding='utf-8') as file:
+            file.write("="*80 + "\n")
+            file.write("SENTIMENT ANALYSIS RESULTS\n")
+            file.write("="*80 + "\n")
+            file.write(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            file.write(f"Total Statements: {len(results)}\n")
+            file.write(f"Throughput: {self.throughput:.2f} comments/sec\n")
+            file.write(f"Duplicates Reusing a Label: {len(duplicates)}\n\n")
+            
+            file.write("SENTIMENT DISTRIBUTION SUMMARY:\n")
+            file.write("-" * 40 + "\n")
+            file.write(f"Positive Sentiment: {sentiment_counts['Positive']}\n")
+            file.write(f"Negative Sentiment: {sentiment_counts['Negative']}\n")
+            file.write(f"Neutral Sentiment: {sentiment_counts['Neutral']}\n")
+            file.write("\n" + "="*80 + "\n")
+            file.write("DETAILED RESULTS:\n")
+            file.write("="*80 + "\n\n")
+            
+            for result in results:
+                file.write(f"Statement {result['statement_number']}:\n")
+                file.write(f"Text: \"{result['text']}\"\n")
+                file.write(f"Overall Sentiment: {result['overall_sentiment']}\n")
+                file.write(f"Confidence: {result['confidence']}%\n")
+                file.write(f"Key Words: {result['key_words'] or 'Not requested'}\n")
+                file.write(f"Logic Applied: Direct sentiment analysis - {result['overall_sentiment']} sentiment detected\n")
+                file.write("-" * 80 + "\n\n")
+        
+        return results, sentiment_counts
@@ -0,0 +1,196 @@
+import json
+import os
+
+# Column order of every intermediate record. Each stage fills in its own
+# columns and leaves the rest as written by the stages before it.
+FIELDS = (
+    'index',
+    'comment_id',
+    'parent_id',
+    'author',
+    'published',
+    # UTC ISO 8601 time worked out from the relative 'published' text
+    'published_at',
+    'likes',
+    'original',
+    'language',
+    'translation',
+    'translation_status',
+    'sentiment',
+    'confidence',
+    'key_words',
+    'reasoning',
+    'scored_by',
+    # Index of the earlier comment this one repeats; its labels were reused
+    'duplicate_of',
+)
+
+STAGE_FILES = {
+    'comments': 'comments.jsonl',
+    'translated': 'translated.jsonl',
+    'results': 'results.jsonl',
+    # Scored records whose LLM call failed, waiting to be scored again
+    'retry': 'retry.jsonl',
+}
+
+
+def make_record(**values):
+    unknown = set(values) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown record fields: {', '.join(sorted(unknown))}")
+    return {field: values.get(field) for field in FIELDS}
+
+
+class Comment:
+    """One scraped comment or reply, as the extractors collect it.
+
+    Slotted, so a page of comments (or the full list `fetch_comments`
+    returns) stays small while an extractor holds it. `to_record` widens
+    it into a store record, a plain dict, when it is handed downstream,
+    and from there on the pipeline works with records. Replies carry the
+    id of their top-level comment in `parent_id`."""
+
+    __slots__ = ('comment_id', 'parent_id', 'author', 'likes', 'published', 'published_at', 'text')
+
+    def __init__(self, text, comment_id=None, parent_id=None, author=None, likes=None, published=None,
+                 published_at=None):
+        self.text = text
+        self.comment_id = comment_id
+        self.parent_id = parent_id
+        self.author = author
+        self.likes = likes
+        self.published = published
+        self.published_at = published_at
+
+    @property
+    def is_reply(self):
+        return self.parent_id is not None
+
+    def to_record(self, index):
+        return make_record(index=index, comment_id=self.comment_id, parent_id=self.parent_id,
+                           author=self.author, likes=self.likes, published=self.published,
+                           published_at=self.published_at, original=self.text)
+
+    def __repr__(self):
+        return f"Comment({self.comment_id!r}, {self.text[:30]!r})"
+
+
+class CommentStore:
+    """Append-friendly JSON Lines file holding one comment record per line.
+
+    Text is JSON-escaped, so comments containing newlines or separator
+    lines round-trip unchanged, and reading back is a json.loads per line
+    rather than scanning for labels."""
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def for_stage(cls, stage, directory='.'):
+        return cls(os.path.join(directory, STAGE_FILES[stage]))
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def write(self, records):
+        """Replace the file atomically so readers never see half a stage"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        count = 0
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                count += 1
+        os.replace(tmp_path, self.path)
+        return count
+
+    def _drop_torn_tail(self):
+        """Cut an unfinished last line, left by an interrupted append, so the
+        next record starts on a line of its own"""
+        with open(self.path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                step = min(4096, position)
+                f.seek(position - step)
+                chunk = f.read(step)
+                newline = chunk.rfind(b'\n')
+                if newline != -1:
+                    position = position - step + newline + 1
+                    break
+                position -= step
+            if position != end:
+                f.truncate(position)
+
+    def append(self, records):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.exists():
+            self._drop_torn_tail()
+        count = 0
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+        return count
+
+    def __iter__(self):
+        if not self.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    # Torn final line from an interrupted append
+                    break
+                yield json.loads(line)
+
+    def read(self):
+        return list(self)
+
+    def to_dataframe(self):
+        import pandas as pd
+        return pd.DataFrame(self.read(), columns=list(FIELDS))
+
+    def remove(self):
+        if self.exists():
+            os.remove(self.path)
+
+
+def summarize(records):
+    """Split scored records into the (results, sentiment_counts) shape
+    that SentimentAnalyzer.analyze_comments returns"""
+    sentiment_counts = {
+        'Positive': 0,
+        'Negative': 0,
+        'Neutral': 0
+    }
+    results = []
+    for record in sorted(records, key=lambda r: r['index']):
+        # Skips both failed ('Error') and not yet scored records
+        if record['sentiment'] not in sentiment_counts:
+            continue
+        sentiment_counts[record['sentiment']] += 1
+        results.append({
+            'statement_number': record['index'],
+            'text': record['translation'],
+            'overall_sentiment': record['sentiment'],
+            'confidence': record['confidence'],
+            'key_words': record['key_words'],
+            'reasoning': record['reasoning']
+        })
+    return results, sentiment_counts
+
+
+def like_weighted_counts(records):
+    """Sentiment counts where each comment counts once plus once per like,
+    so widely agreed-with comments weigh more"""
+    weighted = {'Positive': 0, 'Negative': 0, 'Neutral': 0}
+    for record in records:
+        if record['sentiment'] in weighted:
+            weighted[record['sentiment']] += 1 + (record.get('likes') or 0)
+    return weighted
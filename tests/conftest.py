@@ -0,0 +1,61 @@
+import json
+import os
+import re
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'tests', 'fixtures')
+
+# The modules live at the repository root, as the app and benchmarks import them
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.stubs import OpenAIStubServer, sentiment_responder  # noqa: E402
+from store import make_record  # noqa: E402
+
+
+@pytest.fixture
+def fixture_path():
+    def path(*parts):
+        return os.path.join(FIXTURES, *parts)
+    return path
+
+
+class ListExtractor:
+    """Extractor over a fixed list of (comment id, text) pairs that always
+    reads it from the top, as the Selenium extractor (or an expired
+    InnerTube resume) does"""
+
+    def __init__(self, comments):
+        self.comments = comments
+        self.resume = None
+        self.state = None
+        self.since = None
+        self.expected_total = None
+        self.max_comments = None
+
+    def iter_records(self):
+        for index, (comment_id, text) in enumerate(self.comments, 1):
+            yield make_record(index=index, comment_id=comment_id, original=text)
+
+
+@pytest.fixture
+def list_extractor():
+    return ListExtractor
+
+
+@pytest.fixture
+def llm():
+    """OpenAI-compatible stub that keeps the texts it was asked to score
+    one at a time in `scored`"""
+    scored = []
+
+    def responder(prompt):
+        scored.extend(json.loads(text) for text in re.findall(r'^TEXT: (".*")$', prompt, re.MULTILINE))
+        return sentiment_responder(prompt)
+
+    with OpenAIStubServer(responder=responder) as stub:
+        stub.scored = scored
+        yield stub
@@ -0,0 +1,111 @@
+import pytest
+from openai import DefaultHttpxClient
+
+from backends import EndpointPool, LLMEndpoint, parse_endpoint
+from benchmarks.stubs import OpenAIStubServer
+from sentiment import SentimentAnalyzer
+
+STATEMENTS = [f"Comment {n}: I love this part" for n in range(40)]
+
+
+def pool_of(*weights, **options):
+    endpoints = [LLMEndpoint(f"http://127.0.0.1:9/{n}/v1", name=f"e{n}", weight=weight)
+                 for n, weight in enumerate(weights)]
+    return EndpointPool(endpoints, **options)
+
+
+def by_name(pool):
+    return {row['endpoint']: row for row in pool.stats()}
+
+
+def test_endpoint_specs_are_parsed(monkeypatch):
+    monkeypatch.setenv('LOCAL_KEY', 'secret')
+    endpoint = parse_endpoint("http://localhost:8080/v1 model=llama-3.1-8b weight=3 max_in_flight=4 "
+                              "key_env=LOCAL_KEY name=local")
+
+    assert (endpoint.base_url, endpoint.model, endpoint.weight) == ("http://localhost:8080/v1", 'llama-3.1-8b', 3.0)
+    assert (endpoint.max_in_flight, endpoint.name, endpoint.api_key) == (4, 'local', 'secret')
+
+
+@pytest.mark.parametrize('spec', ["localhost:8080/v1", "http://localhost/v1 weight", "http://localhost/v1 colour=red",
+                                  "http://localhost/v1 weight=0", "http://localhost/v1 max_in_flight=many"])
+def test_bad_endpoint_specs_are_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_endpoint(spec)
+
+
+def test_requests_follow_the_weights():
+    pool = pool_of(3, 1)
+
+    picked = [pool.acquire().name for _ in range(8)]
+
+    assert picked.count('e0') == 6 and picked.count('e1') == 2
+
+
+def test_a_throttled_endpoint_rests_with_half_its_limit():
+    pool = pool_of(1, 1, max_in_flight=4)
+    first = pool.acquire()
+    pool.release(first, 'throttled', wait=60)
+
+    assert first.limit == 2
+    assert {pool.acquire().name for _ in range(4)} == {'e1'}
+
+
+def test_failing_endpoint_is_taken_out_while_another_works():
+    pool = pool_of(1, 1, failure_threshold=3)
+    failing = pool.endpoints[0]
+    for _ in range(3):
+        pool.release(pool.acquire(avoid=pool.endpoints[1:]), 'error')
+
+    assert failing.available_at > 0
+    assert {pool.acquire().name for _ in range(3)} == {'e1'}
+    # The last working endpoint stays in rotation whatever happens to it
+    for _ in range(3):
+        pool.release(pool.endpoints[1], 'error')
+    assert pool.endpoints[1].available_at == 0
+
+
+def test_throttling_moves_traffic_to_the_other_endpoint():
+    with OpenAIStubServer(latency=0.02, max_concurrent=2, retry_after=0.2) as hosted, \
+            OpenAIStubServer(latency=0.02) as local:
+        analyzer = SentimentAnalyzer("stub-key", max_in_flight=6, backoff=0.05, endpoints=[
+            LLMEndpoint(hosted.base_url, name='hosted'), LLMEndpoint(local.base_url, name='local')])
+        results = analyzer.score_statements(STATEMENTS)
+        analyzer.close()
+
+    stats = by_name(analyzer.backends)
+    assert [analysis['sentiment'] for analysis in results] == ['Positive'] * len(STATEMENTS)
+    assert hosted.throttled > 0 and stats['hosted']['throttled'] == hosted.throttled
+    assert stats['hosted']['ok'] + stats['local']['ok'] == len(STATEMENTS)
+    assert stats['local']['ok'] > stats['hosted']['ok']
+
+
+def test_a_down_endpoint_fails_over_without_losing_comments():
+    with OpenAIStubServer(error_rate=1.0) as down, OpenAIStubServer() as local:
+        analyzer = SentimentAnalyzer("stub-key", max_in_flight=1, backoff=0.05, endpoints=[
+            LLMEndpoint(down.base_url, name='down'), LLMEndpoint(local.base_url, name='local')])
+        results = analyzer.score_statements(STATEMENTS)
+        analyzer.close()
+
+    stats = by_name(analyzer.backends)
+    assert len(results) == len(STATEMENTS)
+    assert stats['local']['ok'] == len(STATEMENTS)
+    # Out of rotation for the cooldown after failure_threshold errors
+    assert stats['down']['error'] == 3
+
+
+def test_the_pool_owns_and_closes_the_shared_connections():
+    own_client = DefaultHttpxClient()
+    shared = [LLMEndpoint("http://127.0.0.1:9/a/v1"), LLMEndpoint("http://127.0.0.1:9/b/v1")]
+    own = LLMEndpoint("http://127.0.0.1:9/c/v1", http_client=own_client)
+    pool = EndpointPool(shared + [own])
+    other = pool_of(1)
+
+    assert shared[0].client._client is shared[1].client._client is pool._http_client
+    assert other._http_client is not pool._http_client
+    pool.close()
+
+    assert pool._http_client.is_closed
+    assert not own_client.is_closed and not other._http_client.is_closed
+    own_client.close()
+    other.close()
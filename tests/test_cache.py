@@ -0,0 +1,114 @@
+import pytest
+
+import cache as cache_module
+from benchmarks.stubs import OpenAIStubServer, TranslateStubServer
+from cache import ResultCache, cache_key
+from sentiment import SentimentAnalyzer
+from store import make_record
+from translator import CommentTranslator
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(cache_module.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def result_cache(tmp_path):
+    store = ResultCache(str(tmp_path / 'results.sqlite3'))
+    yield store
+    store.close()
+
+
+def test_keys_ignore_whitespace_and_unicode_form():
+    assert cache_key('translation', "Great  video\n") == cache_key('translation', "Great video")
+    assert cache_key('translation', "ｆｕｌｌ width") == cache_key('translation', "full width")
+    assert cache_key('translation', "Great video") != cache_key('translation', "great video")
+    assert cache_key('sentiment', "Great video", casefold=True) == cache_key('sentiment', "GREAT VIDEO",
+                                                                             casefold=True)
+
+
+def test_keys_change_with_everything_that_changes_the_answer():
+    base = cache_key('sentiment', "text", model='a', prompt='v1')
+    assert base != cache_key('sentiment', "text", model='b', prompt='v1')
+    assert base != cache_key('sentiment', "text", model='a', prompt='v2')
+    assert base != cache_key('translation', "text", model='a', prompt='v1')
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / 'results.sqlite3')
+    first = ResultCache(path)
+    first.put('key', {'sentiment': 'Positive'})
+    first.close()
+
+    second = ResultCache(path)
+    assert second.get('key') == {'sentiment': 'Positive'}
+    assert second.stats()['hits'] == 1
+    second.close()
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    store = ResultCache(str(tmp_path / 'results.sqlite3'), ttl=60)
+    store.put('key', 'value')
+    clock[0] += 59
+    assert store.get('key') == 'value'
+    clock[0] += 2
+    assert store.get('key') is None
+    assert len(store) == 0
+    store.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    store = ResultCache(str(tmp_path / 'results.sqlite3'), max_entries=2)
+    store.put('a', 1)
+    clock[0] += 1
+    store.put('b', 2)
+    clock[0] += 1
+    store.get('a')
+    clock[0] += 1
+    store.put('c', 3)
+
+    assert len(store) == 2
+    assert store.get('b') is None
+    assert (store.get('a'), store.get('c')) == (1, 3)
+    store.close()
+
+
+def test_cached_sentiment_skips_the_llm(result_cache):
+    with OpenAIStubServer() as stub:
+        analyzer = SentimentAnalyzer("stub-key", base_url=stub.base_url, cache=result_cache)
+        first = analyzer.analyze_sentiment("I love this video")
+        again = analyzer.analyze_sentiment("  i LOVE this   video ")
+
+    assert stub.requests == 1
+    assert again == first
+
+
+def test_other_model_does_not_reuse_cached_sentiment(result_cache):
+    with OpenAIStubServer() as stub:
+        SentimentAnalyzer("stub-key", base_url=stub.base_url, cache=result_cache).analyze_sentiment("Nice")
+        SentimentAnalyzer("stub-key", base_url=stub.base_url, model='other',
+                          cache=result_cache).analyze_sentiment("Nice")
+
+    assert stub.requests == 2
+
+
+def test_cached_translation_skips_the_network(result_cache):
+    with TranslateStubServer() as stub:
+        translator = CommentTranslator(url=stub.translate_url, cache=result_cache, detector=False)
+        translator.translate_records([make_record(index=1, original="Ich hasse diese Musik")])
+        record = translator.translate_record(make_record(index=2, original="Ich hasse diese Musik"))
+
+    assert len(stub.queries) == 1
+    assert record['translation_status'] == 'cached'
+    assert record['translation'] == "I hate this music"
+
+
+def test_failed_answers_are_not_cached(result_cache):
+    with OpenAIStubServer(error_rate=1.0) as stub:
+        analyzer = SentimentAnalyzer("stub-key", base_url=stub.base_url, cache=result_cache, backoff=0.01)
+        assert analyzer.analyze_sentiment("Nice")['sentiment'] == 'Error'
+
+    assert len(result_cache) == 0
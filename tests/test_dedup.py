@@ -0,0 +1,81 @@
+import pytest
+
+from benchmarks.bench_pipeline import PassthroughTranslator
+from benchmarks.stubs import OpenAIStubServer
+from dedup import CommentDeduplicator, copy_labels, normalize_for_dedup, split_duplicates
+from pipeline import StreamingPipeline
+from sentiment import SentimentAnalyzer
+from store import make_record
+
+
+def test_normalization_ignores_case_punctuation_and_stretched_letters():
+    assert normalize_for_dedup("Soooo GOOD!!!") == normalize_for_dedup("sooo good")
+    assert normalize_for_dedup("Don’t  stop") == normalize_for_dedup("dont stop")
+
+
+def test_exact_copies_join_the_first_one():
+    deduplicator = CommentDeduplicator()
+
+    assert deduplicator.assign(1, "First!") == 1
+    assert deduplicator.assign(2, "first") == 1
+    assert deduplicator.assign(3, "second") == 3
+    assert deduplicator.stats()['exact'] == 1
+
+
+def test_near_copies_join_the_first_one():
+    deduplicator = CommentDeduplicator()
+    deduplicator.assign(1, "Anyone else watching this in 2026 because of the algorithm?")
+
+    assert deduplicator.assign(2, "anyone else watching this in 2026 cause of the algorithm") == 1
+    assert deduplicator.stats()['near'] == 1
+
+
+@pytest.mark.parametrize('first, second', [
+    ("This is the best tutorial on the topic", "This is the worst tutorial on the topic"),
+    ("The editing is really good", "The editing is really bad"),
+    ("I don't like this song at all", "I do like this song at all"),
+])
+def test_near_copies_with_different_sentiment_stay_apart(first, second):
+    deduplicator = CommentDeduplicator()
+    deduplicator.assign(1, first)
+
+    assert deduplicator.assign(2, second) == 2
+
+
+def test_short_texts_are_only_matched_exactly():
+    deduplicator = CommentDeduplicator()
+    deduplicator.assign(1, "so good")
+
+    assert deduplicator.assign(2, "so goof") == 2
+
+
+def test_split_duplicates_pairs_copies_with_their_first_record():
+    records = [make_record(index=i, original=text) for i, text in enumerate(["nice", "cool", "Nice!"], 1)]
+    unique, duplicates = split_duplicates(records, CommentDeduplicator())
+
+    assert [record['index'] for record in unique] == [1, 2]
+    assert [(record['index'], source['index']) for record, source in duplicates] == [(3, 1)]
+
+
+def test_copied_labels_point_at_their_source():
+    source = make_record(index=1, original="Ich hasse das", translation="I hate it", language='de',
+                         translation_status='translated', sentiment='Negative', confidence=90)
+    record = copy_labels(source, make_record(index=2, original="ich hasse das!"))
+
+    assert (record['duplicate_of'], record['translation'], record['sentiment']) == (1, "I hate it", 'Negative')
+
+
+def test_pipeline_scores_each_group_once(list_extractor):
+    texts = ["First!", "Great video, thanks", "first", "FIRST!!!", "great video thanks", "Terrible audio"]
+    with OpenAIStubServer() as stub:
+        analyzer = SentimentAnalyzer("stub-key", base_url=stub.base_url)
+        extractor = list_extractor([(f"c{i}", text) for i, text in enumerate(texts, 1)])
+        pipeline = StreamingPipeline(extractor, PassthroughTranslator(), analyzer,
+                                     deduplicator=CommentDeduplicator(), batch_linger=0.01)
+        records = sorted(pipeline.run(), key=lambda record: record['index'])
+
+    assert stub.requests == 3
+    assert pipeline.stats['deduplicated'] == 3
+    assert [record['duplicate_of'] for record in records] == [None, None, 1, 1, 2, None]
+    assert [record['sentiment'] for record in records] == [
+        'Neutral', 'Positive', 'Neutral', 'Neutral', 'Positive', 'Negative']
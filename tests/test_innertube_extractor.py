@@ -0,0 +1,121 @@
+import json
+import time
+
+import pytest
+
+from benchmarks.stubs import InnerTubeReplayServer
+from extractor import InnerTubeCommentExtractor, parse_published
+
+VIDEO_URL = 'https://www.youtube.com/watch?v=kJQP7kiw5Fk'
+FIRST_PAGE = 'Eg0SC2tKUVA3a2l3NUZrGAYyJSIRIgtrSlFQN2tpdzVGazAAeAJCEGNvbW1lbnRzLXNlY3Rpb24%3D'
+SECOND_PAGE = ('Eg0SC2tKUVA3a2l3NUZrGAYyVSIRIgtrSlFQN2tpdzVGazAAeAJCEGNvbW1lbnRzLXNlY3Rpb25IAWIYQUlq'
+               'X0JfR3B2NnRHZ2R0R0YyY2M1VjA%3D')
+REPLIES = ('Eg0SC2tKUVA3a2l3NUZrGAYygwEaUBIaVWd6eHNHTWhaMGtJaGRxM3RRcDRBYUFCQWciAggAKhhVQ29tbWVudFJl'
+           'cGxpZXNPZ1BhZ2UxMjM%3D')
+PARENT_ID = 'UgzxsGMhZ0kIhdq3tQp4AaABAg'
+
+
+@pytest.fixture
+def server(fixture_path):
+    def load(name):
+        with open(fixture_path('innertube', name), encoding='utf-8') as f:
+            return json.load(f)
+    with open(fixture_path('innertube', 'watch.html'), encoding='utf-8') as f:
+        watch_page = f.read()
+    responses = {
+        FIRST_PAGE: load('next_comments_1.json'),
+        SECOND_PAGE: load('next_comments_2.json'),
+        REPLIES: load('next_replies_1.json'),
+    }
+    with InnerTubeReplayServer(watch_page, responses) as stub:
+        yield stub
+
+
+def make_extractor(server, **kwargs):
+    return InnerTubeCommentExtractor(VIDEO_URL, base_url=server.url, **kwargs)
+
+
+def test_pages_follow_continuations_to_the_end(server):
+    extractor = make_extractor(server)
+    pages = list(extractor.iter_comment_pages())
+
+    assert [len(page) for page in pages] == [2, 2]
+    # Watch page, then one next call per page; the last page has no continuation
+    assert server.tokens == [FIRST_PAGE, SECOND_PAGE]
+    assert extractor.expected_total == 6
+
+
+def test_comments_carry_text_ids_likes_and_authors(server):
+    comments = make_extractor(server).fetch_comments()
+
+    assert [(c.comment_id, c.author, c.likes) for c in comments] == [
+        (PARENT_ID, '@maria.lopez', 1200),
+        ('UgyQ8bN1yVfBqKf2y9Z4AaABAg', '@carlos_r', 87),
+        ('UgwVx9cT3mJ1b2K0l0J4AaABAg', '@nightowl', 0),
+        ('UgxJ7rDkD0o1Wq3kQv54AaABAg', '@two.lines', 3),
+    ]
+    assert comments[0].text == 'This song never gets old, still here in 2024'
+    assert comments[3].text == 'First line of my comment\nand the second one'
+    assert not any(comment.is_reply for comment in comments)
+
+
+def test_publish_times_are_parsed_relative_to_now(server):
+    before = time.time()
+    comments = make_extractor(server).fetch_comments()
+    after = time.time()
+
+    assert [c.published for c in comments] == ['3 months ago', '2 weeks ago (edited)', '5 hours ago', '1 day ago']
+    for comment in comments:
+        assert parse_published(comment.published, before) <= comment.published_at
+        assert comment.published_at <= parse_published(comment.published, after)
+
+
+def test_replies_follow_their_parent(server):
+    comments = make_extractor(server, expand_replies=True).fetch_comments()
+
+    assert [c.comment_id for c in comments[:3]] == [
+        PARENT_ID, PARENT_ID + '.9zKq1xQ0Rr59zKr2bVvW7p', PARENT_ID + '.9zKs0aTqL6H9zKs0aTqL6H']
+    assert [c.parent_id for c in comments] == [None, PARENT_ID, PARENT_ID, None, None, None]
+    assert [(c.text, c.author, c.likes, c.published) for c in comments[1:3]] == [
+        ('Same here, every single year', '@sam.k', 12, '3 months ago'),
+        ('@maria.lopez a true classic', '@jules', 0, '2 months ago'),
+    ]
+    assert server.tokens == [FIRST_PAGE, REPLIES, SECOND_PAGE]
+
+
+def test_replies_are_not_fetched_unless_asked_for(server):
+    comments = make_extractor(server).fetch_comments()
+
+    assert len(comments) == 4
+    assert REPLIES not in server.tokens
+
+
+def test_records_are_numbered_and_cleaned(server):
+    records = list(make_extractor(server).iter_records())
+
+    assert [record['index'] for record in records] == [1, 2, 3, 4]
+    # Emojis are stripped, as the Selenium extractor does
+    assert records[1]['original'] == 'Me encanta esta canción'
+    assert records[0]['comment_id'] == PARENT_ID
+
+
+def test_max_comments_stops_paging(server):
+    comments = make_extractor(server, max_comments=2).fetch_comments()
+
+    assert len(comments) == 2
+    assert server.tokens == [FIRST_PAGE]
+
+
+def test_resumed_run_keeps_counting_toward_max_comments(server):
+    extractor = make_extractor(server, max_comments=3)
+    records = extractor.iter_records()
+    # Interrupted on the first comment of the second page
+    first_run = [next(records) for _ in range(3)]
+    state = extractor.state
+
+    resumed = list(make_extractor(server, max_comments=3, resume=state).iter_records())
+
+    assert (state['index'], state['fetched']) == (2, 2)
+    # The page is read again from its start, and only one more comment fits the budget
+    assert [record['comment_id'] for record in resumed] == [first_run[2]['comment_id']]
+    assert resumed[0]['index'] == 3
@@ -0,0 +1,43 @@
+import pytest
+
+from benchmarks.stubs import TranslateStubServer
+from language import LanguageDetector
+from store import make_record
+from translator import CommentTranslator
+
+# Short non-English comments whose only evidence is shared with English
+AMBIGUOUS = ["me encanta", "video bagus", "in bocca al lupo", "so gut"]
+
+
+@pytest.mark.parametrize('text', ["me encanta", "video bagus"])
+def test_tied_languages_are_not_reported(text):
+    assert LanguageDetector().detect(text) == (None, 0.0)
+
+
+def test_clear_english_and_foreign_comments_are_detected():
+    detector = LanguageDetector()
+
+    assert detector.detect("I love how clearly you explained this")[0] == 'en'
+    assert detector.detect("Das ist ein tolles Tutorial")[0] == 'de'
+    assert detector.detect("Este video es increíble, gracias")[0] == 'es'
+    assert detector.detect("यह वीडियो बहुत अच्छा है")[0] == 'hi'
+
+
+def test_weak_english_evidence_is_still_translated():
+    with TranslateStubServer() as stub:
+        translator = CommentTranslator(url=stub.translate_url, max_pack_size=1)
+        records = [make_record(index=i, original=text) for i, text in enumerate(AMBIGUOUS, 1)]
+        translator.translate_records(records)
+
+    assert [record['translation_status'] for record in records] == ['translated'] * len(AMBIGUOUS)
+    assert sorted(stub.queries) == sorted(AMBIGUOUS)
+
+
+def test_confident_english_skips_the_network():
+    with TranslateStubServer() as stub:
+        translator = CommentTranslator(url=stub.translate_url)
+        record = translator.translate_record(make_record(index=1, original="I love how clearly you explained this"))
+
+    assert record['translation_status'] == 'skipped'
+    assert record['language'] == 'en'
+    assert stub.queries == []
@@ -0,0 +1,55 @@
+from benchmarks.bench_pipeline import PassthroughTranslator
+from checkpoint import RunCheckpoint
+from pipeline import StreamingPipeline
+from sentiment import SentimentAnalyzer
+
+
+def run_pipeline(extractor, llm, checkpoint=None):
+    analyzer = SentimentAnalyzer("stub-key", base_url=llm.base_url, max_in_flight=2)
+    pipeline = StreamingPipeline(extractor, PassthroughTranslator(), analyzer,
+                                 translate_workers=1, checkpoint=checkpoint, batch_linger=0.01)
+    return pipeline, list(pipeline.run())
+
+
+def test_resumed_scrape_skips_saved_comments_by_id(tmp_path, llm, list_extractor):
+    checkpoint = RunCheckpoint('kJQP7kiw5Fk', root=str(tmp_path))
+    first = [('c1', 'I love it'), ('c2', 'So boring'), ('c3', 'Where was this filmed')]
+    run_pipeline(list_extractor(first), llm, checkpoint)
+    # Interrupted before extraction finished
+    checkpoint.save_state(extraction_complete=False)
+    llm.scored.clear()
+
+    # Newest first: a new comment came in at the top, and one more below
+    pipeline, records = run_pipeline(list_extractor([('new', 'Great video')] + first + [('c4', 'Awful audio')]),
+                                     llm, checkpoint)
+
+    by_id = {record['comment_id']: record for record in records}
+    assert sorted(llm.scored) == ['Awful audio', 'Great video']
+    assert len(records) == 5
+    assert [by_id[comment_id]['index'] for comment_id in ('c1', 'c2', 'c3')] == [1, 2, 3]
+    assert sorted(by_id[comment_id]['index'] for comment_id in ('new', 'c4')) == [4, 5]
+    assert pipeline.stats['resumed'] == 3
+    assert checkpoint.load_state()['extracted'] == 5
+
+
+def test_fully_resumed_run_reports_its_first_result(tmp_path, llm, list_extractor):
+    checkpoint = RunCheckpoint('kJQP7kiw5Fk', root=str(tmp_path))
+    comments = [('c1', 'I love it'), ('c2', 'So boring')]
+    run_pipeline(list_extractor(comments), llm, checkpoint)
+
+    pipeline, records = run_pipeline(list_extractor(comments), llm, checkpoint)
+
+    assert len(records) == 2
+    assert pipeline.stats['resumed'] == 2
+    assert pipeline.stats['first_result_seconds'] is not None
+
+
+def test_checkpoint_is_kept_while_any_comment_failed(tmp_path, llm, list_extractor):
+    checkpoint = RunCheckpoint('kJQP7kiw5Fk', root=str(tmp_path))
+    pipeline, records = run_pipeline(list_extractor([('c1', 'I love it'), ('c2', 'So boring')]), llm, checkpoint)
+    records[0]['sentiment'] = 'Error'
+
+    assert checkpoint.finish(records) == 1
+    assert checkpoint.exists()
+    assert checkpoint.finish(records[1:]) == 0
+    assert not checkpoint.exists()
@@ -0,0 +1,94 @@
+import json
+import multiprocessing
+import re
+import time
+
+import pytest
+
+from benchmarks.stubs import OpenAIStubServer
+from scoring import ConcurrentScorer, SharedTokenBucket, TokenBucket
+from sentiment import SentimentAnalyzer
+
+STATEMENTS = [f"comment number {n}" for n in range(40)]
+
+
+def numbered_responder(prompt):
+    """Answers with the comment's number as its confidence, slowest for the
+    first comments, so answers finish in a different order than asked"""
+    number = int(re.search(r'^TEXT: "comment number (\d+)"$', prompt, re.MULTILINE).group(1))
+    time.sleep(0.002 * (len(STATEMENTS) - number))
+    return json.dumps({'sentiment': 'Neutral', 'confidence': number})
+
+
+def make_analyzer(stub, **kwargs):
+    return SentimentAnalyzer("stub-key", base_url=stub.base_url, backoff=0.01, **kwargs)
+
+
+def test_results_come_back_in_input_order():
+    with OpenAIStubServer(responder=numbered_responder) as stub:
+        analyses = make_analyzer(stub, max_in_flight=8).score_statements(STATEMENTS)
+
+    assert [analysis['confidence'] for analysis in analyses] == list(range(len(STATEMENTS)))
+
+
+@pytest.mark.parametrize('max_in_flight', [1, 4])
+def test_requests_in_flight_never_exceed_the_limit(max_in_flight):
+    with OpenAIStubServer(latency=0.02) as stub:
+        make_analyzer(stub, max_in_flight=max_in_flight).score_statements(STATEMENTS[:24])
+
+    assert stub.requests == 24
+    assert min(2, max_in_flight) <= stub.peak_in_flight <= max_in_flight
+
+
+def test_rate_limit_spaces_out_requests():
+    rate = 20
+    with OpenAIStubServer() as stub:
+        analyzer = make_analyzer(stub, max_in_flight=8, rate_limit=rate)
+        start = time.monotonic()
+        analyzer.score_statements(STATEMENTS)
+        elapsed = time.monotonic() - start
+
+    # The bucket starts with a second's worth of tokens; the rest wait their turn
+    assert elapsed >= (len(STATEMENTS) - rate) / rate * 0.95
+    assert stub.requests == len(STATEMENTS)
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    bucket = TokenBucket(rate=50, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    burst = time.monotonic() - start
+    for _ in range(10):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+
+    assert burst < 0.05
+    assert 10 / 50 * 0.95 <= elapsed < 10 / 50 + 0.2
+
+
+def _drain(bucket, count, times):
+    for _ in range(count):
+        bucket.acquire()
+        times.append(time.monotonic())
+
+
+def test_shared_token_bucket_holds_one_budget_across_processes():
+    context = multiprocessing.get_context('fork')
+    bucket = SharedTokenBucket(rate=40, capacity=1, context=context)
+    times = context.Manager().list()
+    processes = [context.Process(target=_drain, args=(bucket, 10, times)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(10)
+
+    times = sorted(times)
+    assert len(times) == 20
+    # 20 tokens at 40/s with no burst take about half a second, whichever process takes them
+    assert times[-1] - times[0] >= 19 / 40 * 0.95
+
+
+def test_scorer_rejects_a_zero_limit():
+    with pytest.raises(ValueError):
+        ConcurrentScorer(lambda item: item, max_in_flight=0)
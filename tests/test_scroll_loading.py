@@ -0,0 +1,149 @@
+import time
+
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+
+from benchmarks.stubs import LazyPageStubServer
+from browser import WebDriverPool
+from extractor import EXPAND_REPLIES_JS, HARVEST_JS, LOAD_STATE_JS, YouTubeCommentExtractor
+
+COMMENTS = [f"Fixture comment {i}" for i in range(1, 46)]
+
+
+class LazyPageDriver:
+    """Stands in for Chrome on the lazy-loading fixture page
+    (benchmarks/fixtures/lazy_comments.html): a scroll asks for the next
+    batch, which renders `delays[n]` seconds later for the n-th load, or
+    `delay` seconds without one. A scroll while a batch is loading does
+    not start another, as on the page."""
+
+    def __init__(self, comments, batch=20, delay=0.05, delays=None):
+        self.comments = comments
+        self.batch = batch
+        self.delay = delay
+        self.delays = delays or {}
+        self.scrolls = 0
+        self.get("about:blank")
+
+    def get(self, url):
+        self.rendered = 0
+        self.harvested = 0
+        self.loads = 0
+        self.ready_at = None
+
+    def _settle(self):
+        if self.ready_at is not None and time.monotonic() >= self.ready_at:
+            self.rendered = min(len(self.comments), self.rendered + self.batch)
+            self.ready_at = None
+
+    def execute_script(self, script, *args):
+        self._settle()
+        if script == HARVEST_JS:
+            records = [{'text': text, 'author': '@user', 'likes': '0', 'id': f"Ugz{n:08d}", 'parent': None,
+                        'published': '1 day ago'}
+                       for n, text in enumerate(self.comments[self.harvested:self.rendered], self.harvested)]
+            self.harvested = self.rendered
+            return records
+        if script == LOAD_STATE_JS:
+            return [self.rendered - self.harvested, int(self.rendered < len(self.comments))]
+        if script == EXPAND_REPLIES_JS:
+            return 0
+        if script.startswith("window.scrollTo"):
+            self.scrolls += 1
+            if self.ready_at is None and self.rendered < len(self.comments):
+                self.ready_at = time.monotonic() + self.delays.get(self.loads, self.delay)
+                self.loads += 1
+            return None
+        raise AssertionError(f"Unexpected script: {script[:40]!r}")
+
+    def find_element(self, by, selector):
+        self._settle()
+        if not self.rendered:
+            raise NoSuchElementException(selector)
+        return object()
+
+    def find_elements(self, by, selector):
+        return []
+
+    def quit(self):
+        pass
+
+
+def scrape(driver, **kwargs):
+    pool = WebDriverPool(size=1, factory=lambda: driver)
+    start = time.monotonic()
+    try:
+        records = list(YouTubeCommentExtractor("http://fixture/watch?v=fixture0001", pool=pool,
+                                               **kwargs).iter_records())
+    finally:
+        pool.close()
+    return [record['original'] for record in records], time.monotonic() - start
+
+
+def test_stops_at_the_end_of_the_list_without_waiting_out_the_timeout():
+    driver = LazyPageDriver(COMMENTS)
+    found, elapsed = scrape(driver, load_timeout=5)
+
+    assert found == COMMENTS
+    # The scroll that opens the section, one per batch after it, and one that finds the end
+    assert driver.scrolls == 4
+    assert elapsed < 2
+
+
+def test_a_stalled_load_is_scrolled_at_again():
+    # The second batch takes longer than load_timeout, twice over
+    driver = LazyPageDriver(COMMENTS, delays={1: 1.0})
+    found, elapsed = scrape(driver, load_timeout=0.4, stall_retries=3)
+
+    assert found == COMMENTS
+    assert driver.scrolls > 4
+
+
+def test_gives_up_after_stall_retries_in_a_row():
+    driver = LazyPageDriver(COMMENTS, delays={1: 30})
+    found, elapsed = scrape(driver, load_timeout=0.2, stall_retries=2)
+
+    assert found == COMMENTS[:20]
+    # The scroll that opens the section, then the first timeout and two retries
+    assert driver.scrolls == 1 + 3
+    assert elapsed < 5
+
+
+def test_max_seconds_caps_the_scrape():
+    driver = LazyPageDriver(COMMENTS, delays={1: 30})
+    found, elapsed = scrape(driver, load_timeout=5, max_seconds=0.5)
+
+    assert found == COMMENTS[:20]
+    assert elapsed < 2
+
+
+@pytest.fixture(scope='module')
+def chrome_pool():
+    pool = WebDriverPool(size=1)
+    try:
+        with pool.driver() as driver:
+            driver.get("about:blank")
+    except Exception as e:
+        pool.close()
+        pytest.skip(f"Needs a local Chrome: {e}")
+    yield pool
+    pool.close()
+
+
+def test_chrome_reads_the_fixture_page_to_its_end(chrome_pool):
+    with LazyPageStubServer(COMMENTS, batch=20, delay=0.1) as stub:
+        start = time.monotonic()
+        records = list(YouTubeCommentExtractor(f"{stub.url}/watch?v=fixture0001", pool=chrome_pool,
+                                               load_timeout=5).iter_records())
+        elapsed = time.monotonic() - start
+
+    assert [record['original'] for record in records] == COMMENTS
+    assert elapsed < 5
+
+
+def test_chrome_retries_a_slow_batch_on_the_fixture_page(chrome_pool):
+    with LazyPageStubServer(COMMENTS, batch=20, delay=0.1, slow_every=2, slow_delay=1.0) as stub:
+        records = list(YouTubeCommentExtractor(f"{stub.url}/watch?v=fixture0001", pool=chrome_pool,
+                                               load_timeout=0.4, stall_retries=3).iter_records())
+
+    assert [record['original'] for record in records] == COMMENTS
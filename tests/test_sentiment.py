@@ -0,0 +1,159 @@
+import json
+import re
+
+import pytest
+
+from benchmarks.stubs import OpenAIStubServer, sentiment_responder
+from cache import ResultCache
+from sentiment import SentimentAnalyzer, load_json
+
+
+@pytest.fixture
+def analyzer():
+    return SentimentAnalyzer("stub-key", base_url="http://127.0.0.1:9/v1")
+
+
+def answer(*items):
+    return json.dumps({'results': list(items)})
+
+
+def labels(parsed):
+    return [analysis['sentiment'] if analysis else None for analysis in parsed]
+
+
+def test_batch_items_are_placed_by_id(analyzer):
+    parsed, problems = analyzer._parse_batch_response(answer(
+        {'id': 2, 'sentiment': 'Negative', 'confidence': 80},
+        {'id': 1, 'sentiment': 'Positive', 'confidence': 90}), 2)
+
+    assert labels(parsed) == ['Positive', 'Negative']
+    assert problems == {}
+
+
+def test_item_without_id_does_not_take_another_items_slot(analyzer):
+    parsed, problems = analyzer._parse_batch_response(answer(
+        {'id': 2, 'sentiment': 'Positive', 'confidence': 90},
+        {'sentiment': 'Negative', 'confidence': 90}), 2)
+
+    assert labels(parsed) == [None, 'Positive']
+    assert list(problems) == [1]
+
+
+def test_positions_stand_in_when_no_item_has_an_id(analyzer):
+    parsed, problems = analyzer._parse_batch_response(answer(
+        {'sentiment': 'Positive', 'confidence': 90},
+        {'sentiment': 'Neutral', 'confidence': 60}), 2)
+
+    assert labels(parsed) == ['Positive', 'Neutral']
+    assert problems == {}
+
+
+def test_first_valid_answer_for_an_id_wins(analyzer):
+    parsed, problems = analyzer._parse_batch_response(answer(
+        {'id': 1, 'sentiment': 'Positive', 'confidence': 90},
+        {'id': 1, 'sentiment': 'Negative', 'confidence': 90},
+        {'id': 3, 'sentiment': 'Neutral', 'confidence': 50}), 2)
+
+    assert labels(parsed) == ['Positive', None]
+    assert problems == {2: "no result was given"}
+
+
+def test_invalid_items_are_reported(analyzer):
+    parsed, problems = analyzer._parse_batch_response(answer(
+        {'id': 1, 'sentiment': 'Happy', 'confidence': 90},
+        {'id': 2, 'sentiment': 'Negative', 'confidence': 250}), 2)
+
+    assert labels(parsed) == [None, None]
+    assert 'Happy' in problems[1] and '250' in problems[2]
+
+
+def test_answer_without_results_array(analyzer):
+    parsed, problems = analyzer._parse_batch_response("I think they are all positive", 3)
+
+    assert labels(parsed) == [None, None, None]
+    assert sorted(problems) == [1, 2, 3]
+
+
+def test_batch_item_without_id_is_asked_for_again():
+    def responder(prompt):
+        if 'Some results were missing' in prompt:
+            return answer(*({'id': int(n), 'sentiment': 'Negative', 'confidence': 70}
+                            for n in re.findall(r'comment (\d+):', prompt)))
+        return answer({'id': 2, 'sentiment': 'Positive', 'confidence': 90},
+                      {'sentiment': 'Neutral', 'confidence': 90},
+                      {'id': 3, 'sentiment': 'Positive', 'confidence': 90})
+
+    with OpenAIStubServer(responder=responder) as stub:
+        analyzer = SentimentAnalyzer("stub-key", base_url=stub.base_url, batch_size=3)
+        analyses = analyzer.analyze_batch(["first", "second", "third"])
+
+    assert [analysis['sentiment'] for analysis in analyses] == ['Negative', 'Positive', 'Positive']
+    # The batch and one re-ask in the same conversation, no single-comment fallback
+    assert stub.requests == 2
+
+
+def test_explain_names_the_label_it_explains():
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        return sentiment_responder(prompt)
+
+    with OpenAIStubServer(responder=responder) as stub:
+        analyzer = SentimentAnalyzer("stub-key", base_url=stub.base_url)
+        explained = analyzer.explain("I love this video", 'Negative')
+
+    assert 'labeled Negative' in prompts[0]
+    # The model disagrees, and the answer says so rather than backing the label
+    assert explained['sentiment'] == 'Positive'
+    assert explained['reasoning']
+
+
+def test_explain_reuses_a_cached_answer_only_for_the_same_label(tmp_path):
+    with OpenAIStubServer(responder=sentiment_responder) as stub:
+        analyzer = SentimentAnalyzer("stub-key", base_url=stub.base_url,
+                                     cache=ResultCache(str(tmp_path / 'cache.sqlite')))
+        assert analyzer.explain("I love this video")['sentiment'] == 'Positive'
+        analyzer.explain("I love this video", 'Positive')
+        assert stub.requests == 1
+
+        analyzer.explain("I love this video", 'Neutral')
+        analyzer.explain("I love this video", 'Neutral')
+        assert stub.requests == 2
+        # The label-steered answer is not handed out as an unprompted one
+        assert analyzer.explain("I love this video")['sentiment'] == 'Positive'
+        assert stub.requests == 2
+
+
+def test_json_followed_by_text_with_braces_is_read():
+    response = '{"sentiment": "Positive", "confidence": 90} Note: {this} is {not json}'
+
+    assert load_json(response) == {'sentiment': 'Positive', 'confidence': 90}
+
+
+def test_json_in_a_code_fence_is_read():
+    response = 'Here you go:\n```json\n[{"id": 1, "sentiment": "Neutral"}]\n```\nAnything else?'
+
+    assert load_json(response) == [{'id': 1, 'sentiment': 'Neutral'}]
+
+
+def test_text_before_the_json_is_skipped():
+    assert load_json('Set {a} first, then {"sentiment": "Negative"}') == {'sentiment': 'Negative'}
+    assert load_json("No JSON here {at all}") is None
+    assert load_json("") is None
+
+
+def test_invalid_single_answer_is_asked_for_again():
+    def responder(prompt):
+        if 'That answer was not valid' in prompt:
+            # The first answer is part of the conversation the re-ask continues
+            assert '"Happy"' in prompt
+            return '{"sentiment": "Positive", "confidence": 80} {trailing}'
+        return '{"sentiment": "Happy", "confidence": 80}'
+
+    with OpenAIStubServer(responder=responder) as stub:
+        analyzer = SentimentAnalyzer("stub-key", base_url=stub.base_url)
+        analysis = analyzer.analyze_sentiment("great stuff")
+
+    assert analysis['sentiment'] == 'Positive'
+    assert stub.requests == 2
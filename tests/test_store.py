@@ -0,0 +1,58 @@
+import json
+
+from checkpoint import RunCheckpoint
+from store import CommentStore, make_record
+
+
+def tear_last_line(path):
+    # What a crash halfway through an append leaves behind
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(make_record(index=99, original='cut off'))[:25])
+
+
+def test_records_round_trip_with_newlines(tmp_path):
+    store = CommentStore(str(tmp_path / 'comments.jsonl'))
+    records = [make_record(index=1, original='line one\nline two'), make_record(index=2, original='---')]
+    store.write(records)
+
+    assert store.read() == records
+
+
+def test_torn_last_line_is_ignored_on_read(tmp_path):
+    store = CommentStore(str(tmp_path / 'comments.jsonl'))
+    store.append([make_record(index=1, original='first')])
+    tear_last_line(store.path)
+
+    assert [record['index'] for record in store] == [1]
+
+
+def test_append_after_a_torn_write_stays_readable(tmp_path):
+    store = CommentStore(str(tmp_path / 'comments.jsonl'))
+    store.append([make_record(index=1, original='first')])
+    tear_last_line(store.path)
+    store.append([make_record(index=2, original='second'), make_record(index=3, original='third')])
+
+    assert [record['original'] for record in store] == ['first', 'second', 'third']
+
+
+def test_append_after_a_torn_first_line(tmp_path):
+    store = CommentStore(str(tmp_path / 'comments.jsonl'))
+    tear_last_line(store.path)
+    store.append([make_record(index=1, original='first')])
+
+    assert [record['original'] for record in store] == ['first']
+
+
+def test_checkpoint_resumes_after_a_torn_write(tmp_path):
+    checkpoint = RunCheckpoint('kJQP7kiw5Fk', root=str(tmp_path))
+    checkpoint.comments.append([make_record(index=i, original=f'comment {i}') for i in (1, 2, 3)])
+    checkpoint.translated.append([make_record(index=1, original='comment 1', translation='comment 1')])
+    tear_last_line(checkpoint.translated.path)
+    # The resumed run translates the next comment and appends it
+    checkpoint.translated.append([make_record(index=2, original='comment 2', translation='comment 2')])
+
+    state, scored, to_score, to_translate = checkpoint.pending()
+    assert state['extracted'] == 3
+    assert scored == []
+    assert [record['index'] for record in to_score] == [1, 2]
+    assert [record['index'] for record in to_translate] == [3]
@@ -0,0 +1,68 @@
+import pytest
+
+from benchmarks.corpus import FOREIGN
+from benchmarks.stubs import TranslateStubServer
+from store import make_record
+from translator import CommentTranslator
+
+PHRASES = list(FOREIGN)
+
+
+def make_records(texts):
+    return [make_record(index=i, original=text) for i, text in enumerate(texts, 1)]
+
+
+@pytest.fixture
+def stub():
+    with TranslateStubServer() as server:
+        yield server
+
+
+def make_translator(server, **kwargs):
+    kwargs.setdefault('detector', False)
+    return CommentTranslator(url=server.translate_url, backoff=0.01, **kwargs)
+
+
+def test_short_comments_share_one_request(stub):
+    records = make_translator(stub).translate_records(make_records(PHRASES[:5]))
+
+    assert len(stub.queries) == 1
+    assert [record['translation'] for record in records] == [FOREIGN[text][0] for text in PHRASES[:5]]
+    assert {record['translation_status'] for record in records} == {'translated'}
+
+
+def test_multi_line_comment_travels_alone_and_keeps_its_lines(stub):
+    multi_line = f"{PHRASES[4]}\n{PHRASES[5]}"
+    records = make_translator(stub).translate_records(make_records([PHRASES[0], multi_line, PHRASES[1]]))
+
+    assert multi_line in stub.queries
+    assert sorted(query.count('\n') for query in stub.queries) == [1, 1]
+    assert records[1]['translation'] == f"{FOREIGN[PHRASES[4]][0]}\n{FOREIGN[PHRASES[5]][0]}"
+    assert [record['translation'] for record in (records[0], records[2])] == [
+        FOREIGN[PHRASES[0]][0], FOREIGN[PHRASES[1]][0]]
+
+
+def test_pack_with_merged_lines_falls_back_to_one_request_per_comment():
+    with TranslateStubServer(merge_lines=True) as stub:
+        records = make_translator(stub).translate_records(make_records(PHRASES[:3]))
+
+    # The packed request came back as one line, so each comment was sent again alone
+    assert stub.queries[0] == '\n'.join(PHRASES[:3])
+    assert sorted(stub.queries[1:]) == sorted(PHRASES[:3])
+    assert [record['translation'] for record in records] == [FOREIGN[text][0] for text in PHRASES[:3]]
+    assert {record['translation_status'] for record in records} == {'translated'}
+
+
+def test_packs_hold_at_most_max_pack_size_comments(stub):
+    records = make_translator(stub, max_pack_size=3).translate_records(make_records(PHRASES[:7]))
+
+    assert sorted(query.count('\n') + 1 for query in stub.queries) == [1, 3, 3]
+    assert [record['translation'] for record in records] == [FOREIGN[text][0] for text in PHRASES[:7]]
+
+
+def test_packs_fit_in_the_url_length_limit(stub):
+    translator = make_translator(stub, max_url_length=200)
+    translator.translate_records(make_records(PHRASES))
+
+    assert len(stub.queries) > 1
+    assert all(translator._url_length(query) <= 200 for query in stub.queries)
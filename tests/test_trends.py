@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from benchmarks.bench_pipeline import PassthroughTranslator
+from benchmarks.stubs import InnerTubeStubServer, default_age
+from extractor import InnerTubeCommentExtractor
+from pipeline import StreamingPipeline
+from sentiment import SentimentAnalyzer
+from store import make_record
+from trends import TrendStore, comment_key
+
+VIDEO_ID = 'kJQP7kiw5Fk'
+START = datetime(2024, 5, 1, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def store(tmp_path):
+    trends = TrendStore(str(tmp_path / 'trends.sqlite3'))
+    yield trends
+    trends.close()
+
+
+def scored(comment_id, sentiment, minutes=0, likes=0, dated=True):
+    published = (START + timedelta(minutes=minutes)).isoformat() if dated else None
+    return make_record(comment_id=comment_id, original=comment_id, sentiment=sentiment,
+                       likes=likes, published_at=published)
+
+
+def run_pipeline(extractor, llm, trends, only_new=True):
+    analyzer = SentimentAnalyzer("stub-key", base_url=llm.base_url, max_in_flight=2)
+    pipeline = StreamingPipeline(extractor, PassthroughTranslator(), analyzer, translate_workers=1,
+                                 trends=trends, only_new=only_new, batch_linger=0.01)
+    return pipeline, list(pipeline.run())
+
+
+def test_adding_the_same_comments_again_counts_nothing(store):
+    records = [scored('a', 'Positive'), scored('b', 'Negative', minutes=5)]
+
+    assert store.add(VIDEO_ID, records) == 2
+    assert store.add(VIDEO_ID, records + [scored('c', 'Neutral', minutes=10)]) == 1
+    assert store.series(VIDEO_ID, 'hour')['total'].sum() == 3
+    assert store.known(VIDEO_ID) == {'a', 'b', 'c'}
+
+
+def test_comments_are_bucketed_by_hour_and_day(store):
+    store.add(VIDEO_ID, [scored('a', 'Positive', likes=3), scored('b', 'Negative', minutes=30),
+                         scored('c', 'Positive', minutes=150), scored('d', 'Neutral', minutes=24 * 60)])
+
+    hourly = store.series(VIDEO_ID, 'hour')
+    daily = store.series(VIDEO_ID, 'day')
+
+    # Every hour from the first comment to the last, empty ones included
+    assert len(hourly) == 25
+    assert hourly.index[0] == START
+    assert list(hourly['total'][:4]) == [2, 0, 1, 0]
+    assert hourly['Positive weighted'].iloc[0] == 4
+    assert hourly['score'].iloc[0] == pytest.approx((4 - 1) / 5)
+    assert hourly['score'].isna().iloc[1]
+    assert list(daily['total']) == [3, 1]
+
+
+def test_failed_and_undated_comments(store):
+    added = store.add(VIDEO_ID, [scored('a', 'Error'), scored('b', 'Positive', dated=False),
+                                 scored('c', 'Negative')])
+
+    assert added == 2
+    # The failure is scored again next run; the undated comment is not, but has no bucket
+    assert store.known(VIDEO_ID) == {'b', 'c'}
+    assert store.series(VIDEO_ID, 'hour')['total'].sum() == 1
+
+
+def test_watermark_is_the_newest_comment_counted(store):
+    assert store.watermark(VIDEO_ID) is None
+    store.add(VIDEO_ID, [scored('a', 'Positive', minutes=60), scored('b', 'Positive', minutes=10)])
+    store.add(VIDEO_ID, [scored('c', 'Negative', minutes=30)])
+
+    assert store.watermark(VIDEO_ID) == (START + timedelta(minutes=60)).isoformat()
+    store.clear(VIDEO_ID)
+    assert store.watermark(VIDEO_ID) is None
+    assert store.known(VIDEO_ID) == set()
+
+
+def test_comments_without_an_id_are_told_apart_by_author_and_text():
+    first = make_record(author='@a', original='Nice')
+
+    assert comment_key(first) == comment_key(make_record(author='@a', original='Nice', index=7))
+    assert comment_key(first) != comment_key(make_record(author='@b', original='Nice'))
+    assert comment_key(make_record(comment_id='Ugz1', original='Nice')) == 'Ugz1'
+
+
+def test_only_new_comments_are_scored_again(store, llm, list_extractor):
+    comments = [('c1', 'I love it'), ('c2', 'So boring'), ('c3', 'Where was this filmed')]
+    run_pipeline(list_extractor(comments), llm, store.video(VIDEO_ID))
+    llm.scored.clear()
+
+    pipeline, records = run_pipeline(list_extractor(comments + [('c4', 'Great video')]), llm,
+                                     store.video(VIDEO_ID))
+
+    assert llm.scored == ['Great video']
+    assert [record['comment_id'] for record in records] == ['c4']
+    assert pipeline.stats['skipped'] == 3
+    assert len(store.known(VIDEO_ID)) == 4
+
+
+def test_everything_is_scored_again_unless_only_new(store, llm, list_extractor):
+    comments = [('c1', 'I love it'), ('c2', 'So boring')]
+    run_pipeline(list_extractor(comments), llm, store.video(VIDEO_ID))
+
+    pipeline, records = run_pipeline(list_extractor(comments), llm, store.video(VIDEO_ID), only_new=False)
+
+    assert len(records) == 2
+    assert pipeline.stats['skipped'] == 0
+    # Counting stays idempotent
+    assert store.add(VIDEO_ID, records) == 0
+    assert len(store.known(VIDEO_ID)) == 2
+
+
+def test_newest_first_scrape_stops_at_the_watermark(store, llm):
+    count, page_size, later = 100, 20, 6 * 3600
+    comments = [f"Comment number {position}" for position in range(count + 5)]
+    old_ages = [default_age(position) + later for position in range(count)]
+    with InnerTubeStubServer(comments[:count], page_size=page_size, ages=old_ages) as pages:
+        run_pipeline(InnerTubeCommentExtractor(VIDEO_ID, base_url=pages.url), llm, store.video(VIDEO_ID))
+
+    # Five comments posted since, within the last hour or two
+    ages = old_ages + [120, 600, 1800, 3600, 5400]
+    with InnerTubeStubServer(comments, page_size=page_size, ages=ages) as pages:
+        pipeline, records = run_pipeline(InnerTubeCommentExtractor(VIDEO_ID, base_url=pages.url), llm,
+                                         store.video(VIDEO_ID))
+
+    assert sorted(record['original'] for record in records) == comments[count:]
+    # Watch page, the top-comments page that offers the sort menu, and two
+    # newest-first pages: the second is all older than the watermark
+    assert pages.requests == 4
+    assert len(store.known(VIDEO_ID)) == count + 5
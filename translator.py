@@ -0,0 +1,250 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from cache import cache_key
+from dedup import copy_translation, split_duplicates
+from language import LanguageDetector
+from metrics import Metrics
+from sessions import make_session
+from store import CommentStore
+
+# Joins short comments packed into one request. Google keeps line breaks in
+# place, so the translation splits back apart on the same separator.
+PACK_SEPARATOR = "\n"
+
+
+class TranslationError(Exception):
+    pass
+
+
+class CommentTranslator:
+    def __init__(self, cache=None, target_language='en', session=None, max_workers=8,
+                 max_retries=3, backoff=0.5, max_url_length=2000, max_pack_size=25,
+                 url="https://translate.googleapis.com/translate_a/single", timeout=10,
+                 detector=None, skip_threshold=0.7, metrics=None):
+        self.cache = cache
+        self.target_language = target_language
+        self.session = session or make_session(pool_size=max_workers, retries=0)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_url_length = max_url_length
+        self.max_pack_size = max_pack_size
+        self.url = url
+        self.timeout = timeout
+        self.requests_made = 0
+        # Comments confidently in the target language never reach the network;
+        # pass detector=False to translate everything. One function word and
+        # nothing else scores 0.667, so the default wants more than that.
+        self.detector = LanguageDetector() if detector is None else detector
+        self.skip_threshold = skip_threshold
+        self.metrics = metrics or Metrics()
+        # Caps in-flight requests across every caller of this translator
+        self._slots = threading.Semaphore(max_workers)
+        self._lock = threading.Lock()
+
+    def _params(self, text):
+        return {
+            'client': 'gtx',
+            'sl': 'auto',
+            'tl': self.target_language,
+            'dt': 't',
+            'q': text
+        }
+
+    def _fetch(self, text):
+        """One translate call with jittered exponential backoff.
+        Returns (translated text, detected source language)."""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.metrics.inc('translation_retries_total')
+            try:
+                with self._slots:
+                    with self._lock:
+                        self.requests_made += 1
+                    try:
+                        with self.metrics.time('translation_request_seconds'):
+                            response = self.session.get(self.url, params=self._params(text), timeout=self.timeout)
+                    except Exception:
+                        self.metrics.inc('translation_requests_total', status='error')
+                        raise
+                self.metrics.inc('translation_requests_total', status=response.status_code)
+                if response.status_code == 200:
+                    result = response.json()
+                    if not result or not result[0]:
+                        raise TranslationError("Empty translation response")
+                    # Long input comes back as one segment per sentence
+                    translated_text = ''.join(segment[0] for segment in result[0] if segment and segment[0])
+                    language = result[2] if len(result) > 2 and isinstance(result[2], str) else None
+                    return translated_text, language
+                if response.status_code not in (429, 500, 502, 503, 504):
+                    raise TranslationError(f"HTTP {response.status_code}")
+                error = TranslationError(f"HTTP {response.status_code}")
+            except TranslationError:
+                raise
+            except Exception as e:
+                error = e
+            if attempt < self.max_retries:
+                time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+        raise TranslationError(f"Translation failed after {self.max_retries + 1} attempts: {error}")
+
+    def _cache_key(self, text):
+        return cache_key('translation', text, target=self.target_language)
+
+    def _cached(self, text):
+        if self.cache is None:
+            return None
+        cached = self.cache.get(self._cache_key(text))
+        self.metrics.inc('cache_lookups_total', kind='translation', result='miss' if cached is None else 'hit')
+        return cached
+
+    def _store(self, text, translated_text, language):
+        if self.cache is not None:
+            self.cache.put(self._cache_key(text), {'text': translated_text, 'language': language})
+
+    def _detect(self, text):
+        if not self.detector:
+            return None, 0.0
+        return self.detector.detect(text)
+
+    def _needs_translation(self, language, confidence):
+        return not (language == self.target_language and confidence > self.skip_threshold)
+
+    def _request_translation(self, text):
+        """Return (translated text, detected source language), or (None, None)"""
+        language, confidence = self._detect(text)
+        if not self._needs_translation(language, confidence):
+            return text, language
+        cached = self._cached(text)
+        if cached is not None:
+            return cached['text'], cached.get('language')
+        try:
+            translated_text, language = self._fetch(text)
+        except Exception:
+            return None, None
+        self._store(text, translated_text, language)
+        return translated_text, language
+
+    def translate_with_requests_api(self, text):
+        return self._request_translation(text)[0]
+
+    def translate_text(self, text):
+        # Keep original if translation fails
+        return self.translate_with_requests_api(text) or text
+
+    def translate_record(self, record):
+        """Fill the translation columns of a single store record"""
+        return self.translate_records([record])[0]
+
+    def _url_length(self, text):
+        return len(self.url) + 1 + len(urlencode(self._params(text)))
+
+    def _pack(self, records):
+        """Group records into packs that fit in one request URL"""
+        packs, current = [], []
+        for record in records:
+            text = record['original']
+            # Multi-line comments can't be split back apart, so they travel alone
+            if PACK_SEPARATOR in text or self._url_length(text) > self.max_url_length:
+                packs.append([record])
+                continue
+            candidate = current + [record]
+            joined = PACK_SEPARATOR.join(r['original'] for r in candidate)
+            if current and (len(candidate) > self.max_pack_size
+                            or self._url_length(joined) > self.max_url_length):
+                packs.append(current)
+                candidate = [record]
+            current = candidate
+        if current:
+            packs.append(current)
+        return packs
+
+    def _apply(self, record, translated_text, language, status):
+        record['translation'] = translated_text if translated_text else record['original']
+        record['language'] = language or record.get('language')
+        record['translation_status'] = status
+        self.metrics.inc('translations_total', status=status)
+        return record
+
+    def _translate_single(self, record):
+        try:
+            translated_text, language = self._fetch(record['original'])
+        except Exception:
+            # Keep original if translation fails, but say so
+            return self._apply(record, None, None, 'failed')
+        self._store(record['original'], translated_text, language)
+        return self._apply(record, translated_text, language, 'translated')
+
+    def _translate_pack(self, pack):
+        if len(pack) == 1:
+            self._translate_single(pack[0])
+            return pack
+        try:
+            translated_text, language = self._fetch(PACK_SEPARATOR.join(r['original'] for r in pack))
+            parts = translated_text.split(PACK_SEPARATOR)
+        except Exception:
+            parts = []
+        if len(parts) != len(pack):
+            # Lines merged or split in translation: retry the pack item by item
+            for record in pack:
+                self._translate_single(record)
+            return pack
+        for record, part in zip(pack, parts):
+            part = part.strip()
+            # One detected language for the whole pack says little about each comment
+            self._store(record['original'], part, None)
+            self._apply(record, part, None, 'translated')
+        return pack
+
+    def translate_records(self, records, progress_callback=None):
+        """Translate store records in place, returning them in input order.
+
+        Texts already in the target language are skipped, cached texts are
+        served locally, short comments are packed into shared requests, and
+        packs run concurrently. Every record gets a translation_status of
+        'skipped', 'cached', 'translated' or 'failed'."""
+        records = list(records)
+        pending = []
+        for record in records:
+            language, confidence = self._detect(record['original'])
+            # Local guess; Google's detection overrides it for translated comments
+            record['language'] = language
+            if not self._needs_translation(language, confidence):
+                self._apply(record, record['original'], language, 'skipped')
+                continue
+            cached = self._cached(record['original'])
+            if cached is not None:
+                self._apply(record, cached['text'], cached.get('language'), 'cached')
+            else:
+                pending.append(record)
+
+        packs = self._pack(pending)
+        done = len(records) - len(pending)
+        if progress_callback and done:
+            progress_callback(done, len(records))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for pack in pool.map(self._translate_pack, packs):
+                done += len(pack)
+                if progress_callback:
+                    progress_callback(done, len(records))
+        return records
+
+    def translate_comments(self, source=None, destination=None, deduplicator=None):
+        source = source or CommentStore.for_stage('comments')
+        destination = destination or CommentStore.for_stage('translated')
+
+        records = source.read()
+        if not records:
+            raise Exception("No comments found to translate")
+
+        if deduplicator is None:
+            return destination.write(self.translate_records(records))
+        # Repeated comments are translated once and share the result
+        unique, duplicates = split_duplicates(records, deduplicator)
+        self.translate_records(unique)
+        for record, original in duplicates:
+            copy_translation(original, record)
+        return destination.write(records)
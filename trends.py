@@ -0,0 +1,202 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import pandas as pd
+
+from sentiment import SENTIMENT_LABELS
+
+DEFAULT_TRENDS_PATH = os.path.join('.cache', 'trends.sqlite3')
+
+# Bucket width in seconds, and the pandas frequency of a full series
+RESOLUTIONS = {'hour': 3600, 'day': 86400}
+FREQUENCIES = {'hour': 'h', 'day': 'D'}
+
+
+def comment_key(record):
+    """What identifies a comment across runs: its YouTube id, or for
+    scrapes without one, a hash of author and text"""
+    if record.get('comment_id'):
+        return record['comment_id']
+    text = f"{record.get('author') or ''}\x1f{record.get('original') or ''}"
+    return 'sha1:' + hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def to_epoch(timestamp):
+    """Seconds since the epoch of an ISO 8601 timestamp, or None"""
+    if not timestamp:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except ValueError:
+        return None
+
+
+class TrendStore:
+    """Per-video sentiment counts by hour and by day, built up run by run.
+
+    Every scored comment adds one to its sentiment's count in the hour and
+    the day it was published, and 1 + its likes to the like-weighted sum,
+    so a trend costs a few rows per bucket however many comments a video
+    has. Counted comments are remembered by key, which makes adding the
+    same records twice (a resumed run, a re-analysis) a no-op, and lets a
+    later run skip everything it has counted before. Each video also keeps
+    a watermark: the publish time of its newest counted comment."""
+
+    def __init__(self, path=DEFAULT_TRENDS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                video_id TEXT NOT NULL,
+                resolution TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                sentiment TEXT NOT NULL,
+                comments INTEGER NOT NULL,
+                weighted INTEGER NOT NULL,
+                PRIMARY KEY (video_id, resolution, bucket, sentiment)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS counted (
+                video_id TEXT NOT NULL,
+                comment_key TEXT NOT NULL,
+                PRIMARY KEY (video_id, comment_key)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                watermark TEXT,
+                updated REAL NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def video(self, video_id):
+        return VideoTrends(self, video_id)
+
+    def add(self, video_id, records):
+        """Count scored records not counted before; returns how many were.
+        Failed records are left out, so a later run scores them again."""
+        added = 0
+        newest = None
+        totals = defaultdict(lambda: [0, 0])
+        with self._lock:
+            for record in records:
+                if record.get('sentiment') not in SENTIMENT_LABELS:
+                    continue
+                cursor = self._conn.execute("INSERT OR IGNORE INTO counted VALUES (?, ?)",
+                                            (video_id, comment_key(record)))
+                if not cursor.rowcount:
+                    continue
+                added += 1
+                published = to_epoch(record.get('published_at'))
+                if published is None:
+                    # Still remembered, so it is not scored again, but it has no place on a timeline
+                    continue
+                newest = max(newest or record['published_at'], record['published_at'])
+                for resolution, width in RESOLUTIONS.items():
+                    total = totals[(resolution, int(published // width * width), record['sentiment'])]
+                    total[0] += 1
+                    total[1] += 1 + int(record.get('likes') or 0)
+            self._conn.executemany("""
+                INSERT INTO buckets VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (video_id, resolution, bucket, sentiment) DO UPDATE SET
+                    comments = comments + excluded.comments,
+                    weighted = weighted + excluded.weighted
+            """, [(video_id, resolution, bucket, sentiment, comments, weighted)
+                  for (resolution, bucket, sentiment), (comments, weighted) in totals.items()])
+            self._conn.execute("""
+                INSERT INTO videos VALUES (?, ?, ?)
+                ON CONFLICT (video_id) DO UPDATE SET
+                    watermark = MAX(COALESCE(watermark, ''), COALESCE(excluded.watermark, '')),
+                    updated = excluded.updated
+            """, (video_id, newest, time.time()))
+            self._conn.commit()
+        return added
+
+    def known(self, video_id):
+        """Keys (see comment_key) of every comment counted for the video"""
+        with self._lock:
+            rows = self._conn.execute("SELECT comment_key FROM counted WHERE video_id = ?", (video_id,))
+            return {row[0] for row in rows}
+
+    def watermark(self, video_id):
+        """Publish time of the newest comment counted for the video, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT watermark FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+        return row[0] or None if row else None
+
+    def series(self, video_id, resolution='day'):
+        """The video's trend as a DataFrame indexed by bucket start (UTC),
+        one row per hour or day from the first comment to the last. Columns:
+        the comment count of each sentiment, 'total', the like-weighted
+        count of each sentiment ('<label> weighted') and 'score', the
+        like-weighted net sentiment from -1 (all negative) to 1, which is
+        NaN for buckets without comments."""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution!r}")
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT bucket, sentiment, comments, weighted FROM buckets WHERE video_id = ? AND resolution = ?",
+                (video_id, resolution)).fetchall()
+        weighted_columns = [f"{label} weighted" for label in SENTIMENT_LABELS]
+        if not rows:
+            return pd.DataFrame(columns=list(SENTIMENT_LABELS) + ['total'] + weighted_columns + ['score'],
+                                index=pd.DatetimeIndex([], tz='UTC', name='bucket'))
+
+        long = pd.DataFrame(rows, columns=['bucket', 'sentiment', 'comments', 'weighted'])
+        table = long.pivot_table(index='bucket', columns='sentiment', values=['comments', 'weighted'],
+                                 aggfunc='sum', fill_value=0)
+        table.index = pd.to_datetime(table.index, unit='s', utc=True)
+        full_range = pd.date_range(table.index.min(), table.index.max(), freq=FREQUENCIES[resolution])
+        table = table.reindex(full_range, fill_value=0)
+
+        frame = pd.DataFrame(index=full_range)
+        frame.index.name = 'bucket'
+        for label in SENTIMENT_LABELS:
+            frame[label] = table['comments'][label] if label in table['comments'] else 0
+        frame['total'] = frame[list(SENTIMENT_LABELS)].sum(axis=1)
+        for label, column in zip(SENTIMENT_LABELS, weighted_columns):
+            frame[column] = table['weighted'][label] if label in table['weighted'] else 0
+        weight = frame[weighted_columns].sum(axis=1)
+        frame['score'] = ((frame['Positive weighted'] - frame['Negative weighted']) / weight).where(weight > 0)
+        return frame
+
+    def clear(self, video_id):
+        """Forget a video's trend, watermark and counted comments"""
+        with self._lock:
+            for table in ('buckets', 'counted', 'videos'):
+                self._conn.execute(f"DELETE FROM {table} WHERE video_id = ?", (video_id,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class VideoTrends:
+    """A TrendStore bound to one video, as the pipeline uses it"""
+
+    def __init__(self, store, video_id):
+        self.store = store
+        self.video_id = video_id
+
+    def add(self, records):
+        return self.store.add(self.video_id, records)
+
+    def known(self):
+        return self.store.known(self.video_id)
+
+    def watermark(self):
+        return self.store.watermark(self.video_id)
+
+    def series(self, resolution='day'):
+        return self.store.series(self.video_id, resolution)